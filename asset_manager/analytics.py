@@ -0,0 +1,215 @@
+from datetime import date
+
+import numpy as np
+from django.db import connections
+from django.db.models import CharField, FloatField
+from django.db.models.functions import Cast
+
+from . import temporal
+from .history import archived_rows
+from .models import Asset, AssetValueHistory
+from .utils import PriceEstimator, get_asset_data
+
+# Budgets for a portfolio of 1,000 assets x 10 years of monthly history,
+# enforced by `manage.py benchmark_analytics`
+QUERY_BUDGET = 3
+LATENCY_BUDGET_MS = 400
+# For 1,000 assets x 60 months
+PROJECTION_LATENCY_BUDGET_MS = 500
+MAX_PROJECTION_MONTHS = 60
+
+HISTORY_ROW_DTYPE = np.dtype([('asset_id', np.int64), ('day', 'S10'), ('amount', np.float64)])
+
+
+def load_value_matrix(portfolio, months=None):
+    """Load a portfolio's history as an (assets x months) matrix in three queries
+
+    Archived months (``AssetValueArchive``) are merged with the history rows;
+    a row wins over an archived value of the same month.
+
+    Returns ``(asset_ids, asset_types, current_values, first_month, matrix)`` where
+    ``matrix[i, j]`` is the last value recorded for asset ``i`` in month
+    ``first_month + j``, carried forward over gaps and NaN before the asset's
+    first record.
+    """
+    assets = list(Asset.objects.filter(portfolio=portfolio).order_by('id')
+                  .values_list('id', 'asset_type', 'current_value'))
+    if not assets:
+        return np.array([], dtype=np.int64), np.array([], dtype=object), np.array([]), None, np.empty((0, 0))
+
+    asset_ids, asset_types, current_values = zip(*assets)
+    asset_ids = np.array(asset_ids, dtype=np.int64)
+    asset_types = np.array(asset_types, dtype=object)
+    current_values = np.array(current_values, dtype=np.float64)
+
+    # Casting in SQL and fetching through the raw cursor skips Django's per-row
+    # converters and chunked fetches, which otherwise dominate the cost of
+    # loading 100k+ rows
+    history = (AssetValueHistory.objects.filter(asset__portfolio=portfolio).order_by()
+               .annotate(day=Cast('date', CharField()), amount=Cast('value', FloatField()))
+               .values_list('asset_id', 'day', 'amount'))
+    sql, params = history.query.sql_with_params()
+    with connections[history.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = np.fromiter(cursor, dtype=HISTORY_ROW_DTYPE)
+    archived_ids, archived_days, archived_values = archived_rows(asset__portfolio=portfolio)
+    if not len(rows) and not len(archived_ids):
+        return asset_ids, asset_types, current_values, None, np.empty((len(asset_ids), 0))
+
+    days = np.concatenate([archived_days, rows['day'].astype('datetime64[D]')])
+    month_idx = days.astype('datetime64[M]').astype(np.int64)
+    values = np.concatenate([archived_values, rows['amount']])
+    row_idx = np.searchsorted(asset_ids, np.concatenate([archived_ids, rows['asset_id']]))
+    # Archived values rank below rows recorded on the same day
+    is_row = np.r_[np.zeros(len(archived_ids), dtype=np.int8), np.ones(len(rows), dtype=np.int8)]
+
+    first_month = month_idx.min()
+    if months:
+        first_month = max(first_month, month_idx.max() - months + 1)
+    keep = month_idx >= first_month
+    row_idx, month_idx, days, values, is_row = (
+        row_idx[keep], month_idx[keep] - first_month, days[keep], values[keep], is_row[keep]
+    )
+    n_months = int(month_idx.max()) + 1 if len(month_idx) else 0
+
+    # Several rows can fall into one month (manual updates); the latest date wins
+    cell = row_idx * n_months + month_idx
+    order = np.lexsort((is_row, days, cell))
+    cell, values = cell[order], values[order]
+    last_in_cell = np.r_[cell[1:] != cell[:-1], True]
+
+    matrix = np.full(len(asset_ids) * n_months, np.nan)
+    matrix[cell[last_in_cell]] = values[last_in_cell]
+    matrix = matrix.reshape(len(asset_ids), n_months)
+
+    # Carry the last known value forward over months without a record
+    filled = np.where(np.isnan(matrix), 0, np.arange(n_months))
+    np.maximum.accumulate(filled, axis=1, out=filled)
+    matrix = matrix[np.arange(len(asset_ids))[:, None], filled]
+
+    return asset_ids, asset_types, current_values, first_month, matrix
+
+
+def _round_list(values, digits):
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def portfolio_analytics(portfolio, months=None):
+    """Aggregate value series, returns, volatility, drawdown and allocation for a portfolio
+
+    Returns are contribution-weighted: month ``t`` compares only assets that have a
+    value in both ``t-1`` and ``t``, so adding an asset is not counted as a gain.
+    ``returns`` and ``drawdown.series`` are aligned with ``months``; the first
+    month has no return.
+    """
+    asset_ids, asset_types, current_values, first_month, matrix = load_value_matrix(portfolio, months)
+
+    # Allocation by asset type on current values
+    type_names, type_codes = np.unique(asset_types.astype(str), return_inverse=True)
+    type_totals = np.bincount(type_codes, weights=current_values, minlength=len(type_names))
+    total_value = current_values.sum()
+    allocation = {
+        name: {
+            'value': round(float(value), 2),
+            'share': round(float(value / total_value), 4) if total_value else 0.0,
+            'count': int(count),
+        }
+        for name, value, count in zip(type_names, type_totals, np.bincount(type_codes, minlength=len(type_names)))
+    }
+
+    result = {
+        'portfolio_id': portfolio.id,
+        'asset_count': len(asset_ids),
+        'total_value': round(float(total_value), 2),
+        'allocation': allocation,
+        'months': [],
+        'value_series': [],
+        'returns': [],
+        'cumulative_return': 0.0,
+        'volatility': {'monthly': 0.0, 'annualized': 0.0},
+        'drawdown': {'series': [], 'max': 0.0, 'current': 0.0},
+    }
+    if first_month is None or matrix.shape[1] == 0:
+        return result
+
+    value_series = np.nansum(matrix, axis=0)
+
+    previous, current = matrix[:, :-1], matrix[:, 1:]
+    both = ~np.isnan(previous) & ~np.isnan(current)
+    base = np.where(both, previous, 0).sum(axis=0)
+    change = np.where(both, current - previous, 0).sum(axis=0)
+    returns = np.divide(change, base, out=np.zeros_like(change), where=base > 0)
+
+    wealth = np.cumprod(1 + returns)
+    running_peak = np.maximum.accumulate(np.r_[1.0, wealth])[1:]
+    drawdown = wealth / running_peak - 1
+    monthly_volatility = float(returns.std(ddof=1)) if len(returns) > 1 else 0.0
+
+    month_labels = np.arange(first_month, first_month + matrix.shape[1]).astype('datetime64[M]')
+    result.update({
+        'months': [str(month) for month in month_labels],
+        'value_series': _round_list(value_series, 2),
+        'returns': [None] + _round_list(returns, 6),
+        'cumulative_return': round(float(wealth[-1] - 1), 6) if len(wealth) else 0.0,
+        'volatility': {
+            'monthly': round(monthly_volatility, 6),
+            'annualized': round(monthly_volatility * np.sqrt(12), 6),
+        },
+        'drawdown': {
+            'series': [0.0] + _round_list(drawdown, 6),
+            'max': round(float(drawdown.min()), 6) if len(drawdown) else 0.0,
+            'current': round(float(drawdown[-1]), 6) if len(drawdown) else 0.0,
+        },
+    })
+    return result
+
+
+def portfolio_projection(portfolio, months=12):
+    """Project every asset of a portfolio ``months`` months past the current month
+
+    Each asset is priced once, with one predict call per model, and the
+    temporal multipliers are applied as an (assets x months) broadcast, so the
+    values equal ``estimate_apartment_price``/``estimate_car_price`` for each
+    future month. Assets the model cannot price are listed in
+    ``unpriced_assets`` and left out of the total.
+    """
+    assets = list(Asset.objects.filter(portfolio=portfolio).order_by('id')
+                  .only('id', 'name', 'asset_type', 'current_value', 'description', 'area', 'rooms',
+                        'floor', 'total_floors', 'year', 'mileage', 'brand', 'model'))
+
+    today = date.today()
+    future = today.year * 12 + today.month - 1 + np.arange(1, months + 1)
+    years, month_numbers = future // 12, future % 12 + 1
+
+    values = np.full((len(assets), months), np.nan)
+    if assets:
+        estimator = PriceEstimator()
+        is_apartment = np.array([asset.asset_type == 'apartment' for asset in assets])
+        for asset_type, rows, fingerprint, multipliers in [
+            ('apartment', np.flatnonzero(is_apartment), temporal.apartment_fingerprint, temporal.apartment_multipliers),
+            ('car', np.flatnonzero(~is_apartment), temporal.car_fingerprint, temporal.car_multipliers),
+        ]:
+            if not len(rows):
+                continue
+            asset_data = [get_asset_data(assets[i]) for i in rows]
+            base_prices = estimator.get_base_prices(asset_type, asset_data)
+            factors = multipliers([fingerprint(data) for data in asset_data], years, month_numbers)
+            values[rows] = np.maximum(0, base_prices[:, None] * factors)
+
+    priced = ~np.isnan(values).any(axis=1)
+    return {
+        'portfolio_id': portfolio.id,
+        'months': [str(month) for month in (future - 1970 * 12).astype('datetime64[M]')],
+        'assets': [
+            {
+                'id': asset.id,
+                'name': asset.name,
+                'asset_type': asset.asset_type,
+                'current_value': float(asset.current_value),
+                'values': _round_list(asset_values, 2),
+            }
+            for asset, asset_values in zip(assets, values)
+        ],
+        'total': _round_list(values[priced].sum(axis=0), 2),
+        'unpriced_assets': [asset.id for asset, ok in zip(assets, priced) if not ok],
+    }
@@ -0,0 +1,214 @@
+"""Async versions of the evaluation and report endpoints for ASGI deployments
+
+Feature encoding runs in a bounded thread pool, scoring goes through the
+micro-batcher (or the same pool when batching is disabled; LightGBM releases
+the GIL while predicting) and PDF rendering runs in a process pool. Each pool
+sits behind a non-blocking admission semaphore: once ``max_workers + max_pending`` requests
+are in flight, new ones get ``429 Too Many Requests`` instead of queueing
+without bound.
+"""
+import asyncio
+import json
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from . import drift, inference, reports, valuation_log
+
+
+class BoundedExecutor:
+    """An executor that rejects work instead of queueing it once it is full"""
+
+    def __init__(self, executor_class, max_workers, max_pending, **executor_kwargs):
+        self.executor_class = executor_class
+        self.max_workers = max_workers
+        self.executor_kwargs = executor_kwargs
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created lazily so importing the URLconf does not fork worker processes
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self.executor_class(max_workers=self.max_workers, **self.executor_kwargs)
+        return self._executor
+
+    def try_submit(self, fn, *args):
+        """Submit ``fn(*args)`` and return its future, or None when the queue is full
+
+        The slot is released when the job finishes, not when the awaiting request
+        goes away, so a disconnected client cannot free capacity that is still busy.
+        """
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+inference_executor = BoundedExecutor(
+    ThreadPoolExecutor,
+    max_workers=getattr(settings, 'INFERENCE_MAX_WORKERS', 4),
+    max_pending=getattr(settings, 'INFERENCE_MAX_PENDING', 32),
+    thread_name_prefix='inference',
+)
+
+report_executor = BoundedExecutor(
+    ProcessPoolExecutor,
+    max_workers=getattr(settings, 'REPORT_MAX_WORKERS', 2),
+    max_pending=getattr(settings, 'REPORT_MAX_PENDING', 8),
+)
+
+
+def _parse_body(request):
+    """Read a JSON body, falling back to form fields like DRF's parsers do"""
+    if request.content_type == 'application/json':
+        return json.loads(request.body or b'{}')
+    return request.POST.dict()
+
+
+def _too_many_requests():
+    response = JsonResponse({'error': 'Server is busy, please retry shortly'}, status=429)
+    response['Retry-After'] = '1'
+    return response
+
+
+async def _run(executor, fn, *args):
+    """Run ``fn`` on ``executor``; returns None when the executor is saturated"""
+    future = executor.try_submit(fn, *args)
+    if future is None:
+        return None
+    return await asyncio.wrap_future(future)
+
+
+async def _evaluate(encode, input_data):
+    """Encode on the inference pool, then score through the micro-batcher
+
+    Waiting for a batch does not hold an executor thread, so concurrent requests
+    can actually share a ``predict`` call. Returns ``(model_key, prediction)``,
+    or None when saturated.
+    """
+    encoded = await _run(inference_executor, encode, input_data)
+    if encoded is None:
+        return None
+
+    batcher = inference.get_batcher()
+    future = batcher.try_submit(*encoded) if batcher is not None else None
+    if future is not None:
+        return encoded[0], await asyncio.wrap_future(future)
+
+    predictions = await _run(inference_executor, inference.predict, *encoded)
+    return None if predictions is None else (encoded[0], predictions[0])
+
+
+@csrf_exempt
+@require_POST
+async def evaluate_apartment(request):
+    """Evaluate apartment using the ML model without blocking the event loop"""
+    try:
+        input_data = _parse_body(request)
+    except ValueError as e:
+        return JsonResponse({'error': f'Invalid JSON: {e}'}, status=400)
+
+    try:
+        started = time.perf_counter()
+        evaluated = await _evaluate(inference.encode_apartment, input_data)
+        if evaluated is None:
+            return _too_many_requests()
+        model_key, prediction = evaluated
+        result = inference.apartment_result(prediction, input_data)
+        valuation_log.record('apartment', input_data, model_key, result['predicted_price'], started)
+        drift.observe('apartment', input_data, result['predicted_price'])
+        return JsonResponse(result)
+
+    except Exception as e:
+        return JsonResponse({
+            'error': str(e),
+            'traceback': traceback.format_exc(),
+            'input_data': input_data
+        }, status=500)
+
+
+@csrf_exempt
+@require_POST
+async def evaluate_car(request):
+    """Evaluate car using the ML model without blocking the event loop"""
+    try:
+        input_data = _parse_body(request)
+    except ValueError as e:
+        return JsonResponse({'error': f'Invalid JSON: {e}'}, status=400)
+
+    try:
+        started = time.perf_counter()
+        evaluated = await _evaluate(inference.encode_car, input_data)
+        if evaluated is None:
+            return _too_many_requests()
+        model_key, prediction = evaluated
+        result = inference.car_result(prediction)
+        valuation_log.record('car', input_data, model_key, result['predicted_price'], started)
+        drift.observe('car', input_data, result['predicted_price'])
+        return JsonResponse(result)
+
+    except Exception as e:
+        print(f"Error evaluating car: {str(e)}")
+        traceback.print_exc()
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+async def _render_report(request, build_details, render, filename):
+    try:
+        evaluation_data = _parse_body(request)
+    except ValueError as e:
+        return JsonResponse({'error': f'Invalid JSON: {e}'}, status=400)
+
+    try:
+        pdf_bytes = await _run(
+            report_executor,
+            render,
+            build_details(evaluation_data),
+            evaluation_data.get('predicted_price', ''),
+            evaluation_data.get('price_range', '')
+        )
+        if pdf_bytes is None:
+            return _too_many_requests()
+
+        response = HttpResponse(pdf_bytes, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    except Exception as e:
+        print(f"Error generating PDF {filename}: {str(e)}")
+        traceback.print_exc()
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_POST
+async def download_apartment_report(request):
+    """Generate and download PDF report for apartment evaluation in a worker process"""
+    return await _render_report(
+        request, reports.apartment_report_details, reports.render_apartment_report,
+        'apartment_evaluation_report.pdf'
+    )
+
+
+@csrf_exempt
+@require_POST
+async def download_car_report(request):
+    """Generate and download PDF report for car evaluation in a worker process"""
+    return await _render_report(
+        request, reports.car_report_details, reports.render_car_report,
+        'car_evaluation_report.pdf'
+    )
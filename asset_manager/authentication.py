@@ -0,0 +1,84 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+
+class TTLCache:
+    """A small thread-safe LRU cache whose entries also expire after ``ttl`` seconds"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Drop every entry whose value matches ``predicate``"""
+        with self._lock:
+            for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+token_cache = TTLCache(
+    max_size=getattr(settings, 'TOKEN_CACHE_MAX_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 300),
+)
+
+
+def invalidate_token(key):
+    token_cache.delete(key)
+
+
+def invalidate_user_tokens(user_id):
+    token_cache.delete_where(lambda token: token.user_id == user_id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that remembers token -> user instead of querying per request
+
+    Entries are dropped by signals when a token is deleted (logout) or its user is
+    saved (password change, deactivation). The cache is per process, so the TTL
+    bounds how long another worker may keep accepting a revoked token.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token)
+
+        # Hand each request its own instances so per-request changes never leak
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return (token.user, token)
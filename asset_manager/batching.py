@@ -0,0 +1,145 @@
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+# Upper bounds (ms) of the queue wait histogram buckets; the last bucket is open
+QUEUE_WAIT_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100]
+
+
+class _Pending:
+    __slots__ = ('model_key', 'columns', 'values', 'enqueued_at', 'future')
+
+    def __init__(self, model_key, columns, values, enqueued_at, future):
+        self.model_key = model_key
+        self.columns = columns
+        self.values = values
+        self.enqueued_at = enqueued_at
+        self.future = future
+
+
+class MicroBatcher:
+    """Merge concurrent single-row predictions into one ``predict`` call per model
+
+    Callers enqueue an encoded one-row frame and get a ``concurrent.futures.Future``.
+    A scheduler thread flushes as soon as ``max_batch_size`` rows are waiting or
+    the oldest row has waited ``max_wait_ms``, calls ``predict_fn(model_key, df)``
+    once for every model and column layout present in the batch, and resolves
+    each caller's future with its own prediction. When a group's call fails its
+    rows are retried one by one, so a bad row only fails its own caller.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5, max_pending=1024):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+        self._thread.start()
+
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes = {}
+        self._predict_calls = {}
+        self._wait_buckets = [0] * (len(QUEUE_WAIT_BUCKETS_MS) + 1)
+        self._wait_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def try_submit(self, model_key, df):
+        """Queue a one-row frame for ``model_key``; returns None when the queue is full"""
+        future = Future()
+        item = _Pending(model_key, tuple(df.columns), df.to_numpy(dtype=np.float64)[0],
+                        time.perf_counter(), future)
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                return None
+            self._pending.append(item)
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+                self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._pending[0].enqueued_at + self.max_wait
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        groups = {}
+        for item in batch:
+            groups.setdefault((item.model_key, item.columns), []).append(item)
+
+        for (model_key, columns), items in groups.items():
+            live = [item for item in items if item.future.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            try:
+                predictions = self._predict(model_key, columns, live)
+            except Exception as e:
+                if len(live) == 1:
+                    live[0].future.set_exception(e)
+                    continue
+                # Find the failing rows instead of failing every caller in the group
+                for item in live:
+                    try:
+                        item.future.set_result(self._predict(model_key, columns, [item])[0])
+                    except Exception as e:
+                        item.future.set_exception(e)
+            else:
+                for item, prediction in zip(live, predictions):
+                    item.future.set_result(prediction)
+
+        self._record(batch, [model_key for model_key, _ in groups], started)
+
+    def _predict(self, model_key, columns, items):
+        df = pd.DataFrame(np.vstack([item.values for item in items]), columns=list(columns))
+        return self.predict_fn(model_key, df)
+
+    def _record(self, batch, groups, flushed_at):
+        with self._metrics_lock:
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            for model_key in groups:
+                self._predict_calls[model_key] = self._predict_calls.get(model_key, 0) + 1
+            for item in batch:
+                wait_ms = (flushed_at - item.enqueued_at) * 1000
+                self._wait_buckets[bisect_left(QUEUE_WAIT_BUCKETS_MS, wait_ms)] += 1
+                self._wait_count += 1
+                self._wait_total += wait_ms
+                self._wait_max = max(self._wait_max, wait_ms)
+
+    def get_metrics(self):
+        """Batch size distribution, queue wait histogram and predict calls per model"""
+        with self._metrics_lock:
+            batches = sum(self._batch_sizes.values())
+            bucket_labels = [f'<={bound}' for bound in QUEUE_WAIT_BUCKETS_MS] + [f'>{QUEUE_WAIT_BUCKETS_MS[-1]}']
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'queued': len(self._pending),
+                'batches': batches,
+                'rows': self._wait_count,
+                'mean_batch_size': round(self._wait_count / batches, 2) if batches else 0,
+                'batch_size_distribution': dict(sorted(self._batch_sizes.items())),
+                'predict_calls': dict(self._predict_calls),
+                'queue_wait_ms': {
+                    'mean': round(self._wait_total / self._wait_count, 3) if self._wait_count else 0,
+                    'max': round(self._wait_max, 3),
+                    'histogram': dict(zip(bucket_labels, self._wait_buckets)),
+                },
+            }
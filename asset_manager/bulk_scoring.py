@@ -0,0 +1,105 @@
+"""Offline scoring of evaluate-style payloads in bulk
+
+Rows are encoded with the same feature rows and column layouts as the
+evaluate endpoints and routed to model1/model2 or model3/model4 the same way,
+then scored with one predict call per model and chunk. Nothing here touches
+Django, so chunks can run in worker processes.
+"""
+import math
+
+import numpy as np
+
+from . import inference
+
+# Multi-value payload fields, written as "Maktab;Park" in input files
+LIST_FIELDS = {
+    'apartment': ('atrofda', 'uyda'),
+    'car': ('features',),
+}
+LIST_SEPARATOR = ';'
+
+# Apartment frames cast these to int, so a missing value cannot be scored
+REQUIRED_FIELDS = {
+    'apartment': ('area', 'rooms', 'floor', 'total_floors'),
+    'car': (),
+}
+# Encoded columns taken from payload values; cast per row so one bad value fails only its row
+NUMERIC_COLUMNS = {
+    'apartment': ('totalArea', 'numberOfRooms', 'floor', 'floorOfHouse', 'pricingMonth', 'pricingYear'),
+    'car': ('release_year', 'engine_volume', 'mileage', 'month'),
+}
+
+
+def _payload(asset_type, record):
+    payload = {}
+    for field, value in record.items():
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            continue
+        if isinstance(value, np.generic):
+            value = value.item()
+        if field in LIST_FIELDS[asset_type]:
+            value = [item.strip() for item in str(value).split(LIST_SEPARATOR) if item.strip()]
+        payload[field] = value
+    return payload
+
+
+def score_records(asset_type, records):
+    """Price a chunk of payload dicts (e.g. CSV rows)
+
+    Returns ``(prices, model_keys, errors)`` lists aligned with ``records``; a
+    row that cannot be encoded gets a None price and an error message instead
+    of failing the chunk.
+    """
+    if asset_type == 'apartment':
+        resources = inference.load_apartment_resources()
+        feature_row = inference.apartment_feature_row
+        frame = lambda model_key, rows: inference.apartment_frame(model_key, rows, resources)
+    else:
+        resources = inference.load_car_resources()
+        feature_row = inference.car_feature_row
+        frame = inference.car_frame
+
+    prices = [None] * len(records)
+    model_keys = [None] * len(records)
+    errors = [None] * len(records)
+    grouped = {}
+
+    for position, record in enumerate(records):
+        payload = _payload(asset_type, record)
+        missing = [field for field in REQUIRED_FIELDS[asset_type] if field not in payload]
+        if missing:
+            errors[position] = f'Missing {", ".join(missing)}'
+            continue
+        try:
+            model_key, row = feature_row(payload, resources)
+            for column in NUMERIC_COLUMNS[asset_type]:
+                if row.get(column) is not None:
+                    try:
+                        row[column] = float(row[column])
+                    except (TypeError, ValueError):
+                        raise ValueError(f'{column} must be numeric, got {row[column]!r}')
+        except Exception as e:
+            errors[position] = str(e)
+            continue
+        positions, rows = grouped.setdefault(model_key, ([], []))
+        positions.append(position)
+        rows.append(row)
+
+    for model_key, (positions, rows) in grouped.items():
+        try:
+            predictions = inference.predict(model_key, frame(model_key, rows))
+        except Exception:
+            # Score the group's rows one by one so only the rows that fail get an error
+            predictions = []
+            for position, row in zip(positions, rows):
+                try:
+                    predictions.append(inference.predict(model_key, frame(model_key, [row]))[0])
+                except Exception as e:
+                    errors[position] = str(e)
+                    predictions.append(None)
+        for position, prediction in zip(positions, predictions):
+            if prediction is not None:
+                prices[position] = round(float(prediction))
+                model_keys[position] = model_key
+
+    return prices, model_keys, errors
@@ -0,0 +1,363 @@
+"""Comparable marketplace listings for an evaluation payload
+
+Active listings are encoded with the same feature rows the pricing models use
+(``apartment_feature_row`` / ``car_feature_row``) and reduced to a small
+weighted vector: numeric columns divided by a fixed scale, one-hot columns
+times a weight, and the apartment district code expanded to one-hot. Apartments
+share one index; cars get one per model family (model3 for Chevrolet, Ravon
+and Daewoo, model4 for the rest), since their column layouts differ.
+
+Each index is a ball tree plus a small buffer of listings added since it was
+built and a set of built-in listings that were removed since. Queries search
+both, so creating or deactivating a listing never waits for a rebuild; the
+tree is rebuilt once the buffer and removals outgrow ``REBUILD_FRACTION`` of
+it. Signals apply changes made in this process right away; other worker
+processes pick them up by polling ``updated_at`` every
+``COMPARABLES_SYNC_INTERVAL`` seconds, and rebuild when the active count no
+longer matches (hard deletes).
+"""
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from sklearn.neighbors import BallTree
+
+from . import inference
+from .models import MarketplaceListing
+from .utils import get_asset_data
+
+# Numeric feature columns and the difference that counts as one unit of distance
+NUMERIC_SCALES = {
+    'totalArea': 15.0,
+    'numberOfRooms': 1.0,
+    'floor': 4.0,
+    'floorOfHouse': 6.0,
+    'release_year': 2.0,
+    'mileage': 40000.0,
+    'engine_volume': 0.4,
+}
+# Used when a payload leaves a numeric column empty; get_asset_data fills missing
+# fields with 0, so a zero counts as empty for every column where it is impossible
+NUMERIC_DEFAULTS = {
+    'totalArea': 60.0,
+    'numberOfRooms': 2.0,
+    'floor': 3.0,
+    'floorOfHouse': 9.0,
+    'release_year': 2018.0,
+    'mileage': 80000.0,
+    'engine_volume': 1.5,
+}
+# Distance between two listings differing in a one-hot column group, by column prefix
+ONE_HOT_WEIGHTS = {
+    'repairType_': 0.7,
+    'buildType_': 0.7,
+    'marketType_': 0.5,
+    'planType_': 0.3,
+    'car_name_': 3.0,
+    'fuel_type_': 1.0,
+    'body_': 1.0,
+    'car_condition_': 0.7,
+    'state_': 0.7,
+    'transmission': 0.5,
+}
+ZERO_ALLOWED = {'mileage'}
+DISTRICT_WEIGHT = 2.0
+# Asset fields that feed the comparables vector
+FEATURE_FIELDS = {'asset_type', 'description', 'area', 'rooms', 'floor', 'total_floors', 'year', 'mileage',
+                  'brand', 'model'}
+REBUILD_MIN = 256
+REBUILD_FRACTION = 0.1
+
+
+class Encoder:
+    """Vector layout of one index key and the mapping from feature rows into it"""
+
+    def __init__(self, feature_columns, district_codes=()):
+        self.numeric = [column for column in NUMERIC_SCALES if column in feature_columns]
+        self.one_hot = [column for column in feature_columns
+                        if any(column.startswith(prefix) for prefix in ONE_HOT_WEIGHTS)]
+        self.district_codes = sorted(set(district_codes))
+
+        self.scales = np.array([NUMERIC_SCALES[column] for column in self.numeric])
+        self.defaults = np.array([NUMERIC_DEFAULTS[column] for column in self.numeric])
+        self.positive = np.array([column not in ZERO_ALLOWED for column in self.numeric], dtype=bool)
+        self.weights = np.array([next(weight for prefix, weight in ONE_HOT_WEIGHTS.items() if column.startswith(prefix))
+                                 for column in self.one_hot])
+
+    def encode(self, row):
+        numeric = np.array([_number(row.get(column)) for column in self.numeric], dtype=float)
+        missing = np.isnan(numeric) | (self.positive & (numeric <= 0))
+        numeric = np.where(missing, self.defaults, numeric) / self.scales
+        one_hot = np.array([_number(row.get(column)) or 0.0 for column in self.one_hot], dtype=float)
+        one_hot = np.nan_to_num(one_hot) * self.weights
+        district = [DISTRICT_WEIGHT if row.get('district_code') == code else 0.0 for code in self.district_codes]
+        return np.concatenate([numeric, one_hot, district])
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def encode_payload(asset_type, payload):
+    """``(index key, vector)`` of an evaluation payload or a listing's asset data"""
+    if asset_type == 'apartment':
+        resources = inference.load_apartment_resources()
+        _, row = inference.apartment_feature_row(payload, resources)
+        return 'apartment', _encoder('apartment').encode(row)
+    model_key, row = inference.car_feature_row(payload, inference.load_car_resources())
+    return model_key, _encoder(model_key).encode(row)
+
+
+_encoders = {}
+
+
+def _encoder(key):
+    if key not in _encoders:
+        if key == 'apartment':
+            resources = inference.load_apartment_resources()
+            _encoders[key] = Encoder(resources['feature_columns'], resources['district_codes'].values())
+        else:
+            _encoders[key] = Encoder(inference.load_car_resources()[f'{key}_columns'])
+    return _encoders[key]
+
+
+class ComparablesIndex:
+    """Ball tree over listing vectors with an append buffer and removals"""
+
+    def __init__(self, ids, vectors, leaf_size=40):
+        self.leaf_size = leaf_size
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.vectors = np.asarray(vectors, dtype=float).reshape(len(self.ids), -1) if len(self.ids) else None
+        self.tree = BallTree(self.vectors, leaf_size=leaf_size) if len(self.ids) else None
+        self.built_ids = set(self.ids.tolist())
+        self.removed = set()
+        self.added = {}
+
+    def __len__(self):
+        return len(self.built_ids) - len(self.removed) + len(self.added)
+
+    def add(self, listing_id, vector):
+        if listing_id in self.built_ids:
+            self.removed.add(listing_id)
+        self.added[listing_id] = vector
+        self._maybe_rebuild()
+
+    def remove(self, listing_id):
+        if listing_id in self.built_ids:
+            self.removed.add(listing_id)
+        self.added.pop(listing_id, None)
+        self._maybe_rebuild()
+
+    def query(self, vector, k):
+        """``[(distance, listing_id)]`` of the ``k`` nearest listings, nearest first"""
+        results = []
+        if self.tree is not None:
+            # Ask for enough extra neighbours that removed ones cannot crowd out k live ones
+            count = min(len(self.ids), k + len(self.removed))
+            distances, positions = self.tree.query(vector[None, :], k=count)
+            results = [(float(distance), int(self.ids[position]))
+                       for distance, position in zip(distances[0], positions[0])
+                       if int(self.ids[position]) not in self.removed]
+        if self.added:
+            ids = list(self.added)
+            distances = np.linalg.norm(np.array([self.added[listing_id] for listing_id in ids]) - vector, axis=1)
+            results.extend(zip(distances.tolist(), ids))
+        return sorted(results)[:k]
+
+    def _maybe_rebuild(self):
+        if len(self.added) + len(self.removed) <= max(REBUILD_MIN, REBUILD_FRACTION * len(self.ids)):
+            return
+        keep = np.array([listing_id not in self.removed for listing_id in self.ids.tolist()], dtype=bool)
+        ids = [*self.ids[keep].tolist(), *self.added]
+        vectors = [*self.vectors[keep], *self.added.values()]
+        self.__init__(ids, vectors, leaf_size=self.leaf_size)
+
+
+class Comparables:
+    """Per-key indexes over the active listings, kept in sync with the database"""
+
+    def __init__(self, sync_interval=30):
+        self.sync_interval = sync_interval
+        self._lock = threading.RLock()
+        self._indexes = None
+        self._keys = {}
+        # Active listings whose assets cannot be encoded (malformed details)
+        self._unencodable = set()
+        self._seen = None
+        self._synced_at = 0.0
+
+    def _listings(self):
+        return (MarketplaceListing.objects.select_related('asset')
+                .only('id', 'is_active', 'updated_at', 'asset__asset_type', 'asset__description', 'asset__area',
+                      'asset__rooms', 'asset__floor', 'asset__total_floors', 'asset__year', 'asset__mileage',
+                      'asset__brand', 'asset__model'))
+
+    def build(self):
+        """Rebuild every index from the active listings"""
+        grouped, keys, unencodable, seen = {}, {}, set(), None
+        for listing in self._listings().filter(is_active=True).iterator(chunk_size=2000):
+            seen = listing.updated_at if seen is None else max(seen, listing.updated_at)
+            try:
+                key, vector = encode_payload(listing.asset.asset_type, get_asset_data(listing.asset))
+            except Exception as e:
+                print(f"Error encoding listing {listing.id} for comparables: {e}")
+                unencodable.add(listing.id)
+                continue
+            ids, vectors = grouped.setdefault(key, ([], []))
+            ids.append(listing.id)
+            vectors.append(vector)
+            keys[listing.id] = key
+
+        with self._lock:
+            self._indexes = {key: ComparablesIndex(ids, vectors) for key, (ids, vectors) in grouped.items()}
+            self._keys = keys
+            self._unencodable = unencodable
+            self._seen = seen
+            self._synced_at = time.monotonic()
+
+    def sync(self, force=False):
+        """Build on first use, then apply listings changed in other processes"""
+        if self._indexes is None:
+            self.build()
+            return
+        if not force and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+
+        changed = self._listings()
+        if self._seen is not None:
+            changed = changed.filter(updated_at__gt=self._seen)
+        for listing in changed.order_by('updated_at'):
+            # Advanced past listings that fail to encode too, so they are not retried every sync
+            self.apply_listing(listing)
+            self._seen = listing.updated_at if self._seen is None else max(self._seen, listing.updated_at)
+        # Hard deletes leave no updated_at behind; a count mismatch means a rebuild
+        if MarketplaceListing.objects.filter(is_active=True).count() != len(self._keys) + len(self._unencodable):
+            self.build()
+        self._synced_at = time.monotonic()
+
+    def apply_listing(self, listing):
+        """``listing_saved`` that never raises; a listing that cannot be encoded leaves the index"""
+        try:
+            self.listing_saved(listing)
+        except Exception as e:
+            print(f"Error encoding listing {listing.id} for comparables: {e}")
+            with self._lock:
+                self.listing_removed(listing.id)
+                self._unencodable.add(listing.id)
+
+    def listing_saved(self, listing):
+        if not listing.is_active:
+            self.listing_removed(listing.id)
+            return
+        key, vector = encode_payload(listing.asset.asset_type, get_asset_data(listing.asset))
+        with self._lock:
+            if self._indexes is None:
+                return
+            old_key = self._keys.get(listing.id)
+            if old_key is not None and old_key != key:
+                self._indexes[old_key].remove(listing.id)
+            if key not in self._indexes:
+                self._indexes[key] = ComparablesIndex([], [])
+            self._indexes[key].add(listing.id, vector)
+            self._keys[listing.id] = key
+            self._unencodable.discard(listing.id)
+
+    def listing_removed(self, listing_id):
+        with self._lock:
+            self._unencodable.discard(listing_id)
+            key = self._keys.pop(listing_id, None)
+            if key is not None:
+                self._indexes[key].remove(listing_id)
+
+    def query(self, asset_type, payload, k=10, exclude=()):
+        """``[(distance, listing_id)]`` of the listings nearest to a payload"""
+        self.sync()
+        key, vector = encode_payload(asset_type, payload)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                return []
+            return [result for result in index.query(vector, k + len(exclude)) if result[1] not in exclude][:k]
+
+
+_comparables = None
+_comparables_pid = None
+_comparables_lock = threading.Lock()
+
+
+def get_comparables():
+    """The process-wide comparables service"""
+    global _comparables, _comparables_pid
+    if _comparables_pid != os.getpid():
+        with _comparables_lock:
+            if _comparables_pid != os.getpid():
+                _comparables = Comparables(sync_interval=getattr(settings, 'COMPARABLES_SYNC_INTERVAL', 30))
+                _comparables_pid = os.getpid()
+    return _comparables
+
+
+def listing_changed(listing, deleted=False):
+    """Apply a listing write to this process's indexes, if they are loaded; never raises"""
+    if _comparables is None or _comparables_pid != os.getpid() or _comparables._indexes is None:
+        return
+    if deleted:
+        _comparables.listing_removed(listing.id)
+    else:
+        _comparables.apply_listing(listing)
+
+
+def asset_changed(asset, update_fields=None):
+    """Re-encode the listing of a saved asset when its features changed; never raises"""
+    if _comparables is None or _comparables_pid != os.getpid() or _comparables._indexes is None:
+        return
+    if update_fields is not None and not FEATURE_FIELDS & set(update_fields):
+        return
+    listing = MarketplaceListing.objects.filter(asset=asset).only('id', 'is_active').first()
+    if listing is not None:
+        listing.asset = asset
+        listing_changed(listing)
+
+
+def find_comparables(asset_type, payload, k=10):
+    """The ``k`` active listings most similar to an evaluation payload, with their prices"""
+    nearest = get_comparables().query(asset_type, payload, k=k)
+    listings = MarketplaceListing.objects.filter(id__in=[listing_id for _, listing_id in nearest],
+                                                 is_active=True).select_related('asset')
+    by_id = {listing.id: listing for listing in listings}
+
+    comparables = []
+    for distance, listing_id in nearest:
+        listing = by_id.get(listing_id)
+        if listing is None:
+            continue
+        asset = listing.asset
+        item = {
+            'listing_id': listing.id,
+            'asset_id': asset.id,
+            'name': asset.name,
+            'address': asset.address,
+            'image_url': asset.image_url,
+            'listing_price': float(listing.listing_price),
+            'distance': round(distance, 4),
+        }
+        if asset.asset_type == 'apartment':
+            item.update(area=float(asset.area) if asset.area else None, rooms=asset.rooms, floor=asset.floor,
+                        total_floors=asset.total_floors)
+            if asset.area:
+                item['price_per_m2'] = round(float(listing.listing_price) / float(asset.area), 2)
+        else:
+            item.update(brand=asset.brand, model=asset.model, year=asset.year, mileage=asset.mileage)
+        comparables.append(item)
+
+    prices = [item['listing_price'] for item in comparables]
+    return {
+        'asset_type': asset_type,
+        'count': len(comparables),
+        'median_price': float(np.median(prices)) if prices else None,
+        'comparables': comparables,
+    }
@@ -0,0 +1,77 @@
+"""Deal score of marketplace listings
+
+A listing stores the model estimate of its asset (``estimated_price``) and
+``deal_ratio = listing_price / estimated_price``; below 1 the asking price is
+under the estimate. ``score_listing`` sets both when a listing is created and
+``rescore_listings`` refreshes every active listing after the monthly
+revaluation, one model prediction per batch and asset type. ``?sort=deal`` on
+the marketplace listings orders by the stored ratio (indexed with
+``is_active``), so ranking never runs the model.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import MarketplaceListing
+from .utils import PriceEstimator, get_asset_data
+
+DEAL_FIELDS = ['estimated_price', 'deal_ratio', 'estimated_at']
+
+
+def deal_ratio(listing_price, estimate):
+    """``listing_price / estimate`` rounded to 4 places, None without a positive estimate"""
+    if estimate is None or float(estimate) <= 0:
+        return None
+    return round(float(listing_price) / float(estimate), 4)
+
+
+def estimate_assets(assets, estimator=None):
+    """Model estimates of ``assets`` for the current month, in order; None where unpriced"""
+    estimator = estimator or PriceEstimator()
+    estimates = [None] * len(assets)
+    for asset_type in {asset.asset_type for asset in assets}:
+        positions = [position for position, asset in enumerate(assets) if asset.asset_type == asset_type]
+        prices = estimator.estimate_prices(asset_type, [get_asset_data(assets[position]) for position in positions])
+        for position, price in zip(positions, prices):
+            estimates[position] = None if price is None else round(float(price), 2)
+    return estimates
+
+
+def score_listing(listing, estimate):
+    """Set a listing's estimate and deal ratio; does not save"""
+    listing.estimated_price = estimate
+    listing.deal_ratio = deal_ratio(listing.listing_price, estimate)
+    listing.estimated_at = timezone.now()
+
+
+def rescore_listings(batch_size=500, **filters):
+    """Refresh the estimate and deal ratio of every active listing; returns the number scored"""
+    listings = (MarketplaceListing.objects.filter(is_active=True, **filters).select_related('asset')
+                .order_by('id'))
+    estimator = PriceEstimator()
+    scored = 0
+    batch = []
+    for listing in listings.iterator(chunk_size=batch_size):
+        batch.append(listing)
+        if len(batch) >= batch_size:
+            scored += _score_batch(batch, estimator)
+            batch = []
+    if batch:
+        scored += _score_batch(batch, estimator)
+    return scored
+
+
+def _score_batch(listings, estimator):
+    estimates = estimate_assets([listing.asset for listing in listings], estimator)
+    for listing, estimate in zip(listings, estimates):
+        score_listing(listing, estimate)
+    # One parameterised UPDATE per listing, as in returns._write_batch; no save signals are
+    # needed since the search, comparables and facet inputs are unchanged
+    fields = [MarketplaceListing._meta.get_field(name) for name in DEAL_FIELDS]
+    sql = (f"UPDATE {connection.ops.quote_name(MarketplaceListing._meta.db_table)} SET "
+           f"{', '.join(f'{connection.ops.quote_name(field.column)} = %s' for field in fields)} "
+           f"WHERE {connection.ops.quote_name(MarketplaceListing._meta.pk.column)} = %s")
+    rows = [[field.get_db_prep_save(getattr(listing, field.attname), connection) for field in fields] + [listing.id]
+            for listing in listings]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    return len(listings)
@@ -0,0 +1,425 @@
+"""Input-distribution monitor for evaluation traffic
+
+The evaluate endpoints feed every payload (and its predicted price) to a
+process-wide ``DriftMonitor``. Memory stays fixed however long a worker runs:
+
+* numeric fields go into fixed-edge histograms with count, mean, std, min and
+  max;
+* categorical fields go into Space-Saving sketches that keep the
+  ``DRIFT_SKETCH_SIZE`` most frequent values with bounded over-counts;
+* values the encoders do not know (a mahalla missing from
+  ``mahalla_tuman_codes.csv`` silently becomes code 0, a car model without a
+  ``car_name_*`` column is dropped) are counted separately, with their own
+  sketch, so new categories show up before users complain.
+
+A daemon thread writes each process's snapshot to ``DRIFT_DIR`` every
+``DRIFT_FLUSH_INTERVAL`` seconds; ``merged_snapshot`` adds up the snapshots of
+every process for ``/api/metrics/drift/``. Each flush deletes the snapshots
+nobody rewrote for ``DRIFT_SNAPSHOT_MAX_AGE`` seconds (stopped or restarted
+workers), so the directory does not grow with every deploy.
+"""
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+from . import inference
+
+# Upper bounds of the histogram buckets per numeric field; the last bucket is open
+NUMERIC_FIELDS = {
+    'apartment': {
+        'area': (20, 30, 40, 50, 60, 70, 80, 100, 120, 150, 200, 300),
+        'rooms': (1, 2, 3, 4, 5, 6, 8),
+        'floor': (1, 2, 3, 5, 7, 9, 12, 16, 20, 30),
+        'total_floors': (2, 3, 4, 5, 9, 12, 16, 20, 30),
+        'predicted_price': (10000, 20000, 30000, 40000, 50000, 60000, 80000, 100000,
+                            150000, 200000, 300000, 500000),
+    },
+    'car': {
+        'year': (1990, 2000, 2005, 2010, 2013, 2016, 2018, 2020, 2022, 2024),
+        'mileage': (0, 10000, 30000, 50000, 100000, 150000, 200000, 300000, 500000),
+        'engine_volume': (1.0, 1.2, 1.5, 1.6, 2.0, 2.5, 3.0, 4.0),
+        'predicted_price': (3000, 5000, 7500, 10000, 15000, 20000, 30000, 50000, 100000),
+    },
+}
+
+CATEGORICAL_FIELDS = {
+    'apartment': ('district', 'mahalla', *(field for _, field in inference.APARTMENT_CATEGORICAL_PREFIXES)),
+    'car': ('brand', 'model', 'condition', 'fuel', 'color', 'body_type', 'state'),
+}
+
+_CAR_MAPPINGS = {
+    'condition': inference.CAR_CONDITION_MAPPING,
+    'fuel': inference.CAR_FUEL_MAPPING,
+    'color': inference.CAR_COLOR_MAPPING,
+    'body_type': inference.CAR_BODY_MAPPING,
+    'state': inference.CAR_STATE_MAPPING,
+}
+
+
+def _known_values(asset_type):
+    """Values each categorical field's encoder recognises; None means anything goes"""
+    if asset_type == 'apartment':
+        resources = inference.load_apartment_resources()
+        known = {field: set(mapping) for field, mapping in inference.APARTMENT_VALUE_MAPPINGS.items()}
+        known['district'] = set(resources['district_codes'])
+        known['mahalla'] = set(resources['neighborhood_codes'])
+        return known
+
+    resources = inference.load_car_resources()
+    known = {field: set(mapping) for field, mapping in _CAR_MAPPINGS.items()}
+    # Car names are one-hot columns of the brand's model, so check per model
+    known['model'] = {
+        model_key: {col[len('car_name_'):] for col in resources[f'{model_key}_columns'] if col.startswith('car_name_')}
+        for model_key in ('model3', 'model4')
+    }
+    return known
+
+
+class SpaceSaving:
+    """Top-k frequent values in fixed memory (Metwally et al.'s Space-Saving)
+
+    Each kept value's count over-estimates its true count by at most the
+    count of the value it evicted, which is tracked as ``error``.
+    """
+
+    __slots__ = ('capacity', 'counts', 'errors')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, value, count=1):
+        if value in self.counts:
+            self.counts[value] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[value] = count
+            self.errors[value] = 0
+        else:
+            evicted = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(evicted)
+            del self.errors[evicted]
+            self.counts[value] = floor + count
+            self.errors[value] = floor
+
+    def top(self):
+        return [
+            {'value': value, 'count': count, 'error': self.errors[value]}
+            for value, count in sorted(self.counts.items(), key=lambda item: -item[1])
+        ]
+
+    @classmethod
+    def merge(cls, capacity, entries_lists):
+        sketch = cls(capacity)
+        totals, errors = {}, {}
+        for entries in entries_lists:
+            for entry in entries:
+                totals[entry['value']] = totals.get(entry['value'], 0) + entry['count']
+                errors[entry['value']] = errors.get(entry['value'], 0) + entry['error']
+        for value in sorted(totals, key=lambda value: -totals[value])[:capacity]:
+            sketch.counts[value] = totals[value]
+            sketch.errors[value] = errors[value]
+        return sketch
+
+
+class _Numeric:
+    __slots__ = ('edges', 'buckets', 'count', 'missing', 'total', 'total_sq', 'min', 'max')
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.buckets = [0] * (len(edges) + 1)
+        self.count = self.missing = 0
+        self.total = self.total_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            value = math.nan
+        if math.isnan(value):
+            self.missing += 1
+            return
+        self.buckets[bisect_left(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self):
+        return {
+            'count': self.count, 'missing': self.missing, 'sum': self.total, 'sum_sq': self.total_sq,
+            'min': self.min if self.count else None, 'max': self.max if self.count else None,
+            'edges': list(self.edges), 'buckets': list(self.buckets),
+        }
+
+
+class _Categorical:
+    __slots__ = ('count', 'missing', 'unknown', 'values', 'unknown_values')
+
+    def __init__(self, capacity):
+        self.count = self.missing = self.unknown = 0
+        self.values = SpaceSaving(capacity)
+        self.unknown_values = SpaceSaving(capacity)
+
+    def add(self, value, known):
+        if value is None or value == '':
+            self.missing += 1
+            return
+        value = str(value)
+        self.count += 1
+        self.values.add(value)
+        if known is not None and value not in known:
+            self.unknown += 1
+            self.unknown_values.add(value)
+
+    def snapshot(self):
+        return {
+            'count': self.count, 'missing': self.missing, 'unknown': self.unknown,
+            'top': self.values.top(), 'top_unknown': self.unknown_values.top(),
+        }
+
+
+class DriftMonitor:
+    """Per-process counters for evaluation payloads; see the module docstring"""
+
+    def __init__(self, sketch_size=50):
+        self.sketch_size = sketch_size
+        self.started_at = datetime.now(timezone.utc)
+        self._lock = threading.Lock()
+        self._known = {}
+        self._requests = {asset_type: 0 for asset_type in NUMERIC_FIELDS}
+        self._numeric = {
+            asset_type: {field: _Numeric(edges) for field, edges in fields.items()}
+            for asset_type, fields in NUMERIC_FIELDS.items()
+        }
+        self._categorical = {
+            asset_type: {field: _Categorical(sketch_size) for field in fields}
+            for asset_type, fields in CATEGORICAL_FIELDS.items()
+        }
+
+    def observe(self, asset_type, input_data, predicted_price=None):
+        """Record one evaluation payload of ``asset_type`` ('apartment' or 'car')"""
+        known = self._known.get(asset_type)
+        if known is None:
+            known = self._known[asset_type] = _known_values(asset_type)
+
+        if asset_type == 'car':
+            model_key = 'model3' if input_data.get('brand') in inference.CHEVROLET_BRANDS else 'model4'
+            known = {**known, 'model': known['model'][model_key]}
+
+        with self._lock:
+            self._requests[asset_type] += 1
+            for field, numeric in self._numeric[asset_type].items():
+                numeric.add(predicted_price if field == 'predicted_price' else input_data.get(field))
+            for field, categorical in self._categorical[asset_type].items():
+                categorical.add(input_data.get(field), known.get(field))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'started_at': self.started_at.isoformat(),
+                'written_at': datetime.now(timezone.utc).isoformat(),
+                'sketch_size': self.sketch_size,
+                'asset_types': {
+                    asset_type: {
+                        'requests': self._requests[asset_type],
+                        'numeric': {field: numeric.snapshot() for field, numeric in self._numeric[asset_type].items()},
+                        'categorical': {
+                            field: categorical.snapshot()
+                            for field, categorical in self._categorical[asset_type].items()
+                        },
+                    }
+                    for asset_type in NUMERIC_FIELDS
+                },
+            }
+
+    def snapshot_path(self, directory):
+        return os.path.join(directory, f"{self.started_at:%Y%m%dT%H%M%S}-{os.getpid()}.json")
+
+    def flush(self, directory, max_age=None):
+        """Write this process's snapshot atomically, replacing its previous one
+
+        With ``max_age`` (seconds), snapshots of other processes last written
+        longer ago than that are deleted.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = self.snapshot_path(directory)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+        if max_age is not None:
+            prune_snapshots(directory, max_age, keep=path)
+
+
+def _is_stale(path, max_age, now):
+    try:
+        return now - os.path.getmtime(path) > max_age
+    except OSError:
+        return False
+
+
+def prune_snapshots(directory, max_age, keep=None):
+    """Delete snapshots (and leftover temporary files) not written for ``max_age`` seconds"""
+    now = time.time()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if path == keep or not name.endswith(('.json', '.json.tmp')) or not _is_stale(path, max_age, now):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Another worker pruned it first
+            pass
+
+
+_monitor = None
+_monitor_pid = None
+_monitor_lock = threading.Lock()
+
+
+def _drift_dir():
+    return str(getattr(settings, 'DRIFT_DIR', os.path.join(inference.DATA_PATH, 'drift')))
+
+
+def _max_age():
+    return getattr(settings, 'DRIFT_SNAPSHOT_MAX_AGE', 7 * 24 * 3600)
+
+
+def _flush_loop(monitor, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            monitor.flush(_drift_dir(), max_age=_max_age())
+        except Exception as e:
+            print(f"Error flushing drift metrics: {e}")
+
+
+def get_monitor():
+    """The process-wide monitor, or None when it is disabled in settings"""
+    global _monitor, _monitor_pid
+    if not getattr(settings, 'DRIFT_MONITOR_ENABLED', True):
+        return None
+    # Threads do not survive a fork, so each worker process starts its own flusher
+    if _monitor_pid != os.getpid():
+        with _monitor_lock:
+            if _monitor_pid != os.getpid():
+                _monitor = DriftMonitor(sketch_size=getattr(settings, 'DRIFT_SKETCH_SIZE', 50))
+                threading.Thread(
+                    target=_flush_loop, args=(_monitor, getattr(settings, 'DRIFT_FLUSH_INTERVAL', 60)),
+                    name='drift-flush', daemon=True,
+                ).start()
+                _monitor_pid = os.getpid()
+    return _monitor
+
+
+def observe(asset_type, input_data, predicted_price=None):
+    """Feed one evaluation to the monitor; never lets monitoring break a request"""
+    try:
+        monitor = get_monitor()
+        if monitor is not None:
+            monitor.observe(asset_type, input_data, predicted_price)
+    except Exception as e:
+        print(f"Error recording drift metrics: {e}")
+
+
+def _summarise_numeric(parts, edges):
+    count = sum(part['count'] for part in parts)
+    total = sum(part['sum'] for part in parts)
+    total_sq = sum(part['sum_sq'] for part in parts)
+    mins = [part['min'] for part in parts if part['min'] is not None]
+    maxes = [part['max'] for part in parts if part['max'] is not None]
+    buckets = [sum(values) for values in zip(*(part['buckets'] for part in parts))] or [0] * (len(edges) + 1)
+    mean = total / count if count else None
+    labels = [f'<={edge:g}' for edge in edges] + [f'>{edges[-1]:g}']
+    return {
+        'count': count,
+        'missing': sum(part['missing'] for part in parts),
+        'mean': round(mean, 3) if count else None,
+        'std': round(math.sqrt(max(total_sq / count - mean * mean, 0.0)), 3) if count else None,
+        'min': min(mins) if mins else None,
+        'max': max(maxes) if maxes else None,
+        'histogram': dict(zip(labels, buckets)),
+    }
+
+
+def _summarise_categorical(parts, sketch_size):
+    count = sum(part['count'] for part in parts)
+    unknown = sum(part['unknown'] for part in parts)
+    return {
+        'count': count,
+        'missing': sum(part['missing'] for part in parts),
+        'unknown': unknown,
+        'unknown_rate': round(unknown / count, 4) if count else 0,
+        'top': SpaceSaving.merge(sketch_size, [part['top'] for part in parts]).top(),
+        'top_unknown': SpaceSaving.merge(sketch_size, [part['top_unknown'] for part in parts]).top(),
+    }
+
+
+def merged_snapshot():
+    """Counters of every process that flushed to ``DRIFT_DIR``, this one up to date
+
+    Snapshots of stopped processes count until they are ``DRIFT_SNAPSHOT_MAX_AGE``
+    seconds old, so the totals cover roughly that window.
+    """
+    directory = _drift_dir()
+    max_age = _max_age()
+    now = time.time()
+    snapshots = {}
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.json') or _is_stale(os.path.join(directory, name), max_age, now):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    snapshots[name] = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Skipping unreadable drift snapshot {name}: {e}")
+
+    monitor = get_monitor()
+    if monitor is not None:
+        snapshots[os.path.basename(monitor.snapshot_path(directory))] = monitor.snapshot()
+    if not snapshots:
+        return {'processes': 0, 'since': None, 'asset_types': {}}
+
+    sketch_size = max(snapshot['sketch_size'] for snapshot in snapshots.values())
+    result = {}
+    for asset_type in NUMERIC_FIELDS:
+        parts = [snapshot['asset_types'][asset_type] for snapshot in snapshots.values()
+                 if asset_type in snapshot['asset_types']]
+        result[asset_type] = {
+            'requests': sum(part['requests'] for part in parts),
+            'numeric': {
+                # Snapshots written with other bucket edges cannot be added up
+                field: _summarise_numeric(
+                    [part['numeric'][field] for part in parts
+                     if part['numeric'].get(field, {}).get('edges') == list(edges)],
+                    edges,
+                )
+                for field, edges in NUMERIC_FIELDS[asset_type].items()
+            },
+            'categorical': {
+                field: _summarise_categorical(
+                    [part['categorical'][field] for part in parts if field in part['categorical']], sketch_size,
+                )
+                for field in CATEGORICAL_FIELDS[asset_type]
+            },
+        }
+
+    return {
+        'processes': len(snapshots),
+        'since': min(snapshot['started_at'] for snapshot in snapshots.values()),
+        'asset_types': result,
+    }
@@ -0,0 +1,201 @@
+"""Model explanations: global feature importance and per-prediction contributions
+
+Global importances are computed once per model version (a hash of the model
+file) and persisted under ``data/explanations/``, so neither the API nor the
+Dash app recomputes them on start. Per-prediction contributions come from
+LightGBM's ``pred_contrib``; they sum to the prediction, so an explained
+evaluation needs no separate predict call, and they are cached per encoded
+row.
+
+Importing this module does not touch Django settings, so ``old_dash_app.py``
+can use it directly.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from . import inference
+
+EXPLANATIONS_PATH = os.path.join(inference.DATA_PATH, 'explanations')
+CONTRIBUTION_CACHE_SIZE = 4096
+DEFAULT_TOP_FEATURES = 15
+
+_versions = {}
+_importances = {}
+_lock = threading.Lock()
+
+
+def model_version(model_key):
+    """Content hash of a model file, recomputed only when the file changes"""
+    path = os.path.join(inference.DATA_PATH, inference.MODEL_FILES[model_key])
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _versions.get(model_key)
+    if cached is None or cached[0] != signature:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        cached = (signature, digest.hexdigest()[:16])
+        _versions[model_key] = cached
+    return cached[1]
+
+
+def _booster(model_key):
+    return inference.load_model(model_key)[0]
+
+
+def _feature_names(model_key, booster):
+    names = booster.feature_name()
+    if model_key in ('model3', 'model4'):
+        # Car boosters were trained on scaled arrays, so they only know Column_<n>
+        columns = [col for col in inference.load_car_resources()[f'{model_key}_columns']
+                   if col not in inference.CAR_DROPPED_COLUMNS[model_key]]
+        if len(columns) == len(names):
+            return columns
+    return names
+
+
+def global_importances(model_key, booster=None):
+    """Split and gain importance of every feature, most important (by gain) first
+
+    Loaded from ``data/explanations/<model>-<version>.json`` when present and
+    computed and written there otherwise. ``booster`` lets callers that already
+    hold the model skip loading it.
+    """
+    version = model_version(model_key)
+    key = (model_key, version)
+    if key in _importances:
+        return _importances[key]
+
+    with _lock:
+        if key in _importances:
+            return _importances[key]
+
+        path = os.path.join(EXPLANATIONS_PATH, f'{model_key}-{version}.json')
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                importances = json.load(f)
+        else:
+            booster = booster if booster is not None else _booster(model_key)
+            split = booster.feature_importance(importance_type='split')
+            gain = booster.feature_importance(importance_type='gain')
+            features = [
+                {'feature': name, 'split': int(s), 'gain': round(float(g), 6)}
+                for name, s, g in zip(_feature_names(model_key, booster), split, gain)
+            ]
+            features.sort(key=lambda feature: feature['gain'], reverse=True)
+            importances = {'model': model_key, 'model_version': version, 'features': features}
+
+            # Write to a temporary file first so concurrent readers never see a partial file
+            os.makedirs(EXPLANATIONS_PATH, exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(importances, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+        _importances[key] = importances
+        return importances
+
+
+class _ContributionCache:
+    """Bounded LRU of contribution rows keyed by model, version and encoded row bytes"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+contribution_cache = _ContributionCache(CONTRIBUTION_CACHE_SIZE)
+
+
+def contributions(model_key, df):
+    """``pred_contrib`` for every row of an encoded frame, in one call for the uncached rows
+
+    Returns an ``(n_rows, n_features + 1)`` array; the last column is the base
+    value and each row sums to the model's prediction. Car frames go through
+    their scaler first when it was not folded into the model, as in
+    ``inference.predict``.
+    """
+    values = np.ascontiguousarray(df.to_numpy(dtype=np.float64))
+    version = model_version(model_key)
+    keys = [(model_key, version, hashlib.blake2b(row.tobytes(), digest_size=16).digest()) for row in values]
+
+    result = np.empty((len(values), values.shape[1] + 1))
+    missing = []
+    for i, key in enumerate(keys):
+        cached = contribution_cache.get(key)
+        if cached is None:
+            missing.append(i)
+        else:
+            result[i] = cached
+
+    if missing:
+        rows = df.iloc[missing]
+        scaler = inference.load_model(model_key)[1]
+        if scaler is not None:
+            rows = scaler.transform(rows)
+        computed = _booster(model_key).predict(rows, pred_contrib=True)
+        for i, row in zip(missing, computed):
+            result[i] = row
+            contribution_cache.set(keys[i], row)
+    return result
+
+
+def explanation(model_key, df, row_contributions, top=DEFAULT_TOP_FEATURES):
+    """Largest contributions of one encoded row, with the remainder summed into ``other``"""
+    feature_contributions = row_contributions[:-1]
+    order = np.argsort(-np.abs(feature_contributions))
+
+    return {
+        'model': model_key,
+        'model_version': model_version(model_key),
+        'base_value': round(float(row_contributions[-1]), 2),
+        'contributions': [
+            {
+                'feature': df.columns[i],
+                'value': float(df.iat[0, i]),
+                'contribution': round(float(feature_contributions[i]), 2),
+            }
+            for i in order[:top]
+        ],
+        'other': round(float(feature_contributions[order[top:]].sum()), 2),
+    }
+
+
+def explain_apartment(input_data, top=DEFAULT_TOP_FEATURES):
+    """Apartment evaluation plus the contributions behind it"""
+    model_key, df = inference.encode_apartment(input_data)
+    row_contributions = contributions(model_key, df)[0]
+    result = inference.apartment_result(float(row_contributions.sum()), input_data)
+    result['explanation'] = explanation(model_key, df, row_contributions, top)
+    return result
+
+
+def explain_car(input_data, top=DEFAULT_TOP_FEATURES):
+    """Car evaluation plus the contributions behind it"""
+    model_key, df = inference.encode_car(input_data)
+    row_contributions = contributions(model_key, df)[0]
+    result = inference.car_result(float(row_contributions.sum()))
+    result['explanation'] = explanation(model_key, df, row_contributions, top)
+    return result
@@ -0,0 +1,110 @@
+"""Streaming export of a portfolio's assets with their full value history
+
+``export_lines`` walks the assets, their history rows and their archives as
+three server-side iterators ordered by asset id and merges them one asset at
+a time, so memory depends on the longest single history rather than on the
+portfolio. Archived months are included, as in ``asset_value_history``.
+
+CSV has one line per history entry with the asset's fields repeated (an asset
+without history gets one line with empty ``date``/``value``); NDJSON has one
+object per asset with its ``history`` as ``[date, value]`` pairs.
+``stream_export`` groups lines into blocks and optionally gzips them on the
+fly.
+"""
+import csv
+import io
+import json
+import zlib
+
+from .history import merge_archived
+from .models import Asset, AssetValueArchive, AssetValueHistory
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+ASSET_FIELDS = [
+    'id', 'asset_type', 'name', 'address', 'current_value', 'purchase_price', 'purchase_date',
+    'area', 'rooms', 'floor', 'total_floors', 'year', 'mileage', 'brand', 'model', 'description',
+]
+CSV_HEADER = ['asset_id', *ASSET_FIELDS[1:], 'date', 'value']
+# Bytes collected before a block is written out (before compression)
+BLOCK_SIZE = 64 * 1024
+
+
+def iter_asset_history(portfolio, chunk_size=2000):
+    """``(asset values tuple, [(date, value), ...])`` for every asset of ``portfolio``, by id"""
+    assets = (Asset.objects.filter(portfolio=portfolio).order_by('id')
+              .values_list(*ASSET_FIELDS).iterator(chunk_size=chunk_size))
+    rows = (AssetValueHistory.objects.filter(asset__portfolio=portfolio).order_by('asset_id', 'date', 'id')
+            .values_list('asset_id', 'date', 'value').iterator(chunk_size=chunk_size))
+    archives = (AssetValueArchive.objects.filter(asset__portfolio=portfolio).order_by('asset_id')
+                .iterator(chunk_size=chunk_size))
+
+    row = next(rows, None)
+    archive = next(archives, None)
+    for asset in assets:
+        asset_id = asset[0]
+        entries = []
+        # Rows and archives of assets that left the portfolio mid-export are skipped
+        while row is not None and row[0] <= asset_id:
+            if row[0] == asset_id:
+                entries.append((row[1], float(row[2])))
+            row = next(rows, None)
+        while archive is not None and archive.asset_id < asset_id:
+            archive = next(archives, None)
+        if archive is not None and archive.asset_id == asset_id:
+            entries = merge_archived(entries, archive)
+        yield asset, entries
+
+
+def _csv_lines(assets):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue()
+    for asset, entries in assets:
+        buffer.seek(0)
+        buffer.truncate()
+        for day, value in entries or [('', '')]:
+            writer.writerow([*asset, day, value])
+        yield buffer.getvalue()
+
+
+def _ndjson_lines(assets):
+    for asset, entries in assets:
+        record = dict(zip(ASSET_FIELDS, asset))
+        record['history'] = [[day.isoformat(), value] for day, value in entries]
+        yield json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+
+def export_lines(portfolio, fmt, chunk_size=2000):
+    """Text lines of a portfolio export in ``fmt`` (a key of ``FORMATS``)"""
+    assets = iter_asset_history(portfolio, chunk_size=chunk_size)
+    return _csv_lines(assets) if fmt == 'csv' else _ndjson_lines(assets)
+
+
+def stream_export(lines, use_gzip=False):
+    """UTF-8 blocks of about ``BLOCK_SIZE`` bytes from ``lines``, gzip-compressed when asked"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None
+    block, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        block.append(data)
+        size += len(data)
+        if size >= BLOCK_SIZE:
+            data = b''.join(block)
+            block, size = [], 0
+            if compressor is None:
+                yield data
+            else:
+                compressed = compressor.compress(data)
+                if compressed:
+                    yield compressed
+
+    data = b''.join(block)
+    if compressor is None:
+        if data:
+            yield data
+    else:
+        yield compressor.compress(data) + compressor.flush()
@@ -0,0 +1,150 @@
+"""Marketplace filter counts kept in ``MarketplaceFacetCount``
+
+Every active listing contributes one count to each facet it has a value for:
+its asset type, the district in its asset details, the number of rooms
+(apartments), the brand (cars) and its price bucket. Listing and asset signals
+read the values a listing contributed before the write and apply the
+difference, so serving the counts reads a few dozen rows however many
+listings there are. ``reconcile`` recounts from the listings and corrects any
+drift (bulk writes bypass signals); run it nightly with
+``manage.py reconcile_marketplace_facets``.
+"""
+import json
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import MarketplaceFacetCount, MarketplaceListing
+
+FACETS = ('asset_type', 'district', 'rooms', 'brand', 'price')
+# Lower edges of the listing price buckets, in dollars; the last bucket is open-ended
+PRICE_EDGES = (0, 5_000, 10_000, 20_000, 50_000, 100_000, 200_000)
+MAX_ROOMS = 5
+VALUE_LENGTH = 100
+# Asset fields that decide a listing's facet values
+ASSET_FIELDS = {'asset_type', 'description', 'rooms', 'brand'}
+
+
+def price_bucket(price):
+    """Label of the bucket holding ``price``, e.g. ``'10000-20000'`` or ``'200000+'``"""
+    price = float(price)
+    for lower, upper in zip(PRICE_EDGES, PRICE_EDGES[1:]):
+        if price < upper:
+            return f'{lower}-{upper}'
+    return f'{PRICE_EDGES[-1]}+'
+
+
+def _district(description):
+    try:
+        details = json.loads(description) if description else {}
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(details, dict) or not details.get('district'):
+        return None
+    return str(details['district']).strip() or None
+
+
+def facet_values(asset_type, description, rooms, brand, price):
+    """``[(facet, value)]`` one active listing counts towards"""
+    values = [('asset_type', asset_type), ('price', price_bucket(price))]
+    district = _district(description)
+    if district:
+        values.append(('district', district[:VALUE_LENGTH]))
+    if asset_type == 'apartment' and rooms:
+        values.append(('rooms', str(rooms) if rooms < MAX_ROOMS else f'{MAX_ROOMS}+'))
+    if asset_type == 'car' and brand:
+        values.append(('brand', brand[:VALUE_LENGTH]))
+    return values
+
+
+def listing_values(listing):
+    if listing is None or not listing.is_active:
+        return []
+    asset = listing.asset
+    return facet_values(asset.asset_type, asset.description, asset.rooms, asset.brand, listing.listing_price)
+
+
+def stored_values(**filters):
+    """Facet values of the listing matching ``filters`` as it is in the database"""
+    return listing_values(MarketplaceListing.objects.filter(**filters).select_related('asset').first())
+
+
+def apply_change(old, new):
+    """Move one listing's counts from its ``old`` facet values to its ``new`` ones"""
+    deltas = Counter(new)
+    deltas.subtract(Counter(old))
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        for (facet, value), delta in deltas.items():
+            if not MarketplaceFacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta):
+                MarketplaceFacetCount.objects.create(facet=facet, value=value, count=max(delta, 0))
+
+
+def _sort_key(facet, value, count):
+    if facet == 'price':
+        return float(value.split('-')[0].rstrip('+'))
+    if facet == 'rooms':
+        return int(value.rstrip('+'))
+    return -count
+
+
+def facet_counts():
+    """``{facet: [{'value', 'count'}, ...]}`` of the non-empty values
+
+    Prices and rooms come in bucket order (price items also carry ``min`` and
+    ``max``, ``max`` None for the last bucket), other facets by count.
+    """
+    counts = {facet: [] for facet in FACETS}
+    for facet, value, count in MarketplaceFacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count'):
+        if facet in counts:
+            counts[facet].append((value, count))
+
+    result = {}
+    for facet, items in counts.items():
+        items.sort(key=lambda item: (_sort_key(facet, *item), item[0]))
+        result[facet] = []
+        for value, count in items:
+            item = {'value': value, 'count': count}
+            if facet == 'price':
+                lower, _, upper = value.partition('-')
+                item['min'] = int(lower.rstrip('+'))
+                item['max'] = int(upper) if upper else None
+            result[facet].append(item)
+    return result
+
+
+def recount(chunk_size=2000):
+    """Counter of ``(facet, value)`` over the active listings"""
+    counts = Counter()
+    listings = (MarketplaceListing.objects.filter(is_active=True).order_by()
+                .values_list('asset__asset_type', 'asset__description', 'asset__rooms', 'asset__brand',
+                             'listing_price'))
+    for row in listings.iterator(chunk_size=chunk_size):
+        counts.update(facet_values(*row))
+    return counts
+
+
+def reconcile(dry_run=False):
+    """Correct stored counts that differ from a recount; returns ``[(facet, value, stored, actual)]``"""
+    with transaction.atomic():
+        actual = recount()
+        stored = {(row.facet, row.value): row for row in MarketplaceFacetCount.objects.select_for_update()}
+        corrections = []
+        for key in sorted(set(actual) | set(stored)):
+            row = stored.get(key)
+            stored_count = row.count if row is not None else 0
+            if stored_count != actual[key]:
+                corrections.append((*key, stored_count, actual[key]))
+            if dry_run:
+                continue
+            if row is None:
+                MarketplaceFacetCount.objects.create(facet=key[0], value=key[1], count=actual[key])
+            elif not actual[key]:
+                row.delete()
+            elif row.count != actual[key]:
+                row.count = actual[key]
+                row.save(update_fields=['count'])
+        return corrections
@@ -0,0 +1,121 @@
+"""Fold a StandardScaler into a LightGBM booster's split thresholds
+
+Trees only compare a feature against thresholds, and ``(x - mean) / scale <= t``
+is the same test as ``x <= t * scale + mean``. Rewriting every numerical
+threshold that way gives a booster that scores raw features directly, taking
+the scaler transform off the prediction path.
+
+Splits that cannot be rewritten exactly make ``fold_scaler`` raise
+``ValueError``: categorical splits (the category is the scaled value itself)
+and the "zero as missing" missing type (it tests the scaled value against 0).
+Linear trees are rejected too.
+
+Splits without a missing type compare a missing value as 0, which on scaled
+features is the mean. They are rewritten as "NaN as missing" splits whose
+default branch is the one 0 took, so missing values still route as the mean.
+"""
+import re
+
+import lightgbm as lgb
+import numpy as np
+
+_CATEGORICAL_MASK = 1
+_DEFAULT_LEFT_MASK = 2
+_MISSING_TYPE_NONE = 0
+_MISSING_TYPE_ZERO = 1
+_MISSING_TYPE_NAN = 2
+
+
+def _floats(line):
+    return [float(value) for value in line.split('=', 1)[1].split()]
+
+
+def _format(values):
+    # repr keeps every digit, so thresholds round-trip exactly
+    return ' '.join(repr(float(value)) for value in values)
+
+
+def fold_scaler(booster, scaler):
+    """A new booster that takes unscaled features and predicts what ``booster`` does on scaled ones"""
+    n_features = booster.num_feature()
+    if getattr(scaler, 'n_features_in_', n_features) != n_features:
+        raise ValueError(f'Scaler has {scaler.n_features_in_} features, the booster {n_features}')
+
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+
+    lines = booster.model_to_string().split('\n')
+    split_features = None
+    threshold_index = None
+
+    for i, line in enumerate(lines):
+        if line.startswith('Tree='):
+            split_features, threshold_index = None, None
+        elif line.startswith('feature_infos='):
+            lines[i] = 'feature_infos=' + ' '.join(
+                _fold_feature_info(info, mean[f], scale[f]) for f, info in enumerate(line.split('=', 1)[1].split())
+            )
+        elif line.startswith('is_linear=') and line != 'is_linear=0':
+            raise ValueError('Linear trees cannot be folded')
+        elif line.startswith('split_feature='):
+            split_features = [int(value) for value in line.split('=', 1)[1].split()]
+        elif line.startswith('threshold='):
+            threshold_index = i
+        elif line.startswith('decision_type='):
+            decision_types = [int(value) for value in line.split('=', 1)[1].split()]
+            if any(decision & _CATEGORICAL_MASK for decision in decision_types):
+                raise ValueError('Categorical splits cannot be folded')
+            if any((decision >> 2) & 3 == _MISSING_TYPE_ZERO for decision in decision_types):
+                raise ValueError('Splits treating zero as missing cannot be folded')
+
+            features = np.array(split_features)
+            thresholds = np.array(_floats(lines[threshold_index]))
+            lines[threshold_index] = 'threshold=' + _format(thresholds * scale[features] + mean[features])
+            lines[i] = 'decision_type=' + ' '.join(
+                str(_fold_decision(decision, threshold)) for decision, threshold in zip(decision_types, thresholds)
+            )
+
+    return lgb.Booster(model_str=_with_tree_sizes('\n'.join(lines)))
+
+
+def _fold_decision(decision, threshold):
+    """Decision type that routes NaN the way the scaled model routed it as 0"""
+    if (decision >> 2) & 3 != _MISSING_TYPE_NONE:
+        return decision
+    decision = (decision & ~(3 << 2)) | (_MISSING_TYPE_NAN << 2)
+    if 0.0 <= threshold:
+        return decision | _DEFAULT_LEFT_MASK
+    return decision & ~_DEFAULT_LEFT_MASK
+
+
+def _with_tree_sizes(model_str):
+    """Recompute the header's byte size of every tree block after thresholds changed length"""
+    starts = [match.start() for match in re.finditer(r'^Tree=', model_str, re.MULTILINE)]
+    if not starts:
+        return model_str
+    ends = starts[1:] + [model_str.index('end of trees')]
+    sizes = ' '.join(str(len(model_str[start:end].encode('utf-8'))) for start, end in zip(starts, ends))
+
+    lines = model_str.split('\n')
+    for i, line in enumerate(lines):
+        if line.startswith('tree_sizes='):
+            lines[i] = f'tree_sizes={sizes}'
+            break
+    return '\n'.join(lines)
+
+
+def _fold_feature_info(info, mean, scale):
+    # Numerical features are "[min:max]", unused ones "none", categorical ones a list
+    if not info.startswith('['):
+        return info
+    low, high = (float(value) for value in info[1:-1].split(':'))
+    return f'[{repr(low * scale + mean)}:{repr(high * scale + mean)}]'
+
+
+def fold_or_keep(booster, scaler):
+    """``(folded_booster, None)``, or ``(booster, scaler)`` unchanged when folding is not possible"""
+    try:
+        return fold_scaler(booster, scaler), None
+    except ValueError as e:
+        print(f"Keeping scaler in front of the model: {e}")
+        return booster, scaler
@@ -0,0 +1,172 @@
+"""Asset value history split between recent rows and packed monthly archives
+
+``AssetValueHistory`` keeps one row per value change. Rows older than the
+retention window are rolled up by ``archive_history`` into one
+``AssetValueArchive`` per asset: the last value of each month packed as
+little-endian float64s from ``start_month``, NaN where a month has no value.
+That is 8 bytes per asset-month instead of a row plus its index entries.
+
+Readers go through ``asset_value_history`` / ``value_on_or_before`` (and
+``archived_rows`` for the analytics matrix), which merge both so callers do
+not care where a month is stored. When a month is both archived and present
+as a row, the row wins.
+"""
+from datetime import date
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AssetValueArchive, AssetValueHistory
+
+ARCHIVE_DTYPE = np.dtype('<f8')
+DEFAULT_KEEP_MONTHS = 24
+
+
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def month_start(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def pack(values):
+    return np.asarray(values, dtype=ARCHIVE_DTYPE).tobytes()
+
+
+def unpack(archive):
+    """``(first month index, float64 array)`` of an archive"""
+    return month_index(archive.start_month), np.frombuffer(bytes(archive.values), dtype=ARCHIVE_DTYPE)
+
+
+def archived_entries(archive):
+    """``(first day of month, value)`` for every archived month that has a value"""
+    start, values = unpack(archive)
+    return [(month_start(start + offset), round(float(values[offset]), 2))
+            for offset in np.flatnonzero(~np.isnan(values))]
+
+
+def asset_value_history(asset, limit=None):
+    """Ascending ``(date, value)`` pairs of an asset's history, archived months included
+
+    ``limit`` keeps the first (oldest) entries, like slicing the ascending rows.
+    """
+    rows = AssetValueHistory.objects.filter(asset=asset).order_by('date').values_list('date', 'value')
+    if limit is not None:
+        rows = rows[:limit]
+    entries = merge_archived([(day, float(value)) for day, value in rows],
+                             AssetValueArchive.objects.filter(asset=asset).first())
+    return entries if limit is None else entries[:limit]
+
+
+def merge_archived(entries, archive):
+    """Ascending ``(date, value)`` rows of one asset merged with its archive (or None)
+
+    Archived months that also have a row are dropped, so the row wins.
+    """
+    if archive is None:
+        return entries
+    row_months = {month_index(day) for day, _ in entries}
+    archived = [entry for entry in archived_entries(archive) if month_index(entry[0]) not in row_months]
+    return sorted(archived + entries, key=lambda entry: entry[0])
+
+
+def value_on_or_before(asset, day):
+    """The latest recorded value on or before ``day``, or None"""
+    row = (AssetValueHistory.objects.filter(asset=asset, date__lte=day)
+           .order_by('-date', '-id').values_list('value', flat=True).first())
+    if row is not None:
+        return float(row)
+
+    # Archived months all precede the rows, so only look there when no row qualifies
+    archive = AssetValueArchive.objects.filter(asset=asset).first()
+    return None if archive is None else archived_value_on_or_before(archive, day)
+
+
+def archived_value_on_or_before(archive, day):
+    """The latest archived value in or before the month of ``day``, or None"""
+    start, values = unpack(archive)
+    values = values[:max(month_index(day) - start + 1, 0)]
+    known = np.flatnonzero(~np.isnan(values))
+    return round(float(values[known[-1]]), 2) if len(known) else None
+
+
+def archived_rows(**filters):
+    """Archived months of the archives matching ``filters`` as flat ``(asset_id, day, value)`` arrays
+
+    Days are ``datetime64[D]`` month starts, so the result lines up with history
+    rows loaded through a raw cursor.
+    """
+    archives = AssetValueArchive.objects.filter(**filters).values_list('asset_id', 'start_month', 'values')
+    ids, days, values = [], [], []
+    for asset_id, start_month, packed in archives:
+        series = np.frombuffer(bytes(packed), dtype=ARCHIVE_DTYPE)
+        known = np.flatnonzero(~np.isnan(series))
+        ids.append(np.full(len(known), asset_id, dtype=np.int64))
+        days.append((np.datetime64(start_month, 'M') + known).astype('datetime64[D]'))
+        values.append(series[known])
+    if not ids:
+        return np.array([], dtype=np.int64), np.array([], dtype='datetime64[D]'), np.array([])
+    return np.concatenate(ids), np.concatenate(days), np.concatenate(values)
+
+
+def archive_history(keep_months=DEFAULT_KEEP_MONTHS, batch_size=500, today=None, dry_run=False):
+    """Roll rows older than the last ``keep_months`` months into the per-asset archives
+
+    Each batch of assets is archived and its rows deleted in one transaction.
+    Returns ``(assets, rows)`` archived (or that would be, with ``dry_run``).
+    """
+    today = today or date.today()
+    cutoff = month_start(month_index(today) - keep_months + 1)
+    old_rows = AssetValueHistory.objects.filter(date__lt=cutoff)
+    asset_ids = list(old_rows.order_by('asset_id').values_list('asset_id', flat=True).distinct())
+    if dry_run:
+        return len(asset_ids), old_rows.count()
+
+    archived = 0
+    for i in range(0, len(asset_ids), batch_size):
+        batch = asset_ids[i:i + batch_size]
+        with transaction.atomic():
+            archived += _archive_batch(batch, cutoff)
+    return len(asset_ids), archived
+
+
+def _archive_batch(asset_ids, cutoff):
+    rows = (AssetValueHistory.objects.filter(asset_id__in=asset_ids, date__lt=cutoff)
+            .order_by('asset_id', 'date', 'id').values_list('asset_id', 'date', 'value'))
+    months = {}
+    count = 0
+    for asset_id, day, value in rows:
+        # Ascending order, so the last row of a month wins
+        months.setdefault(asset_id, {})[month_index(day)] = float(value)
+        count += 1
+
+    archives = {archive.asset_id: archive for archive in AssetValueArchive.objects.filter(asset_id__in=asset_ids)}
+    to_create, to_update = [], []
+    for asset_id, values_by_month in months.items():
+        archive = archives.get(asset_id)
+        first, last = min(values_by_month), max(values_by_month)
+        if archive is not None:
+            start, existing = unpack(archive)
+            first, last = min(first, start), max(last, start + len(existing) - 1)
+
+        series = np.full(last - first + 1, np.nan)
+        if archive is not None:
+            series[start - first:start - first + len(existing)] = existing
+        series[np.array(list(values_by_month)) - first] = list(values_by_month.values())
+
+        if archive is None:
+            to_create.append(AssetValueArchive(asset_id=asset_id, start_month=month_start(first), values=pack(series)))
+        else:
+            archive.start_month = month_start(first)
+            archive.values = pack(series)
+            to_update.append(archive)
+
+    AssetValueArchive.objects.bulk_create(to_create)
+    # bulk_update skips auto_now, so refresh updated_at by hand
+    for archive in to_update:
+        archive.updated_at = timezone.now()
+    AssetValueArchive.objects.bulk_update(to_update, ['start_month', 'values', 'updated_at'])
+    AssetValueHistory.objects.filter(asset_id__in=asset_ids, date__lt=cutoff).delete()
+    return count
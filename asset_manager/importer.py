@@ -0,0 +1,204 @@
+"""Bulk import of assets into a portfolio from CSV or NDJSON
+
+``import_assets`` consumes records as they are parsed from the request body
+and works in chunks: a chunk is validated with ``AssetImportSerializer``,
+priced with one base-price prediction per asset type, and its assets, their
+estimated 12-month history and their rolling changes are written in one
+transaction. The result matches creating each asset through
+``/api/assets/``, without the per-asset model loads and queries.
+
+Columns that are not asset fields (``district``, ``mahalla``, ``fuel`` ...)
+become the JSON details stored in ``description`` when no description is
+given; a missing ``current_value`` is filled with the model estimate.
+"""
+import csv
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import temporal
+from .bulk_scoring import LIST_FIELDS, LIST_SEPARATOR
+from .models import Asset, AssetValueHistory
+from .returns import recompute_changes
+from .serializers import AssetImportSerializer
+from .utils import PriceEstimator, get_asset_data
+
+FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+# Row errors reported per chunk; the counts always cover every row
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportFileError(Exception):
+    """The body cannot be read as the declared format"""
+
+
+def read_csv(lines):
+    """``(line, record, error)`` per CSV row; empty cells are left out"""
+    reader = csv.DictReader(line.decode('utf-8-sig') if isinstance(line, bytes) else line for line in lines)
+    for record in reader:
+        if None in record:
+            yield reader.line_num, None, 'More values than header columns'
+            continue
+        yield reader.line_num, {field: value for field, value in record.items() if value not in (None, '')}, None
+
+
+def read_ndjson(lines):
+    """``(line, record, error)`` per non-empty NDJSON line"""
+    for number, line in enumerate(lines, start=1):
+        line = line.decode('utf-8-sig') if isinstance(line, bytes) else line
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield number, None, 'Expected a JSON object'
+            continue
+        yield number, {field: value for field, value in record.items() if value is not None}, None
+
+
+def read_records(lines, fmt):
+    if fmt == 'csv':
+        return read_csv(lines)
+    if fmt == 'ndjson':
+        return read_ndjson(lines)
+    raise ImportFileError(f'Unsupported format: {fmt}')
+
+
+def _split_record(record):
+    """Asset fields and the remaining columns as details"""
+    fields = set(AssetImportSerializer.Meta.fields)
+    asset_fields = {field: value for field, value in record.items() if field in fields}
+    details = {}
+    for field, value in record.items():
+        if field in fields:
+            continue
+        if field in LIST_FIELDS['apartment'] + LIST_FIELDS['car'] and isinstance(value, str):
+            value = [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+        details[field] = value
+    if details and 'description' not in asset_fields:
+        asset_fields['description'] = json.dumps(details, ensure_ascii=False)
+    return asset_fields
+
+
+def import_assets(portfolio, records, chunk_size=1000, max_rows=None):
+    """Import ``(line, record, error)`` tuples into ``portfolio``, yielding progress per chunk
+
+    Each progress dict has running ``rows``/``created``/``failed`` counts,
+    ``elapsed`` seconds and the chunk's row ``errors`` as ``{'line', 'errors'}``.
+    A chunk that fails to write counts all its rows as failed and the import
+    goes on with the next one.
+    """
+    started = time.perf_counter()
+    totals = {'rows': 0, 'created': 0, 'failed': 0}
+    estimator = PriceEstimator()
+
+    chunk = []
+    for line, record, error in records:
+        if max_rows is not None and totals['rows'] + len(chunk) >= max_rows:
+            raise ImportFileError(f'More than {max_rows} rows')
+        chunk.append((line, record, error))
+        if len(chunk) >= chunk_size:
+            yield _progress(totals, _import_chunk(portfolio, chunk, estimator), started)
+            chunk = []
+    if chunk or not totals['rows']:
+        yield _progress(totals, _import_chunk(portfolio, chunk, estimator), started)
+
+
+def _progress(totals, result, started):
+    rows, created, errors = result
+    totals['rows'] += rows
+    totals['created'] += created
+    totals['failed'] += rows - created
+    return {**totals, 'elapsed': round(time.perf_counter() - started, 2), 'errors': errors[:MAX_REPORTED_ERRORS]}
+
+
+def _import_chunk(portfolio, chunk, estimator):
+    errors = [{'line': line, 'errors': error} for line, record, error in chunk if error]
+    parsed = [(line, record) for line, record, error in chunk if not error]
+
+    # One serializer validates every row, so a bad row only rejects itself
+    serializer = AssetImportSerializer()
+    assets, lines = [], []
+    for line, record in parsed:
+        try:
+            row = serializer.run_validation(_split_record(record))
+        except ValidationError as e:
+            errors.append({'line': line, 'errors': e.detail})
+            continue
+        assets.append(Asset(portfolio=portfolio, **row))
+        lines.append(line)
+
+    base_prices = _base_prices(assets, estimator)
+    priced, priced_lines = [], []
+    for asset, line, base_price in zip(assets, lines, base_prices):
+        if asset.current_value is None:
+            if np.isnan(base_price):
+                errors.append({'line': line, 'errors': {'current_value': ['Not given and the model cannot estimate it']}})
+                continue
+            asset.current_value = round(max(0.0, float(base_price)), 2)
+        priced.append((asset, base_price))
+        priced_lines.append(line)
+
+    try:
+        with transaction.atomic():
+            created = Asset.objects.bulk_create([asset for asset, _ in priced])
+            AssetValueHistory.objects.bulk_create(_history(priced))
+            recompute_changes(id__in=[asset.id for asset in created])
+    except Exception as e:
+        print(f"Error importing assets into portfolio {portfolio.id}: {e}")
+        errors.extend({'line': line, 'errors': str(e)} for line in priced_lines)
+        return len(chunk), 0, sorted(errors, key=lambda error: error['line'])
+    return len(chunk), len(created), sorted(errors, key=lambda error: error['line'])
+
+
+def _base_prices(assets, estimator):
+    """One base-model price per asset, NaN where it cannot be priced"""
+    prices = np.full(len(assets), np.nan)
+    for asset_type in ('apartment', 'car'):
+        rows = [i for i, asset in enumerate(assets) if asset.asset_type == asset_type]
+        if rows:
+            prices[rows] = estimator.get_base_prices(asset_type, [get_asset_data(assets[i]) for i in rows])
+    return prices
+
+
+def _history(priced):
+    """The entries ``generate_historical_prices`` and ``AssetCreateSerializer`` write for each asset"""
+    today = datetime.now().date()
+    month_start = today.replace(day=1)
+    past = [today - relativedelta(months=i) for i in range(12, 0, -1)]
+    years, months = [day.year for day in past], [day.month for day in past]
+
+    entries = []
+    for asset_type, fingerprint, multipliers in [
+        ('apartment', temporal.apartment_fingerprint, temporal.apartment_multipliers),
+        ('car', temporal.car_fingerprint, temporal.car_multipliers),
+    ]:
+        group = [(asset, base_price) for asset, base_price in priced if asset.asset_type == asset_type]
+        if not group:
+            continue
+        asset_data = [get_asset_data(asset) for asset, _ in group]
+        values = np.maximum(0, np.array([base_price for _, base_price in group])[:, None]
+                            * multipliers([fingerprint(data) for data in asset_data], years, months))
+        for (asset, _), asset_values in zip(group, values):
+            entries.extend(
+                AssetValueHistory(asset=asset, value=round(float(value), 2), date=day)
+                for day, value in zip(past, asset_values) if value and not np.isnan(value)
+            )
+
+    for asset, _ in priced:
+        entries.append(AssetValueHistory(asset=asset, value=asset.current_value, date=today))
+        if today != month_start:
+            entries.append(AssetValueHistory(asset=asset, value=asset.current_value, date=month_start))
+    return entries
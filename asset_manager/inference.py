@@ -0,0 +1,504 @@
+import os
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import joblib
+import pandas as pd
+from django.conf import settings
+
+from . import valuation_log
+from .batching import MicroBatcher
+from .folding import fold_or_keep
+from .inference_socket import InferenceClient
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, 'data')
+
+CHEVROLET_BRANDS = ['Chevrolet', 'Ravon', 'Daewoo']
+
+# Serialized boosters in data/; model1/model2 price apartments, model3/model4 cars
+MODEL_FILES = {
+    'model1': 'GBM_MADEL_WITHOUT_DISTANCE.pkl',
+    'model2': 'model2.pkl',
+    'model3': 'CHEVROLET_DAEWOO_RAVON_LGBM_41.pkl',
+    'model4': 'CLEANDED_DATA_FOREIGN_LGBM.pkl',
+}
+
+# StandardScalers the car models were trained behind
+SCALER_FILES = {
+    'model3': 'scaler_CHEVROLET-DAEWOO-RAVON.pkl',
+    'model4': 'scaler_foreign_cleaned_Data_lgbm.pkl',
+}
+
+# Map UI values to model expected values
+APARTMENT_VALUE_MAPPINGS = {
+    "owner": {
+        "Mulkdor": "Mulkdor",
+        "Tashkilot": "Tashkilot",
+        "Boshqa": "Boshqa"
+    },
+    "planirovka": {
+        "Oddiy": "Oddiy",
+        "Hosila": "Hosila",
+        "Mustahkam": "Mustahkam"
+    },
+    "renovation": {
+        "Yaxshi": "Yaxshi",
+        "O'rtacha": "O'rtacha",
+        "Yomon": "Yomon"
+    },
+    "sanuzel": {
+        "Birgalikda": "Birgalikda",
+        "Alohida": "Alohida"
+    },
+    "bino_turi": {
+        "Ikkinchi bozor": "Ikkinchi bozor",
+        "Birlamchi bozor": "Birlamchi bozor"
+    },
+    "qurilish_turi": {
+        "Panel": "Panel",
+        "G'isht": "G'isht",
+        "Monolit": "Monolit"
+    }
+}
+
+APARTMENT_CATEGORICAL_PREFIXES = [
+    ("ownerType_", "owner"),
+    ("planType_", "planirovka"),
+    ("repairType_", "renovation"),
+    ("bathroomType_", "sanuzel"),
+    ("marketType_", "bino_turi"),
+    ("buildType_", "qurilish_turi"),
+]
+
+APARTMENT_AMENITIES = {
+    "Maktab": "shkola", "Supermarket": "supermarket", "Do'kon": "magazini", "Park": "park"
+}
+
+APARTMENT_APPLIANCES = {
+    "Televizor": "tv_wm_ac_fridge", "Internet": "telefon_internet"
+}
+
+CAR_CONDITION_MAPPING = {
+    "A'lo": "Excellent",
+    "O'rtacha": "Average",
+    "Remont talab": "Needs_Repair",
+    "Yaxshi": "Good"
+}
+
+CAR_FUEL_MAPPING = {
+    "Benzin": "Gasoline",
+    "Gaz/Benzin": "Gasoline/Petrol",
+    "Gibrid": "Hybrid",
+    "Dizel": "Diesel",
+    "Boshqa": "Other",
+    "Elektro": "Electric"
+}
+
+CAR_COLOR_MAPPING = {
+    "Asfalt": "Asphalt",
+    "Bejeviy": "Beige",
+    "Qora": "Black",
+    "Ko'k": "Blue",
+    "Jigarrang": "Brown",
+    "Kulrang": "Gray",
+    "Boshqa": "Other",
+    "Kumush": "Silver",
+    "Oq": "White"
+}
+
+CAR_BODY_MAPPING = {
+    "Yo'ltanlamas": "SUV",
+    "Boshqa": "Other",
+    "Kabriolet": "Convertible",
+    "Kupe": "Coupe",
+    "Miniven": "Minivan",
+    "Pikap": "Pickup",
+    "Sedan": "Sedan",
+    "Universal": "Wagon",
+    "Xetchbek": "Hatchback"
+}
+
+CAR_STATE_MAPPING = {
+    "Toshkent shahri": "Tashkent",
+    "Qoraqalpogʻiston Respublikasi": "Karakalpakstan",
+    "Navoiy Viloyati": "Navoiy",
+    "Toshkent Viloyati": "Tashkent2",
+    "Samarqand Viloyati": "Samarkand",
+    "Qashqadaryo Viloyati": "Kashkadarya",
+    "Farg'ona Viloyati": "Ferghana",
+    "Buxoro Viloyati": "Bukhara",
+    "Xorazm Viloyati": "Khorezm",
+    "Sirdaryo Viloyati": "Sirdaryo",
+    "Surxondaryo Viloyati": "Surkhondaryo",
+    "Namangan Viloyati": "Namangan",
+    "Andijon Viloyati": "Andijon",
+    "Jizzax Viloyati": "Jizzakh"
+}
+
+CAR_FEATURE_MAPPING = {
+    "Konditsioner": "Air_Conditioner",
+    "Xavfsizlik tizimi": "Security_System",
+    "Parctronik": "Parking_Sensors",
+    "Rastamojka qilingan": "Customs_Cleared",
+    "Elektron oynalar": "Power_Windows",
+    "Elektron ko'zgular": "Power_Mirrors"
+}
+
+# Columns each car model was trained without
+CAR_DROPPED_COLUMNS = {
+    'model3': ["color_Beige"],
+    'model4': ["body_Convertible", "color_Beige"],
+}
+
+PRICE_MARGIN = 0.0361
+
+
+def _feature_columns(columns_df):
+    """Skip the index column that pandas wrote into the column CSVs"""
+    return [col for col in columns_df.columns if not col.startswith('Unnamed') and col != '']
+
+
+@lru_cache(maxsize=None)
+def load_model(model_key):
+    """Load one of model1..model4 once per process as ``(booster, scaler)``
+
+    Car scalers are folded into their model's thresholds when possible, leaving
+    the scaler as None; see ``folding.fold_scaler``. Apartment models have none.
+    """
+    model = joblib.load(os.path.join(DATA_PATH, MODEL_FILES[model_key]))
+    if model_key not in SCALER_FILES:
+        return model, None
+    return fold_or_keep(model, joblib.load(os.path.join(DATA_PATH, SCALER_FILES[model_key])))
+
+
+@lru_cache(maxsize=None)
+def load_apartment_resources():
+    """Load apartment lookup tables and column layouts once per process"""
+    mahalla_and_tuman = pd.read_csv(os.path.join(DATA_PATH, 'mahalla_tuman_codes.csv'))
+    uybor_cols = pd.read_csv(os.path.join(DATA_PATH, 'uybor_columns.csv'))
+    unique_mahalla_olx = pd.read_csv(os.path.join(DATA_PATH, 'unique_mahalla_olx.csv'))
+
+    # First match wins, the same as indexing `.values[0]` on a filtered frame
+    district_codes = (mahalla_and_tuman.drop_duplicates('district_str')
+                      .set_index('district_str')['district_code'].to_dict())
+    neighborhood_codes = (mahalla_and_tuman.drop_duplicates('neighborhood_latin')
+                          .set_index('neighborhood_latin')['neighborhood_code'].to_dict())
+
+    return {
+        'feature_columns': _feature_columns(pd.read_csv(os.path.join(DATA_PATH, 'xcolumns.csv'))),
+        'uybor_features': uybor_cols[uybor_cols.columns[0]].tolist(),
+        'district_codes': district_codes,
+        'neighborhood_codes': neighborhood_codes,
+        'olx_neighborhood_codes': set(unique_mahalla_olx['neighborhood_code']),
+    }
+
+
+@lru_cache(maxsize=None)
+def load_car_resources():
+    """Load car column layouts once per process"""
+    return {
+        'model3_columns': _feature_columns(pd.read_csv(os.path.join(DATA_PATH, 'Chevrolet_DAEWOO_RAVON_columns.csv'))),
+        'model4_columns': _feature_columns(pd.read_csv(os.path.join(DATA_PATH, 'FOREIGN_columns_cleaned_Data_lgbm.csv'))),
+    }
+
+
+def apartment_feature_row(input_data, resources):
+    """Feature dict and model key for one apartment payload"""
+    my_dict = {col: 0 for col in resources['feature_columns']}
+
+    my_dict["totalArea"] = input_data.get("area")
+    my_dict["numberOfRooms"] = input_data.get("rooms")
+    my_dict["floor"] = input_data.get("floor")
+    my_dict["floorOfHouse"] = input_data.get("total_floors")
+    my_dict["furnished"] = 1 if input_data.get("mebel") == 'Ha' else 0
+    my_dict["handle"] = 1 if input_data.get("kelishsa") == 'Ha' else 0
+    my_dict["pricingMonth"] = input_data.get("month")
+    my_dict["pricingYear"] = input_data.get("year")
+
+    for k, v in APARTMENT_AMENITIES.items():
+        my_dict[v] = 1 if k in input_data.get("atrofda", []) else 0
+
+    for k, v in APARTMENT_APPLIANCES.items():
+        my_dict[v] = 1 if k in input_data.get("uyda", []) else 0
+
+    for prefix, field in APARTMENT_CATEGORICAL_PREFIXES:
+        val = input_data.get(field)
+        if val:
+            mapped_val = APARTMENT_VALUE_MAPPINGS[field].get(val, val)
+            my_dict[f"{prefix}{mapped_val}"] = 1
+
+    if input_data.get("district"):
+        my_dict["district_code"] = resources['district_codes'].get(input_data['district'], 0)
+
+    # The UI sends Latin mahalla names, so look them up by neighborhood_latin
+    if input_data.get("mahalla"):
+        my_dict["neighborhood_code"] = resources['neighborhood_codes'].get(input_data['mahalla'], 0)
+
+    model_key = 'model1' if my_dict.get("neighborhood_code", 0) in resources['olx_neighborhood_codes'] else 'model2'
+    return model_key, my_dict
+
+
+def apartment_frame(model_key, rows, resources):
+    """Feature frame for ``model_key`` from encoded rows (dicts or a DataFrame)"""
+    df = pd.DataFrame(rows)
+    df['numberOfRooms'] = df['numberOfRooms'].astype(int)
+    df['floor'] = df['floor'].astype(int)
+    df['floorOfHouse'] = df['floorOfHouse'].astype(int)
+    df['totalArea'] = df['totalArea'].astype(float)
+    if 'district_code' in df.columns:
+        df['district_code'] = df['district_code'].astype(int)
+    if 'neighborhood_code' in df.columns:
+        df['neighborhood_code'] = df['neighborhood_code'].astype(int)
+
+    if model_key == 'model2':
+        # Filter to only include features that exist in our dataframe
+        df = df[[col for col in resources['uybor_features'] if col in df.columns]]
+    else:
+        # Categorical values the model has no column for (owner='Boshqa', ...) add columns it
+        # was not trained on; drop them, as PriceEstimator.get_base_prices does
+        df = df.reindex(columns=resources['feature_columns'], fill_value=0)
+
+    return df
+
+
+def encode_apartment(input_data):
+    """Encode an apartment payload into the feature frame of the model that should score it
+
+    Returns a ``(model_key, DataFrame)`` tuple where ``model_key`` is ``'model1'``
+    for mahallas seen in the OLX training data and ``'model2'`` otherwise.
+    """
+    resources = load_apartment_resources()
+    model_key, row = apartment_feature_row(input_data, resources)
+    return model_key, apartment_frame(model_key, [row], resources)
+
+
+def encode_apartments(inputs):
+    """Encode many apartment payloads at once, grouped by the model that scores them
+
+    Returns ``{model_key: (positions, DataFrame)}`` where ``positions`` are the
+    indexes into ``inputs`` of the frame's rows, in order.
+    """
+    resources = load_apartment_resources()
+    grouped = {}
+    for position, input_data in enumerate(inputs):
+        model_key, row = apartment_feature_row(input_data, resources)
+        positions, rows = grouped.setdefault(model_key, ([], []))
+        positions.append(position)
+        rows.append(row)
+
+    return {
+        model_key: (positions, apartment_frame(model_key, rows, resources))
+        for model_key, (positions, rows) in grouped.items()
+    }
+
+
+def car_feature_row(input_data, resources):
+    """Feature dict and model key for one car payload"""
+    brand = input_data.get("brand")
+    model_key = 'model3' if brand in CHEVROLET_BRANDS else 'model4'
+    updated_auto_dict = {col: 0 for col in resources[f'{model_key}_columns']}
+
+    # Basic car information
+    updated_auto_dict["release_year"] = input_data.get("year")
+    updated_auto_dict["engine_volume"] = input_data.get("engine_volume")
+    updated_auto_dict["mileage"] = input_data.get("mileage")
+    updated_auto_dict["month"] = input_data.get("month", datetime.now().month)
+    updated_auto_dict["year"] = datetime.now().year
+
+    # Brand type (1 for Chevrolet, 0 for others and always 0 for the foreign model)
+    updated_auto_dict['brand_type'] = 1 if model_key == 'model3' and brand == 'Chevrolet' else 0
+
+    car_name = input_data.get("model")
+    if car_name and f'car_name_{car_name}' in updated_auto_dict:
+        updated_auto_dict[f'car_name_{car_name}'] = 1
+
+    ownership = input_data.get("ownership", "Xususiy")
+    updated_auto_dict['item_type_Business'] = 1 if ownership == 'Biznes' else 0
+    updated_auto_dict['item_type_Private'] = 0 if ownership == 'Biznes' else 1
+
+    owners_count = input_data.get("owners_count", 1)
+    if f'owners_count_{owners_count}' in updated_auto_dict:
+        updated_auto_dict[f'owners_count_{owners_count}'] = 1
+
+    for field, prefix, mapping in [
+        ("condition", "car_condition_", CAR_CONDITION_MAPPING),
+        ("fuel", "fuel_type_", CAR_FUEL_MAPPING),
+        ("color", "color_", CAR_COLOR_MAPPING),
+        ("body_type", "body_", CAR_BODY_MAPPING),
+        ("state", "state_", CAR_STATE_MAPPING),
+    ]:
+        val = input_data.get(field)
+        if val and val in mapping and f'{prefix}{mapping[val]}' in updated_auto_dict:
+            updated_auto_dict[f'{prefix}{mapping[val]}'] = 1
+
+    # Transmission (1 for manual, 0 for automatic)
+    updated_auto_dict['transmission'] = 1 if input_data.get("transmission", "Mexanik") == 'Mexanik' else 0
+
+    features = input_data.get("features", [])
+    for feature_uz, feature_en in CAR_FEATURE_MAPPING.items():
+        if feature_en in updated_auto_dict:
+            updated_auto_dict[feature_en] = 1 if feature_uz in features else 0
+
+    return model_key, updated_auto_dict
+
+
+def car_frame(model_key, rows):
+    """Raw (unscaled) feature frame for ``model_key`` from encoded rows"""
+    df_auto = pd.DataFrame(rows)
+    columns = [col for col in load_car_resources()[f'{model_key}_columns'] if col not in CAR_DROPPED_COLUMNS[model_key]]
+    return df_auto.reindex(columns=columns, fill_value=0)
+
+
+def encode_car(input_data):
+    """Encode a car payload into the raw (unscaled) feature frame of its model
+
+    Chevrolet, Ravon and Daewoo go to ``'model3'``, every other brand to ``'model4'``.
+    """
+    model_key, row = car_feature_row(input_data, load_car_resources())
+    return model_key, car_frame(model_key, [row])
+
+
+def predict_local(model_key, df):
+    """Score an encoded frame with one of model1..model4 loaded in this process"""
+    model, scaler = load_model(model_key)
+    if scaler is not None:
+        df = scaler.transform(df)
+    return model.predict(df)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def inference_socket_path():
+    """Socket of the shared inference server, or '' to score in-process
+
+    Read from settings under Django and from the environment in standalone
+    scripts such as the Dash app.
+    """
+    if settings.configured:
+        return getattr(settings, 'INFERENCE_SOCKET_PATH', '')
+    return os.environ.get('INFERENCE_SOCKET', '')
+
+
+def get_client():
+    """The process-wide inference server client, or None when no socket is configured"""
+    global _client
+    path = inference_socket_path()
+    if not path:
+        return None
+    if _client is None or _client.path != path:
+        with _client_lock:
+            if _client is None or _client.path != path:
+                timeout = getattr(settings, 'INFERENCE_SOCKET_TIMEOUT', 5) if settings.configured else 5
+                _client = InferenceClient(path, timeout=timeout)
+    return _client
+
+
+def predict(model_key, df):
+    """Score an encoded frame with one of model1..model4 and return the raw predictions
+
+    Goes to the inference server when one is configured, otherwise the models
+    are loaded into this process.
+    """
+    client = get_client()
+    if client is not None:
+        return client.predict(model_key, df)
+    return predict_local(model_key, df)
+
+
+class ModelHandle:
+    """Stand-in for a loaded model whose ``predict`` goes through ``inference.predict``
+
+    Lets scripts that used to hold boosters (the Dash app) share the inference
+    server without changing their call sites. Frames are the encoded, unscaled
+    columns; car scaling happens behind ``predict``.
+    """
+
+    def __init__(self, model_key):
+        self.model_key = model_key
+
+    def predict(self, df):
+        return predict(self.model_key, df)
+
+
+_batcher = None
+_batcher_pid = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """The process-wide micro-batcher, or None when batching is disabled in settings"""
+    global _batcher, _batcher_pid
+    if not getattr(settings, 'INFERENCE_BATCH_ENABLED', True):
+        return None
+    # Threads do not survive a fork, so each worker process starts its own scheduler
+    if _batcher_pid != os.getpid():
+        with _batcher_lock:
+            if _batcher_pid != os.getpid():
+                _batcher = MicroBatcher(
+                    predict,
+                    max_batch_size=getattr(settings, 'INFERENCE_BATCH_MAX_SIZE', 64),
+                    max_wait_ms=getattr(settings, 'INFERENCE_BATCH_MAX_WAIT_MS', 5),
+                    max_pending=getattr(settings, 'INFERENCE_BATCH_MAX_PENDING', 1024),
+                )
+                _batcher_pid = os.getpid()
+    return _batcher
+
+
+def predict_one(model_key, df):
+    """Score a single encoded row, going through the micro-batcher when it is enabled"""
+    batcher = get_batcher()
+    future = batcher.try_submit(model_key, df) if batcher is not None else None
+    if future is None:
+        return predict(model_key, df)[0]
+    return future.result()
+
+
+def apartment_result(prediction, input_data):
+    """Predicted price and ±3.61% range for an apartment payload"""
+    margin = round(prediction * PRICE_MARGIN)
+
+    return {
+        'predicted_price': round(prediction),
+        'price_range': [round(prediction - margin), round(prediction + margin)],
+        'input_data': input_data
+    }
+
+
+def car_result(prediction):
+    """Predicted price and ±3.61% range for a car payload"""
+    predicted_price = round(prediction)
+
+    margin = round(predicted_price * PRICE_MARGIN)
+    lower_bound = predicted_price - margin
+    upper_bound = predicted_price + margin
+
+    return {
+        'predicted_price': predicted_price,
+        'price_range': {
+            'lower': lower_bound,
+            'upper': upper_bound
+        },
+        'formatted_price': f"${predicted_price:,}",
+        'formatted_range': f"${lower_bound:,} - ${upper_bound:,}"
+    }
+
+
+def evaluate_apartment(input_data):
+    started = time.perf_counter()
+    model_key, df = encode_apartment(input_data)
+    result = apartment_result(predict_one(model_key, df), input_data)
+    valuation_log.record('apartment', input_data, model_key, result['predicted_price'], started)
+    return result
+
+
+def evaluate_car(input_data):
+    started = time.perf_counter()
+    model_key, df = encode_car(input_data)
+    result = car_result(predict_one(model_key, df))
+    valuation_log.record('car', input_data, model_key, result['predicted_price'], started)
+    return result
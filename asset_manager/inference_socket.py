@@ -0,0 +1,158 @@
+"""Serve model predictions to other processes over a Unix domain socket
+
+One ``run_inference_server`` process owns the boosters; web workers and the
+Dash app send it encoded feature rows instead of loading every model
+themselves. Set ``INFERENCE_SOCKET_PATH`` (or the ``INFERENCE_SOCKET``
+environment variable outside Django) and ``inference.predict`` goes through
+``InferenceClient``.
+
+Framing, all little-endian, several requests per connection:
+
+* request: ``b'HEI1'``, model number (1..4, uint8), rows and columns
+  (uint32 each), then ``rows * columns`` float32 feature values row by row
+* response: ``b'HEI1'``, status (uint8, 0 = ok), count (uint32), then either
+  ``count`` float64 predictions or a ``count`` byte UTF-8 error message
+
+Features go as float32 to keep frames small; the predictions come back as
+float64 so prices are not rounded on the way.
+"""
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+import numpy as np
+
+MAGIC = b'HEI1'
+REQUEST_HEADER = struct.Struct('<4sBII')
+RESPONSE_HEADER = struct.Struct('<4sBI')
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+MODEL_KEYS = ('model1', 'model2', 'model3', 'model4')
+
+# Largest frame the server accepts, so a bad header cannot make it allocate gigabytes
+MAX_VALUES = 16 * 1024 * 1024
+
+
+class InferenceServerError(Exception):
+    """The inference server rejected a request or could not score it"""
+
+
+def _read_exact(stream, size):
+    """Read exactly ``size`` bytes, or None if the peer closed before sending any"""
+    data = bytearray()
+    while len(data) < size:
+        chunk = stream.read(size - len(data)) if hasattr(stream, 'read') else stream.recv(size - len(data))
+        if not chunk:
+            if data:
+                raise ConnectionResetError('Connection closed in the middle of a frame')
+            return None
+        data += chunk
+    return bytes(data)
+
+
+class InferenceClient:
+    """Send encoded frames to ``run_inference_server`` and return its predictions
+
+    Each thread keeps one connection open and reconnects once if the server
+    went away in between (e.g. it was restarted).
+    """
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        # A connection inherited through fork would be shared with the parent
+        sock = getattr(self._local, 'sock', None)
+        if sock is None or self._local.pid != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock = sock
+            self._local.pid = os.getpid()
+        return sock
+
+    def close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            self._local.sock = None
+            sock.close()
+
+    def predict(self, model_key, df):
+        """Score a frame or 2-D array laid out like the local model expects"""
+        values = np.ascontiguousarray(df, dtype='<f4')
+        if values.ndim == 1:
+            values = values.reshape(1, -1)
+        frame = REQUEST_HEADER.pack(MAGIC, MODEL_KEYS.index(model_key) + 1, *values.shape) + values.tobytes()
+
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(frame)
+                header = _read_exact(sock, RESPONSE_HEADER.size)
+                if header is None:
+                    raise ConnectionResetError('Inference server closed the connection')
+                break
+            except (BrokenPipeError, ConnectionResetError):
+                self.close()
+                if attempt:
+                    raise
+            except OSError:
+                self.close()
+                raise
+
+        magic, status, count = RESPONSE_HEADER.unpack(header)
+        if magic != MAGIC:
+            self.close()
+            raise InferenceServerError('Unexpected response from the inference server')
+        body = _read_exact(sock, count * 8 if status == STATUS_OK else count) or b''
+        if status != STATUS_OK:
+            raise InferenceServerError(body.decode('utf-8', 'replace'))
+        return np.frombuffer(body, dtype='<f8')
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            header = _read_exact(self.rfile, REQUEST_HEADER.size)
+            if header is None:
+                return
+            magic, model_number, rows, columns = REQUEST_HEADER.unpack(header)
+            if magic != MAGIC or rows * columns > MAX_VALUES:
+                # The stream cannot be resynchronised after a bad header
+                self._error('Bad request frame')
+                return
+
+            body = _read_exact(self.rfile, rows * columns * 4)
+            if body is None and rows * columns:
+                return
+            values = np.frombuffer(body or b'', dtype='<f4').reshape(rows, columns).astype(np.float64)
+
+            try:
+                if not 1 <= model_number <= len(MODEL_KEYS):
+                    raise ValueError(f'Unknown model number {model_number}')
+                predictions = self.server.predict_fn(MODEL_KEYS[model_number - 1], values)
+            except Exception as e:
+                self._error(str(e))
+                continue
+
+            predictions = np.ascontiguousarray(predictions, dtype='<f8')
+            self.wfile.write(RESPONSE_HEADER.pack(MAGIC, STATUS_OK, len(predictions)) + predictions.tobytes())
+
+    def _error(self, message):
+        message = message.encode('utf-8')
+        self.wfile.write(RESPONSE_HEADER.pack(MAGIC, STATUS_ERROR, len(message)) + message)
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Thread-per-connection server scoring frames with ``predict_fn(model_key, values)``"""
+
+    daemon_threads = True
+
+    def __init__(self, path, predict_fn):
+        self.predict_fn = predict_fn
+        super().__init__(path, _Handler)
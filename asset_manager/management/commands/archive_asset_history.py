@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from asset_manager.history import DEFAULT_KEEP_MONTHS, archive_history
+
+
+class Command(BaseCommand):
+    help = 'Roll asset value history older than the retention window into packed per-asset archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-months', type=int, default=DEFAULT_KEEP_MONTHS,
+                            help='Recent months (including the current one) kept as rows')
+        parser.add_argument('--batch-size', type=int, default=500, help='Assets archived per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        if options['keep_months'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--keep-months and --batch-size must be positive')
+
+        started = time.perf_counter()
+        assets, rows = archive_history(
+            keep_months=options['keep_months'], batch_size=options['batch_size'], dry_run=options['dry_run'],
+        )
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {rows} rows of {assets} assets in {time.perf_counter() - started:.1f}s'
+        ))
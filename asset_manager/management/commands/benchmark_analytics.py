@@ -0,0 +1,103 @@
+import time
+from datetime import date
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from asset_manager.analytics import (
+    LATENCY_BUDGET_MS, MAX_PROJECTION_MONTHS, PROJECTION_LATENCY_BUDGET_MS, QUERY_BUDGET, portfolio_analytics,
+    portfolio_projection,
+)
+from asset_manager.models import Asset, AssetValueHistory, Portfolio, User
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Check portfolio analytics and projection against their budgets on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assets', type=int, default=1000, help='Number of assets in the portfolio')
+        parser.add_argument('--months', type=int, default=120, help='Months of history per asset')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs; the median is reported')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                portfolio = self._create_portfolio(options['assets'], options['months'])
+                queries, timings = self._measure(portfolio, options['repeat'])
+                projection_timings = self._time(
+                    lambda: portfolio_projection(portfolio, months=MAX_PROJECTION_MONTHS), options['repeat']
+                )
+                # Never keep the synthetic data
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        median_ms = float(np.median(timings))
+        self.stdout.write(
+            f"{options['assets']} assets x {options['months']} months: "
+            f"{queries} queries (budget {QUERY_BUDGET}), "
+            f"median {median_ms:.1f} ms (budget {LATENCY_BUDGET_MS} ms)"
+        )
+
+        projection_ms = float(np.median(projection_timings))
+        self.stdout.write(
+            f"Projection {options['assets']} assets x {MAX_PROJECTION_MONTHS} months: "
+            f"median {projection_ms:.1f} ms (budget {PROJECTION_LATENCY_BUDGET_MS} ms)"
+        )
+
+        if queries > QUERY_BUDGET or median_ms > LATENCY_BUDGET_MS:
+            raise CommandError('Portfolio analytics is over budget')
+        if projection_ms > PROJECTION_LATENCY_BUDGET_MS:
+            raise CommandError('Portfolio projection is over budget')
+        self.stdout.write(self.style.SUCCESS('Within budget'))
+
+    def _create_portfolio(self, n_assets, n_months):
+        user = User.objects.create(username='benchmark-analytics', email='benchmark-analytics@example.com')
+        portfolio = Portfolio.objects.create(user=user, name='Benchmark')
+
+        rng = np.random.default_rng(0)
+        Asset.objects.bulk_create(
+            Asset(
+                portfolio=portfolio,
+                asset_type='apartment' if i % 3 else 'car',
+                name=f'Asset {i}',
+                address='',
+                current_value=round(float(rng.uniform(10_000, 200_000)), 2),
+            )
+            for i in range(n_assets)
+        )
+
+        asset_ids = list(portfolio.assets.values_list('id', flat=True))
+        start = date.today().year * 12 + date.today().month - n_months
+        months = [date((start + m) // 12, (start + m) % 12 + 1, 1) for m in range(n_months)]
+        walks = 50_000 * np.cumprod(1 + rng.normal(0.004, 0.02, size=(n_assets, n_months)), axis=1)
+
+        AssetValueHistory.objects.bulk_create(
+            (AssetValueHistory(asset_id=asset_id, date=month, value=round(float(walks[i, m]), 2))
+             for i, asset_id in enumerate(asset_ids)
+             for m, month in enumerate(months)),
+            batch_size=5000,
+        )
+        return portfolio
+
+    def _measure(self, portfolio, repeat):
+        with CaptureQueriesContext(connection) as captured:
+            portfolio_analytics(portfolio)
+
+        return len(captured), self._time(lambda: portfolio_analytics(portfolio), repeat)
+
+    def _time(self, fn, repeat):
+        # Warm up model loading and caches before timing
+        fn()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
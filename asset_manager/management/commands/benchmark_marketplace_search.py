@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from asset_manager import search
+from asset_manager.models import Asset, MarketplaceListing, Portfolio, User
+
+# Median latency of one ranked search (ids plus listing fetch) at 100k listings
+LATENCY_BUDGET_MS = 100
+
+DISTRICTS = ['Chilonzor', 'Yunusobod', "Mirzo Ulug'bek", 'Yakkasaroy', 'Shayxontohur', 'Sergeli',
+             'Olmazor', 'Uchtepa', 'Bektemir', 'Mirobod', 'Yashnobod', 'Yangihayot']
+CARS = [('Chevrolet', 'Cobalt'), ('Chevrolet', 'Nexia 3'), ('Chevrolet', 'Spark'), ('Chevrolet', 'Malibu'),
+        ('Chevrolet', 'Gentra'), ('Chevrolet', 'Damas'), ('Ravon', 'R2'), ('Daewoo', 'Matiz')]
+QUERIES = ['chilon', 'cobalt', 'yunusobod 3', 'malibu 2019', 'mirzo ulug', 'spark', 'массив', 'евроремонт',
+           'sergeli 12', 'nexia']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark marketplace full-text search against an icontains scan on synthetic listings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=100_000, help='Synthetic listings')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query; medians are reported')
+        parser.add_argument('--skip-scan', action='store_true', help='Do not time the icontains baseline')
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('The marketplace search index needs SQLite FTS5')
+
+        results = {}
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                self._create_listings(options['listings'])
+                self.stdout.write(f"Created {options['listings']} listings in {time.perf_counter() - started:.1f}s")
+                started = time.perf_counter()
+                indexed = search.rebuild_index()
+                self.stdout.write(f'Indexed {indexed} listings in {time.perf_counter() - started:.1f}s')
+
+                listings = MarketplaceListing.objects.filter(is_active=True)
+                for query in QUERIES:
+                    results[query] = (
+                        self._median_ms(lambda: self._fetch(search.search_listing_ids(query, listings)),
+                                        options['repeat']),
+                        None if options['skip_scan'] else self._median_ms(
+                            lambda: self._fetch(search.scan_listing_ids(query, listings)), options['repeat']),
+                        len(search.search_listing_ids(query, listings, limit=None)),
+                    )
+                # Never keep the synthetic data
+                raise transaction.TransactionManagementError
+        except transaction.TransactionManagementError:
+            pass
+
+        self.stdout.write(f"{'query':<16}{'matches':>9}{'fts ms':>9}{'scan ms':>9}")
+        for query, (fts_ms, scan_ms, matches) in results.items():
+            scan = '-' if scan_ms is None else f'{scan_ms:.1f}'
+            self.stdout.write(f'{query:<16}{matches:>9}{fts_ms:>9.1f}{scan:>9}')
+
+        median_ms = float(np.median([fts_ms for fts_ms, _, _ in results.values()]))
+        self.stdout.write(f'Median search {median_ms:.1f} ms (budget {LATENCY_BUDGET_MS} ms)')
+        if median_ms > LATENCY_BUDGET_MS:
+            raise CommandError('Marketplace search is over budget')
+        self.stdout.write(self.style.SUCCESS('Within budget'))
+
+    def _fetch(self, ids):
+        # What the endpoint loads for the ranked ids
+        return list(MarketplaceListing.objects.filter(id__in=ids).select_related('asset', 'asset__portfolio', 'seller'))
+
+    def _median_ms(self, fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return float(np.median(timings))
+
+    def _create_listings(self, n_listings):
+        user = User.objects.create(username='benchmark-search', email='benchmark-search@example.com')
+        portfolio = Portfolio.objects.create(user=user, name='Benchmark')
+
+        rng = np.random.default_rng(0)
+        assets = []
+        for i in range(n_listings):
+            district = DISTRICTS[rng.integers(len(DISTRICTS))]
+            if i % 3:
+                rooms = int(rng.integers(1, 6))
+                assets.append(Asset(
+                    portfolio=portfolio, asset_type='apartment', name=f'{rooms}-xonali kvartira, {district}',
+                    address=f'{district} tumani, {int(rng.integers(1, 30))}-kvartal, {int(rng.integers(1, 80))}-uy',
+                    current_value=50_000, rooms=rooms,
+                    description=f'{{"district": "{district}", "mahalla": "Mahalla {int(rng.integers(1, 400))}", '
+                                f'"Ремонт": "{["Евроремонт", "Средний", "Требует ремонта"][rooms % 3]}"}}',
+                ))
+            else:
+                brand, model = CARS[rng.integers(len(CARS))]
+                year = int(rng.integers(2005, 2025))
+                assets.append(Asset(
+                    portfolio=portfolio, asset_type='car', name=f'{brand} {model} {year}', address=district,
+                    current_value=10_000, brand=brand, model=model, year=year,
+                    description=f'{{"Регион": "{district}", "Топливо": "Бензин"}}',
+                ))
+        Asset.objects.bulk_create(assets, batch_size=5000)
+        MarketplaceListing.objects.bulk_create(
+            (MarketplaceListing(asset=asset, seller=user, listing_price=asset.current_value,
+                                description='Срочно продается, массив рядом' if asset.id % 5 == 0 else '')
+             for asset in assets),
+            batch_size=5000,
+        )
@@ -0,0 +1,146 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.test.utils import override_settings
+
+from asset_manager.models import Asset, AssetValueHistory, Portfolio, User
+from asset_manager.write_queue import WriteSerializer
+
+# name: (apply SQLITE_PRAGMAS and the configured OPTIONS, route writes through a WriteSerializer)
+PROFILES = {
+    'default': (False, False),
+    'tuned': (True, False),
+    'tuned+serializer': (True, True),
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare SQLite settings under concurrent reads and writes on throwaway databases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent request threads')
+        parser.add_argument('--seconds', type=float, default=5, help='Run time per profile')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Share of operations that write')
+        parser.add_argument('--assets', type=int, default=200, help='Assets in the synthetic portfolio')
+        parser.add_argument('--profile', choices=list(PROFILES), action='append',
+                            help='Profiles to run (default: all)')
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name in options['profile'] or list(PROFILES):
+                results[name] = self._run_profile(name, directory, options)
+
+        self.stdout.write(f"{'profile':<18}{'reads/s':>10}{'writes/s':>10}{'errors':>8}"
+                          f"{'read p50/p99 ms':>18}{'write p50/p99 ms':>19}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<18}{result['reads'] / options['seconds']:>10.0f}{result['writes'] / options['seconds']:>10.0f}"
+                f"{result['errors']:>8}{self._percentiles(result['read_ms']):>18}{self._percentiles(result['write_ms']):>19}"
+            )
+
+        tuned_errors = sum(result['errors'] for name, result in results.items() if name != 'default')
+        if tuned_errors:
+            raise CommandError(f'{tuned_errors} operations failed with the tuned SQLite profile')
+        self.stdout.write(self.style.SUCCESS('No lock errors with the tuned profile'))
+
+    def _run_profile(self, name, directory, options):
+        tuned, serialized = PROFILES[name]
+        alias = f"benchmark_{name.replace('+', '_')}"
+        connections.databases[alias] = {
+            **connections.databases['default'],
+            'NAME': os.path.join(directory, f'{alias}.sqlite3'),
+            'OPTIONS': dict(connections.databases['default'].get('OPTIONS', {})) if tuned else {},
+        }
+
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS', {}) if tuned else {}
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            call_command('migrate', database=alias, verbosity=0)
+            portfolio, asset_ids = self._seed(alias, options['assets'])
+            serializer = WriteSerializer(using=alias) if serialized else None
+
+            stop = time.perf_counter() + options['seconds']
+            result = {'reads': 0, 'writes': 0, 'errors': 0, 'read_ms': [], 'write_ms': []}
+            lock = threading.Lock()
+            threads = [
+                threading.Thread(target=self._worker,
+                                 args=(alias, portfolio, asset_ids, serializer, stop, options['write_ratio'],
+                                       seed, result, lock))
+                for seed in range(options['threads'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        connections[alias].close()
+        return result
+
+    def _seed(self, alias, n_assets):
+        user = User.objects.using(alias).create(username='benchmark-sqlite', email='benchmark-sqlite@example.com')
+        portfolio = Portfolio.objects.using(alias).create(user=user, name='Benchmark')
+        Asset.objects.using(alias).bulk_create(
+            Asset(portfolio=portfolio, asset_type='apartment', name=f'Asset {i}', address='', current_value=50_000)
+            for i in range(n_assets)
+        )
+        asset_ids = list(Asset.objects.using(alias).values_list('id', flat=True))
+        AssetValueHistory.objects.using(alias).bulk_create(
+            AssetValueHistory(asset_id=asset_id, date=date(2025, month, 1), value=50_000)
+            for asset_id in asset_ids for month in range(1, 13)
+        )
+        return portfolio, asset_ids
+
+    def _worker(self, alias, portfolio, asset_ids, serializer, stop, write_ratio, seed, result, lock):
+        rng = np.random.default_rng(seed)
+        reads, writes, errors, read_ms, write_ms = 0, 0, 0, [], []
+
+        def write(asset_id, value):
+            # Read-then-write like update_asset_value
+            asset = Asset.objects.using(alias).get(id=asset_id)
+            asset.current_value = value
+            asset.save(using=alias)
+            AssetValueHistory.objects.using(alias).create(asset=asset, value=value, date=date.today())
+
+        try:
+            while time.perf_counter() < stop:
+                asset_id = int(rng.choice(asset_ids))
+                started = time.perf_counter()
+                try:
+                    if rng.random() < write_ratio:
+                        value = round(float(rng.uniform(10_000, 200_000)), 2)
+                        if serializer is not None:
+                            serializer.submit(write, asset_id, value).result()
+                        else:
+                            with transaction.atomic(using=alias):
+                                write(asset_id, value)
+                        writes += 1
+                        write_ms.append((time.perf_counter() - started) * 1000)
+                    else:
+                        list(Asset.objects.using(alias).select_related('portfolio').filter(portfolio=portfolio)[:50])
+                        list(AssetValueHistory.objects.using(alias).filter(asset_id=asset_id)[:24])
+                        reads += 1
+                        read_ms.append((time.perf_counter() - started) * 1000)
+                except OperationalError:
+                    errors += 1
+        finally:
+            connections[alias].close()
+
+        with lock:
+            result['reads'] += reads
+            result['writes'] += writes
+            result['errors'] += errors
+            result['read_ms'].extend(read_ms)
+            result['write_ms'].extend(write_ms)
+
+    def _percentiles(self, timings):
+        if not timings:
+            return '-'
+        return f'{np.percentile(timings, 50):.1f} / {np.percentile(timings, 99):.1f}'
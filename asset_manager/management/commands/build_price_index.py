@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from asset_manager.price_index import build_price_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the mahalla price index by scoring a grid of standard apartment configurations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20000,
+                            help='Configurations scored per predict call')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = build_price_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Built price index: {count} rows in {time.perf_counter() - started:.1f}s'
+        ))
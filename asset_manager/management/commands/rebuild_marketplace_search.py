@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from asset_manager import search
+
+
+class Command(BaseCommand):
+    help = 'Refill the marketplace full-text index from every listing'
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('The marketplace search index needs SQLite FTS5')
+        started = time.perf_counter()
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} listings in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from asset_manager import facets
+
+
+class Command(BaseCommand):
+    help = 'Recount the marketplace facet counts from the active listings and correct any drift (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without correcting it')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        corrections = facets.reconcile(dry_run=options['dry_run'])
+        for facet, value, stored, actual in corrections:
+            self.stdout.write(self.style.WARNING(f'{facet}={value}: stored {stored}, actual {actual}'))
+        verb = 'Found' if options['dry_run'] else 'Corrected'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(corrections)} facet counts in {time.perf_counter() - started:.1f}s'
+        ))
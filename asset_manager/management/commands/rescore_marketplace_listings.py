@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from asset_manager import deals
+
+
+class Command(BaseCommand):
+    help = 'Re-estimate every active marketplace listing and refresh its deal ratio'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listing-id', type=int, help='Rescore one listing')
+        parser.add_argument('--batch-size', type=int, default=500, help='Listings estimated per model call')
+
+    def handle(self, *args, **options):
+        filters = {'id': options['listing_id']} if options['listing_id'] else {}
+        started = time.perf_counter()
+        scored = deals.rescore_listings(batch_size=options['batch_size'], **filters)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rescored {scored} listings in {time.perf_counter() - started:.1f}s'
+        ))
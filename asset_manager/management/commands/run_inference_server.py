@@ -0,0 +1,47 @@
+import os
+import signal
+import stat
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from asset_manager import inference
+from asset_manager.inference_socket import MODEL_KEYS, InferenceServer
+
+
+class Command(BaseCommand):
+    help = 'Load every model once and serve predictions to web workers over a Unix domain socket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=getattr(settings, 'INFERENCE_SOCKET_PATH', ''),
+                            help='Socket path (defaults to INFERENCE_SOCKET_PATH)')
+
+    def handle(self, *args, **options):
+        path = options['socket']
+        if not path:
+            raise CommandError('Pass --socket or set INFERENCE_SOCKET_PATH')
+
+        # Remove a socket left behind by a previous run, but never a regular file
+        if os.path.exists(path):
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise CommandError(f'{path} exists and is not a socket')
+            os.unlink(path)
+
+        for model_key in MODEL_KEYS:
+            inference.load_model(model_key)
+        self.stdout.write(f"Loaded {', '.join(MODEL_KEYS)}")
+
+        # The server must not forward to itself when INFERENCE_SOCKET_PATH points at it
+        server = InferenceServer(path, inference.predict_local)
+        self.stdout.write(self.style.SUCCESS(f'Serving predictions on {path}'))
+
+        # Process managers stop the server with SIGTERM; exit through the cleanup below
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.unlink(path)
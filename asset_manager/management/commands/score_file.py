@@ -0,0 +1,69 @@
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from asset_manager.bulk_scoring import LIST_SEPARATOR, score_records
+
+
+class Command(BaseCommand):
+    help = 'Score a CSV of apartment or car payloads in chunks and write prices to a new CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', dest='asset_type', choices=['apartment', 'car'], required=True)
+        parser.add_argument('--in', dest='input', required=True,
+                            help='CSV with one evaluate payload per row (same field names as the API); '
+                                 f'multi-value fields are separated by "{LIST_SEPARATOR}"')
+        parser.add_argument('--out', dest='output', required=True,
+                            help='Output CSV: the input columns plus predicted_price, scored_by (model1-model4) and error')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes scoring chunks')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows read and scored at a time')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--workers and --chunk-size must be positive')
+
+        started = time.perf_counter()
+        try:
+            chunks = pd.read_csv(options['input'], chunksize=options['chunk_size'])
+        except FileNotFoundError:
+            raise CommandError(f"Input file not found: {options['input']}")
+
+        self._rows = self._failed = 0
+        self._header = True
+        self._started = started
+
+        if options['workers'] == 1:
+            for chunk in chunks:
+                self._write(chunk, score_records(options['asset_type'], chunk.to_dict('records')), options)
+        else:
+            # Keep a bounded window of chunks in flight and write them back in input order
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append((chunk, pool.submit(score_records, options['asset_type'], chunk.to_dict('records'))))
+                    if len(pending) >= 2 * options['workers']:
+                        chunk, future = pending.popleft()
+                        self._write(chunk, future.result(), options)
+                while pending:
+                    chunk, future = pending.popleft()
+                    self._write(chunk, future.result(), options)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {self._rows} rows ({self._failed} failed) in {elapsed:.1f}s: "
+            f"{self._rows / elapsed if elapsed else 0:,.0f} rows/s -> {options['output']}"
+        ))
+
+    def _write(self, chunk, scored, options):
+        prices, model_keys, errors = scored
+        chunk = chunk.assign(predicted_price=pd.array(prices, dtype='Int64'), scored_by=model_keys, error=errors)
+        chunk.to_csv(options['output'], mode='w' if self._header else 'a', header=self._header, index=False)
+        self._header = False
+
+        self._rows += len(chunk)
+        self._failed += sum(error is not None for error in errors)
+        elapsed = time.perf_counter() - self._started
+        self.stdout.write(f'{self._rows} rows, {self._rows / elapsed:,.0f} rows/s')
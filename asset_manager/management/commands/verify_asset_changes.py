@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from asset_manager.returns import recompute_changes, verify_changes
+
+
+class Command(BaseCommand):
+    help = 'Compare the stored rolling changes of assets with values computed from their history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--asset-id', type=int, help='Check one asset')
+        parser.add_argument('--tolerance', type=float, default=0.01,
+                            help='Largest accepted difference in percent points or value')
+        parser.add_argument('--fix', action='store_true', help='Recompute the assets that differ')
+        parser.add_argument('--limit', type=int, default=20, help='Mismatches to print')
+
+    def handle(self, *args, **options):
+        filters = {'id': options['asset_id']} if options['asset_id'] else {}
+
+        started = time.perf_counter()
+        checked, mismatches = verify_changes(tolerance=options['tolerance'], **filters)
+        self.stdout.write(f'Checked {checked} assets in {time.perf_counter() - started:.1f}s')
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Stored changes match the history'))
+            return
+
+        for asset_id, field, stored, expected in mismatches[:options['limit']]:
+            if field == 'changes_as_of':
+                self.stdout.write(f'  asset {asset_id}: never computed')
+            else:
+                self.stdout.write(f'  asset {asset_id}: {field} stored {stored}, expected {expected}')
+
+        asset_ids = sorted({asset_id for asset_id, *_ in mismatches})
+        if options['fix']:
+            updated = recompute_changes(id__in=asset_ids)
+            self.stdout.write(self.style.SUCCESS(f'Recomputed {updated} assets'))
+            return
+        raise CommandError(f'{len(mismatches)} stored values differ on {len(asset_ids)} assets (rerun with --fix)')
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asset_manager', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MahallaPriceIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('district', models.CharField(max_length=100)),
+                ('mahalla', models.CharField(max_length=100)),
+                ('rooms', models.PositiveSmallIntegerField()),
+                ('area_band', models.CharField(max_length=20)),
+                ('area', models.PositiveSmallIntegerField()),
+                ('build_type', models.CharField(max_length=20)),
+                ('renovation', models.CharField(max_length=20)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('price_per_m2', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('built_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['district', 'mahalla', 'rooms', 'area', 'build_type', 'renovation'],
+                'constraints': [models.UniqueConstraint(fields=('mahalla', 'rooms', 'area_band', 'build_type', 'renovation'), name='unique_price_index_configuration')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asset_manager', '0002_mahalla_price_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetValueArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_month', models.DateField()),
+                ('values', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='assetvaluehistory',
+            index=models.Index(fields=['asset', '-date'], name='history_asset_date_desc'),
+        ),
+        migrations.AddField(
+            model_name='assetvaluearchive',
+            name='asset',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='value_archive', to='asset_manager.asset'),
+        ),
+    ]
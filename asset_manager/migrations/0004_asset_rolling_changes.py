@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asset_manager', '0003_asset_value_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='change_30d',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='change_365d',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='change_7d',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='change_90d',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='changes_as_of',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='value_30d_ago',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='value_365d_ago',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='value_7d_ago',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='value_90d_ago',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+    ]
@@ -0,0 +1,61 @@
+import json
+
+from django.db import migrations
+
+# Frozen copies of asset_manager.search as of this migration: later changes to
+# the live module must not change what this migration creates
+TABLE = 'marketplace_search'
+COLUMNS = ('name', 'brand', 'model', 'details', 'address', 'description')
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    f"{', '.join(COLUMNS)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+INSERT_SQL = f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) VALUES (%s{', %s' * len(COLUMNS)})"
+
+
+def details_text(description):
+    if not description:
+        return ''
+    try:
+        details = json.loads(description)
+    except (TypeError, ValueError):
+        return description
+    if not isinstance(details, dict):
+        return description
+    values = []
+    for value in details.values():
+        values.extend(value if isinstance(value, list) else [value])
+    return ' '.join(str(value) for value in values if value not in (None, ''))
+
+
+def listing_document(listing):
+    asset = listing.asset
+    return (listing.id, asset.name or '', asset.brand or '', asset.model or '',
+            details_text(asset.description), asset.address or '', listing.description or '')
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    MarketplaceListing = apps.get_model('asset_manager', 'MarketplaceListing')
+    documents = [listing_document(listing)
+                 for listing in MarketplaceListing.objects.using(schema_editor.connection.alias).select_related('asset')]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(INSERT_SQL, documents)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asset_manager', '0004_asset_rolling_changes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:57
+
+import json
+from collections import Counter
+
+from django.db import migrations, models
+
+# Frozen copies of asset_manager.facets as of this migration
+PRICE_EDGES = (0, 5_000, 10_000, 20_000, 50_000, 100_000, 200_000)
+MAX_ROOMS = 5
+VALUE_LENGTH = 100
+
+
+def price_bucket(price):
+    price = float(price)
+    for lower, upper in zip(PRICE_EDGES, PRICE_EDGES[1:]):
+        if price < upper:
+            return f'{lower}-{upper}'
+    return f'{PRICE_EDGES[-1]}+'
+
+
+def district(description):
+    try:
+        details = json.loads(description) if description else {}
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(details, dict) or not details.get('district'):
+        return None
+    return str(details['district']).strip() or None
+
+
+def facet_values(asset_type, description, rooms, brand, price):
+    values = [('asset_type', asset_type), ('price', price_bucket(price))]
+    name = district(description)
+    if name:
+        values.append(('district', name[:VALUE_LENGTH]))
+    if asset_type == 'apartment' and rooms:
+        values.append(('rooms', str(rooms) if rooms < MAX_ROOMS else f'{MAX_ROOMS}+'))
+    if asset_type == 'car' and brand:
+        values.append(('brand', brand[:VALUE_LENGTH]))
+    return values
+
+
+def count_listings(apps, schema_editor):
+    MarketplaceListing = apps.get_model('asset_manager', 'MarketplaceListing')
+    MarketplaceFacetCount = apps.get_model('asset_manager', 'MarketplaceFacetCount')
+    alias = schema_editor.connection.alias
+    counts = Counter()
+    for row in (MarketplaceListing.objects.using(alias).filter(is_active=True)
+                .values_list('asset__asset_type', 'asset__description', 'asset__rooms', 'asset__brand',
+                             'listing_price')):
+        counts.update(facet_values(*row))
+    MarketplaceFacetCount.objects.using(alias).bulk_create(
+        MarketplaceFacetCount(facet=facet, value=value, count=count) for (facet, value), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asset_manager', '0005_marketplace_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketplaceFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['facet', 'value'],
+                'constraints': [models.UniqueConstraint(fields=('facet', 'value'), name='unique_marketplace_facet_value')],
+            },
+        ),
+        migrations.RunPython(count_listings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asset_manager', '0006_marketplace_facet_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketplacelisting',
+            name='deal_ratio',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketplacelisting',
+            name='estimated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketplacelisting',
+            name='estimated_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='marketplacelisting',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['deal_ratio'], name='marketplace_deal_idx'),
+        ),
+    ]
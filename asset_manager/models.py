@@ -60,6 +60,17 @@ class Asset(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Rolling changes maintained by asset_manager.returns (percent, and the value N days before changes_as_of)
+    change_7d = models.FloatField(null=True, blank=True)
+    change_30d = models.FloatField(null=True, blank=True)
+    change_90d = models.FloatField(null=True, blank=True)
+    change_365d = models.FloatField(null=True, blank=True)
+    value_7d_ago = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    value_30d_ago = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    value_90d_ago = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    value_365d_ago = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    changes_as_of = models.DateField(null=True, blank=True)
+
     def __str__(self):
         return f"{self.name} - {self.get_asset_type_display()}"
 
@@ -72,11 +83,32 @@ class AssetValueHistory(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Serves the default ordering per asset without a sort
+            models.Index(fields=['asset', '-date'], name='history_asset_date_desc'),
+        ]
 
     def __str__(self):
         return f"{self.asset.name} - ${self.value} on {self.date}"
 
 
+class AssetValueArchive(models.Model):
+    """Monthly values of an asset rolled up out of ``AssetValueHistory``
+
+    ``values`` packs one little-endian float64 per month starting at
+    ``start_month`` (NaN for months without a value); see ``asset_manager.history``.
+    ``manage.py archive_asset_history`` moves rows older than the retention
+    window here.
+    """
+    asset = models.OneToOneField(Asset, on_delete=models.CASCADE, related_name='value_archive')
+    start_month = models.DateField()
+    values = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.asset.name} - {len(self.values) // 8} archived months from {self.start_month}"
+
+
 class MarketplaceListing(models.Model):
     """Model to track assets listed for sale in the marketplace"""
     asset = models.OneToOneField(Asset, on_delete=models.CASCADE, related_name='marketplace_listing')
@@ -91,8 +123,67 @@ class MarketplaceListing(models.Model):
     contact_phone = models.CharField(max_length=20, blank=True, null=True)
     contact_email = models.EmailField(blank=True, null=True)
     
+    # Model estimate of the asset and listing_price / estimate (below 1 is underpriced),
+    # set on listing and refreshed by the monthly revaluation
+    estimated_price = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    deal_ratio = models.FloatField(null=True, blank=True)
+    estimated_at = models.DateTimeField(null=True, blank=True)
+    
     class Meta:
         ordering = ['-listed_at']
+        indexes = [
+            # Partial, so ?sort=deal walks the active listings in ratio order
+            models.Index(fields=['deal_ratio'], condition=models.Q(is_active=True), name='marketplace_deal_idx'),
+        ]
     
     def __str__(self):
-        return f"Listing: {self.asset.name} - ${self.listing_price}" 
\ No newline at end of file
+        return f"Listing: {self.asset.name} - ${self.listing_price}" 
+
+class MahallaPriceIndex(models.Model):
+    """Model-estimated apartment prices for a grid of standard configurations in each mahalla
+
+    Rebuilt as a whole by ``manage.py build_price_index``; every row of one
+    build shares the same ``built_at``.
+    """
+    district = models.CharField(max_length=100)
+    mahalla = models.CharField(max_length=100)
+    rooms = models.PositiveSmallIntegerField()
+    area_band = models.CharField(max_length=20)
+    # Area the band was scored at
+    area = models.PositiveSmallIntegerField()
+    build_type = models.CharField(max_length=20)
+    renovation = models.CharField(max_length=20)
+    price = models.DecimalField(max_digits=15, decimal_places=2)
+    price_per_m2 = models.DecimalField(max_digits=12, decimal_places=2)
+    built_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['district', 'mahalla', 'rooms', 'area', 'build_type', 'renovation']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['mahalla', 'rooms', 'area_band', 'build_type', 'renovation'],
+                name='unique_price_index_configuration',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.mahalla} - {self.rooms} rooms, {self.area_band} m² - ${self.price_per_m2}/m²"
+
+class MarketplaceFacetCount(models.Model):
+    """Number of active marketplace listings with one value of one filter facet
+
+    Kept current by signals on listing and asset writes and reconciled against
+    the listings by ``manage.py reconcile_marketplace_facets``.
+    """
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['facet', 'value']
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='unique_marketplace_facet_value'),
+        ]
+
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
@@ -0,0 +1,132 @@
+import os
+import threading
+from datetime import datetime
+from itertools import product
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+
+from . import inference
+from .models import MahallaPriceIndex
+from .reference_data import CachedBody
+
+# Standard configurations scored in every mahalla
+PRICE_INDEX_ROOMS = (1, 2, 3, 4, 5)
+# (label, area scored for the band)
+PRICE_INDEX_AREA_BANDS = (('30-50', 40), ('50-70', 60), ('70-90', 80), ('90-120', 105), ('120-160', 140))
+PRICE_INDEX_BUILD_TYPES = tuple(inference.APARTMENT_VALUE_MAPPINGS['qurilish_turi'])
+PRICE_INDEX_RENOVATIONS = tuple(inference.APARTMENT_VALUE_MAPPINGS['renovation'])
+PRICE_INDEX_FLOOR = 3
+PRICE_INDEX_TOTAL_FLOORS = 9
+
+PRICE_INDEX_COLUMNS = [
+    'district', 'mahalla', 'rooms', 'area_band', 'area', 'build_type', 'renovation', 'price', 'price_per_m2',
+]
+
+
+def standard_configurations(month=None, year=None):
+    """Evaluate payloads for every mahalla x configuration, with the index fields of each"""
+    now = datetime.now()
+    mahallas = pd.read_csv(os.path.join(inference.DATA_PATH, 'mahalla_tuman_codes.csv'))
+    mahallas = mahallas.drop_duplicates('neighborhood_latin')[['district_str', 'neighborhood_latin']]
+
+    for (district, mahalla), rooms, (area_band, area), build_type, renovation in product(
+            mahallas.itertuples(index=False), PRICE_INDEX_ROOMS, PRICE_INDEX_AREA_BANDS,
+            PRICE_INDEX_BUILD_TYPES, PRICE_INDEX_RENOVATIONS):
+        payload = {
+            'area': area,
+            'rooms': rooms,
+            'floor': PRICE_INDEX_FLOOR,
+            'total_floors': PRICE_INDEX_TOTAL_FLOORS,
+            'district': district,
+            'mahalla': mahalla,
+            'qurilish_turi': build_type,
+            'renovation': renovation,
+            'month': month or now.month,
+            'year': year or now.year,
+        }
+        fields = {
+            'district': district,
+            'mahalla': mahalla,
+            'rooms': rooms,
+            'area_band': area_band,
+            'area': area,
+            'build_type': build_type,
+            'renovation': renovation,
+        }
+        yield payload, fields
+
+
+def score_apartments(payloads):
+    """Price many apartment payloads with one predict call per model"""
+    prices = np.empty(len(payloads))
+    for model_key, (positions, df) in inference.encode_apartments(payloads).items():
+        prices[positions] = inference.predict(model_key, df)
+    return prices
+
+
+def build_price_index(batch_size=20000):
+    """Score the whole configuration grid and replace the MahallaPriceIndex table
+
+    Returns the number of rows written.
+    """
+    built_at = timezone.now()
+    configurations = list(standard_configurations())
+    entries = []
+
+    for start in range(0, len(configurations), batch_size):
+        batch = configurations[start:start + batch_size]
+        prices = score_apartments([payload for payload, _ in batch])
+        for (payload, fields), price in zip(batch, prices):
+            entries.append(MahallaPriceIndex(
+                price=round(float(price), 2),
+                price_per_m2=round(float(price) / fields['area'], 2),
+                built_at=built_at,
+                **fields
+            ))
+
+    with transaction.atomic():
+        MahallaPriceIndex.objects.all().delete()
+        MahallaPriceIndex.objects.bulk_create(entries, batch_size=5000)
+    return len(entries)
+
+
+_bodies = {}
+_built_at = None
+_lock = threading.Lock()
+
+
+def _rebuild_bodies(built_at):
+    rows = list(MahallaPriceIndex.objects.filter(built_at=built_at).values_list(*PRICE_INDEX_COLUMNS))
+    rows = [[*row[:7], float(row[7]), float(row[8])] for row in rows]
+
+    by_mahalla = {}
+    for row in rows:
+        by_mahalla.setdefault(row[1], []).append(row)
+
+    version = built_at.isoformat()
+    payloads = {None: rows, **by_mahalla}
+    return {
+        key: CachedBody({'built_at': version, 'columns': PRICE_INDEX_COLUMNS, 'rows': key_rows}, version)
+        for key, key_rows in payloads.items()
+    }
+
+
+def get_price_index(mahalla=None):
+    """Serialized index (or one mahalla of it), or None when not built or the mahalla is unknown
+
+    Bodies are built once per index build; a request costs one indexed lookup
+    of the latest ``built_at``, so every worker notices a rebuild.
+    """
+    global _bodies, _built_at
+    built_at = MahallaPriceIndex.objects.order_by('-built_at').values_list('built_at', flat=True).first()
+    if built_at is None:
+        return None
+    if built_at != _built_at:
+        with _lock:
+            if built_at != _built_at:
+                _bodies = _rebuild_bodies(built_at)
+                _built_at = built_at
+    return _bodies.get(mahalla)
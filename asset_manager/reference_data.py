@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .inference import DATA_PATH
+
+
+class CachedBody:
+    """A JSON body serialized once, with its gzip variant and strong ETags"""
+
+    def __init__(self, payload, version):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(version.encode() + self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+
+        gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        # Tiny bodies only grow when compressed
+        self.gzip_body = gzip_body if len(gzip_body) < len(self.body) else None
+        self.gzip_etag = f'"{digest}-gz"'
+
+
+class ReferenceData:
+    """Response bodies derived from CSVs in ``data/``, rebuilt only when a CSV changes
+
+    ``build`` receives the loaded frames and returns a ``{key: payload}`` mapping;
+    every payload is serialized and compressed up front so a request is a dict
+    lookup plus an ETag comparison.
+    """
+
+    def __init__(self, filenames, build):
+        self.paths = [os.path.join(DATA_PATH, filename) for filename in filenames]
+        self.build = build
+        self._signature = None
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def _current_signature(self):
+        return tuple((stat.st_mtime_ns, stat.st_size) for stat in map(os.stat, self.paths))
+
+    def _rebuild(self, signature):
+        contents = []
+        for path in self.paths:
+            with open(path, 'rb') as f:
+                contents.append(f.read())
+        # Content hash, so identical CSVs on every node give identical ETags
+        version = hashlib.sha256(b'\0'.join(contents)).hexdigest()
+
+        frames = [pd.read_csv(path) for path in self.paths]
+        self._bodies = {key: CachedBody(payload, version) for key, payload in self.build(*frames).items()}
+        self._signature = signature
+
+    def get(self, key):
+        signature = self._current_signature()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._rebuild(signature)
+        return self._bodies.get(key)
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+
+
+def cached_json_response(request, cached, max_age=None):
+    """Serve a CachedBody with ETag/Cache-Control, gzip when accepted and 304 when unchanged"""
+    if max_age is None:
+        max_age = getattr(settings, 'REFERENCE_DATA_MAX_AGE', 86400)
+    use_gzip = cached.gzip_body is not None and 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    etag = cached.gzip_etag if use_gzip else cached.etag
+
+    if _etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(cached.gzip_body if use_gzip else cached.body,
+                                content_type='application/json; charset=utf-8')
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+
+    response['ETag'] = etag
+    response['Cache-Control'] = f"public, max-age={max_age}"
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def _build_districts_mahallas(neighborhoods):
+    # Group mahallas by district, keeping the CSV order and dropping repeats
+    pairs = neighborhoods[['district_name_latin', 'mahalla_name_latin']].drop_duplicates()
+    grouped = pairs.groupby('district_name_latin', sort=False)['mahalla_name_latin'].agg(list)
+    return {None: grouped.to_dict()}
+
+
+def _build_car_brands(brand_car_names):
+    return {None: {'brands': brand_car_names['brand'].unique().tolist()}}
+
+
+def _build_car_models(brand_car_names):
+    grouped = brand_car_names.groupby('brand', sort=False)['car_name'].agg(lambda names: names.unique().tolist())
+    return {brand: {'models': models} for brand, models in grouped.items()}
+
+
+def _build_car_specs(car_body_enginevol):
+    specs = {}
+    for car_name, body_type, engine_volume in car_body_enginevol.drop_duplicates('car_name')[
+            ['car_name', 'body_type', 'engine_volume']].itertuples(index=False):
+        specs[car_name] = {
+            'body_type': body_type,
+            'engine_volume': None if pd.isnull(engine_volume) else float(engine_volume)
+        }
+    return specs
+
+
+districts_mahallas = ReferenceData(['neighborhoods.csv'], _build_districts_mahallas)
+car_brands = ReferenceData(['Brand_and_car_column.csv'], _build_car_brands)
+car_models = ReferenceData(['Brand_and_car_column.csv'], _build_car_models)
+car_specs = ReferenceData(['data_to_find_enginevol_body.csv'], _build_car_specs)
+
+EMPTY_CAR_MODELS = CachedBody({'models': []}, 'empty')
+EMPTY_CAR_SPECS = CachedBody({'body_type': '', 'engine_volume': None}, 'empty')
@@ -0,0 +1,74 @@
+import os
+import sys
+
+# Project root, where the PDF generators live
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _ensure_project_root_on_path():
+    """Add the project root to Python path so we can import the PDF generators"""
+    if BASE_DIR not in sys.path:
+        sys.path.append(BASE_DIR)
+
+
+def apartment_report_details(evaluation_data):
+    """Build the property details dictionary shown in the apartment PDF"""
+    return {
+        'Hudud': f"{evaluation_data.get('district', '')}, {evaluation_data.get('mahalla', '')}",
+        'Maydoni': f"{evaluation_data.get('area', '')}m²" if evaluation_data.get('area') else '',
+        'Xonalar soni': str(evaluation_data.get('rooms', '')),
+        'Qavat': str(evaluation_data.get('floor', '')),
+        'Binoning qavatlar soni': str(evaluation_data.get('total_floors', '')),
+        'Jihozlangan': evaluation_data.get('mebel', ''),
+        'Atrofda': ', '.join(evaluation_data.get('atrofda', [])) if evaluation_data.get('atrofda') else '',
+        'Uyda mavjud': ', '.join(evaluation_data.get('uyda', [])) if evaluation_data.get('uyda') else '',
+        'Mulk turi': evaluation_data.get('owner', ''),
+        'Planirovka': evaluation_data.get('planirovka', ''),
+        "Ta'mir turi": evaluation_data.get('renovation', ''),
+        'Sanuzel': evaluation_data.get('sanuzel', ''),
+        'Bozor turi': evaluation_data.get('bino_turi', ''),
+        'Qurilish turi': evaluation_data.get('qurilish_turi', ''),
+        "Kelishish mumkinmi": evaluation_data.get('kelishsa', ''),
+        'Baholash vaqti': f"{evaluation_data.get('month', '')}-{evaluation_data.get('year', '')}"
+    }
+
+
+def car_report_details(evaluation_data):
+    """Build the property details dictionary shown in the car PDF"""
+    return {
+        'Hudud': evaluation_data.get('state', ''),
+        'Brend': evaluation_data.get('brand', ''),
+        'Nomi': evaluation_data.get('model', ''),
+        'Ishlab chiqarilgan yili': str(evaluation_data.get('year', '')),
+        'Mator hajmi': str(evaluation_data.get('engine_volume', '')),
+        "Yoqilg'gi turi": evaluation_data.get('fuel', ''),
+        'Egalik turi': evaluation_data.get('ownership', ''),
+        'Kuzov turi': evaluation_data.get('body_type', ''),
+        'Rangi': evaluation_data.get('color', ''),
+        'Holati': evaluation_data.get('condition', ''),
+        "Qo'shimcha narsalari": ', '.join(evaluation_data.get('features', [])) if evaluation_data.get('features') else '',
+        'Oldingi egalari soni': str(evaluation_data.get('owners_count', '')),
+        'Yurgan masofasi': str(evaluation_data.get('mileage', '')),
+        'Kuchlanishi': evaluation_data.get('transmission', ''),
+        'Baholash vaqti': f"{evaluation_data.get('month', '')}-{evaluation_data.get('eval_year', '')}"
+    }
+
+
+def render_apartment_report(property_details, predicted_price, price_range):
+    """Render the apartment PDF and return its bytes
+
+    Kept free of Django imports so it can run inside a worker process.
+    """
+    _ensure_project_root_on_path()
+    from pdf_generator import create_report
+    return create_report(property_details, str(predicted_price), price_range)
+
+
+def render_car_report(property_details, predicted_price, price_range):
+    """Render the car PDF and return its bytes
+
+    Kept free of Django imports so it can run inside a worker process.
+    """
+    _ensure_project_root_on_path()
+    from pdf_generator_auto import create_report_auto
+    return create_report_auto(property_details, str(predicted_price), price_range)
@@ -0,0 +1,167 @@
+"""Rolling value changes stored on each asset
+
+For every window in ``CHANGE_WINDOWS`` an ``Asset`` keeps the value on or
+before ``changes_as_of`` minus N days (``value_<N>d_ago``) and the percentage
+change from it to ``current_value`` (``change_<N>d``), so showing a change is
+a column read instead of a history lookup.
+
+``recompute_changes`` refreshes every asset in bulk from the monthly job.
+``refresh_changes`` keeps one asset current when its value or history
+changes: only references whose cutoff the change can affect are looked up
+again. ``verify_changes`` compares the stored columns with ``compute_changes``,
+the on-the-fly computation.
+"""
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from .history import archived_value_on_or_before, value_on_or_before
+from .models import Asset, AssetValueArchive, AssetValueHistory
+
+CHANGE_WINDOWS = (7, 30, 90, 365)
+
+
+def change_field(days):
+    return f'change_{days}d'
+
+
+def reference_field(days):
+    return f'value_{days}d_ago'
+
+
+CHANGE_FIELDS = [
+    *(change_field(days) for days in CHANGE_WINDOWS),
+    *(reference_field(days) for days in CHANGE_WINDOWS),
+    'changes_as_of',
+]
+
+
+def percentage_change(current, past):
+    """Change from ``past`` to ``current`` in percent, 0.0 without a positive ``past``"""
+    if past is None or past <= 0:
+        return 0.0
+    return round((float(current) - float(past)) / float(past) * 100, 2)
+
+
+def compute_changes(asset, today=None):
+    """``{days: (reference value, change)}`` computed from the history right now"""
+    today = today or date.today()
+    changes = {}
+    for days in CHANGE_WINDOWS:
+        past = value_on_or_before(asset, today - timedelta(days=days))
+        changes[days] = (past, percentage_change(asset.current_value, past))
+    return changes
+
+
+def _set_changes(asset, references, today):
+    for days in CHANGE_WINDOWS:
+        past = references.get(days, getattr(asset, reference_field(days)))
+        past = None if past is None else round(float(past), 2)
+        setattr(asset, reference_field(days), past)
+        setattr(asset, change_field(days), percentage_change(asset.current_value, past))
+    asset.changes_as_of = today
+
+
+def refresh_changes(asset, changed_on=None, today=None, save=True):
+    """Bring an asset's stored changes up to date after a write
+
+    ``changed_on`` is the date of a history entry just written, if any. When
+    the stored references are already from today, only windows whose cutoff
+    is on or after ``changed_on`` are looked up again; a new ``current_value``
+    alone just recomputes the percentages.
+    """
+    today = today or date.today()
+    if asset.changes_as_of != today:
+        windows = CHANGE_WINDOWS
+    elif changed_on is not None:
+        windows = [days for days in CHANGE_WINDOWS if changed_on <= today - timedelta(days=days)]
+    else:
+        windows = []
+
+    references = {days: value_on_or_before(asset, today - timedelta(days=days)) for days in windows}
+    _set_changes(asset, references, today)
+    if save:
+        asset.save(update_fields=CHANGE_FIELDS)
+
+
+def recompute_changes(batch_size=500, today=None, **filters):
+    """Recompute the stored changes of all assets (or those matching ``filters``)
+
+    References come from one correlated subquery per window; assets without a
+    qualifying row fall back to their archive. Each batch is written in one
+    transaction. Returns the number of assets updated.
+    """
+    today = today or date.today()
+    annotations = {
+        f'_reference_{days}': Subquery(
+            AssetValueHistory.objects.filter(asset=OuterRef('pk'), date__lte=today - timedelta(days=days))
+            .order_by('-date', '-id').values('value')[:1]
+        )
+        for days in CHANGE_WINDOWS
+    }
+    assets = (Asset.objects.filter(**filters).only('id', 'current_value', *CHANGE_FIELDS)
+              .annotate(**annotations).order_by('id'))
+
+    updated = 0
+    batch = []
+    for asset in assets.iterator(chunk_size=batch_size):
+        batch.append(asset)
+        if len(batch) >= batch_size:
+            updated += _write_batch(batch, today)
+            batch = []
+    if batch:
+        updated += _write_batch(batch, today)
+    return updated
+
+
+def _write_batch(assets, today):
+    missing = [asset.id for asset in assets
+               if any(getattr(asset, f'_reference_{days}') is None for days in CHANGE_WINDOWS)]
+    archives = {archive.asset_id: archive for archive in AssetValueArchive.objects.filter(asset_id__in=missing)}
+
+    for asset in assets:
+        references = {}
+        for days in CHANGE_WINDOWS:
+            past = getattr(asset, f'_reference_{days}')
+            # Archived months all precede the rows, so they only matter when no row qualifies
+            if past is None and asset.id in archives:
+                past = archived_value_on_or_before(archives[asset.id], today - timedelta(days=days))
+            references[days] = past
+        _set_changes(asset, references, today)
+
+    # One parameterised UPDATE per asset; bulk_update's CASE expressions cost far more to build
+    fields = [Asset._meta.get_field(name) for name in CHANGE_FIELDS]
+    sql = (f"UPDATE {connection.ops.quote_name(Asset._meta.db_table)} SET "
+           f"{', '.join(f'{connection.ops.quote_name(field.column)} = %s' for field in fields)} "
+           f"WHERE {connection.ops.quote_name(Asset._meta.pk.column)} = %s")
+    rows = [[field.get_db_prep_save(getattr(asset, field.attname), connection) for field in fields] + [asset.id]
+            for asset in assets]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    return len(assets)
+
+
+def verify_changes(tolerance=0.01, **filters):
+    """Assets whose stored changes differ from ``compute_changes``
+
+    Each asset is checked as of its own ``changes_as_of``. Returns
+    ``(checked, mismatches)`` where a mismatch is ``(asset_id, field, stored,
+    expected)``; assets never computed are reported with field
+    ``changes_as_of``.
+    """
+    checked, mismatches = 0, []
+    for asset in Asset.objects.filter(**filters).only('id', 'current_value', *CHANGE_FIELDS).iterator():
+        checked += 1
+        if asset.changes_as_of is None:
+            mismatches.append((asset.id, 'changes_as_of', None, None))
+            continue
+        for days, (past, change) in compute_changes(asset, today=asset.changes_as_of).items():
+            stored_past = getattr(asset, reference_field(days))
+            if (stored_past is None) != (past is None) or (
+                    past is not None and abs(float(stored_past) - past) > tolerance):
+                mismatches.append((asset.id, reference_field(days), stored_past, past))
+            stored_change = getattr(asset, change_field(days))
+            if stored_change is None or abs(stored_change - change) > tolerance:
+                mismatches.append((asset.id, change_field(days), stored_change, change))
+    return checked, mismatches
@@ -0,0 +1,151 @@
+"""Full-text search over marketplace listings with SQLite FTS5
+
+``marketplace_search`` is an FTS5 table with one document per listing (rowid
+= listing id) holding the asset name, brand, model, the values of the JSON
+details in ``Asset.description`` (district, mahalla, ...), the address and
+the listing text. Signals keep it in step with listings and their assets;
+``rebuild_index`` (``manage.py rebuild_marketplace_search``) refills it after
+bulk writes that bypass signals.
+
+``search_listing_ids`` turns a free-text query into an FTS5 prefix match
+(every word must match the start of a token) and orders hits by bm25, with
+matches in the name, brand and model weighted above the address and
+description. On databases other than SQLite it falls back to ``icontains``
+over the same fields.
+"""
+import json
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import MarketplaceListing
+
+TABLE = 'marketplace_search'
+COLUMNS = ('name', 'brand', 'model', 'details', 'address', 'description')
+# bm25 weight per column, in COLUMNS order
+WEIGHTS = (10.0, 6.0, 6.0, 4.0, 2.0, 1.0)
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    f"{', '.join(COLUMNS)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+INSERT_SQL = f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) VALUES (%s{', %s' * len(COLUMNS)})"
+# Query words beyond this are ignored
+MAX_TERMS = 8
+
+
+def available(using=None):
+    return (using or connection).vendor == 'sqlite'
+
+
+def _details_text(description):
+    """Values of the JSON details (lists flattened), or the raw text when it is not JSON"""
+    if not description:
+        return ''
+    try:
+        details = json.loads(description)
+    except (TypeError, ValueError):
+        return description
+    if not isinstance(details, dict):
+        return description
+    values = []
+    for value in details.values():
+        values.extend(value if isinstance(value, list) else [value])
+    return ' '.join(str(value) for value in values if value not in (None, ''))
+
+
+def listing_document(listing):
+    """``(rowid, *COLUMNS)`` for one listing with its asset loaded"""
+    asset = listing.asset
+    return (listing.id, asset.name or '', asset.brand or '', asset.model or '',
+            _details_text(asset.description), asset.address or '', listing.description or '')
+
+
+def index_listing(listing):
+    if not available():
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [listing.id])
+        cursor.execute(INSERT_SQL, listing_document(listing))
+
+
+def remove_listing(listing_id):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [listing_id])
+
+
+def rebuild_index(batch_size=2000):
+    """Refill the index from every listing in one transaction; returns the number indexed"""
+    if not available():
+        return 0
+    listings = (MarketplaceListing.objects.select_related('asset').order_by('id')
+                .only('id', 'description', 'asset__name', 'asset__brand', 'asset__model',
+                      'asset__description', 'asset__address'))
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        batch = []
+        for listing in listings.iterator(chunk_size=batch_size):
+            batch.append(listing_document(listing))
+            if len(batch) >= batch_size:
+                cursor.executemany(INSERT_SQL, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(INSERT_SQL, batch)
+            count += len(batch)
+        # Merge the segments written by the bulk insert
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return count
+
+
+def terms(query):
+    """Lower-cased words of a free-text query, at most ``MAX_TERMS``"""
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+def match_expression(query):
+    """FTS5 MATCH string requiring a prefix match of every word, or None for an empty query"""
+    words = terms(query)
+    # Words are \w+ only, so quoting them cannot break out of the string
+    return ' '.join(f'"{word}"*' for word in words) or None
+
+
+def search_listing_ids(query, listings, limit=200):
+    """Ids of ``listings`` matching ``query``, best first, at most ``limit``
+
+    ``listings`` is a queryset carrying the other filters; it is embedded as a
+    subquery, so the index never returns more than ``limit`` ids.
+    """
+    match = match_expression(query)
+    if match is None:
+        return []
+
+    if not available(connection):
+        return scan_listing_ids(query, listings, limit)
+
+    # Hits are materialized first and joined to the filtered queryset by primary
+    # key, so ranking, filtering and the limit run as one statement in SQLite
+    allowed_sql, allowed_params = listings.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH hits AS MATERIALIZED ("
+            f"SELECT rowid AS id, bm25({TABLE}, {', '.join(str(weight) for weight in WEIGHTS)}) AS score "
+            f"FROM {TABLE} WHERE {TABLE} MATCH %s) "
+            f"SELECT hits.id FROM hits JOIN ({allowed_sql}) allowed ON allowed.id = hits.id "
+            # bm25 is lower for better matches; newer listings win ties
+            f"ORDER BY hits.score, hits.id DESC{' LIMIT %s' if limit is not None else ''}",
+            [match, *allowed_params, *([limit] if limit is not None else [])],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+def scan_listing_ids(query, listings, limit=200):
+    """``icontains`` scan over the indexed fields, newest first; the fallback without FTS5"""
+    condition = Q()
+    for word in terms(query):
+        condition &= (Q(asset__name__icontains=word) | Q(asset__brand__icontains=word)
+                      | Q(asset__model__icontains=word) | Q(asset__description__icontains=word)
+                      | Q(asset__address__icontains=word) | Q(description__icontains=word))
+    return list(listings.filter(condition).order_by('-listed_at').values_list('id', flat=True)[:limit])
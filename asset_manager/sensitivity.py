@@ -0,0 +1,131 @@
+"""What-if analysis: score a base apartment payload under a grid of changed inputs
+
+Variants are produced by editing the encoded base row rather than re-encoding
+payloads, so a sweep of hundreds of variants costs one frame and one predict
+call.
+"""
+import math
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from . import inference
+
+# Numeric payload fields and the feature column they set
+NUMERIC_DIMENSIONS = {
+    'area': 'totalArea',
+    'rooms': 'numberOfRooms',
+    'floor': 'floor',
+    'total_floors': 'floorOfHouse',
+}
+
+# Yes/no payload fields, sent as 'Ha'/'Yo'q' by the UI
+FLAG_DIMENSIONS = {
+    'mebel': 'furnished',
+    'kelishsa': 'handle',
+}
+
+CATEGORICAL_DIMENSIONS = {field: prefix for prefix, field in inference.APARTMENT_CATEGORICAL_PREFIXES}
+
+SWEEPABLE = [*NUMERIC_DIMENSIONS, *FLAG_DIMENSIONS, *CATEGORICAL_DIMENSIONS]
+
+
+def _sweep_values(field, spec, max_values):
+    """A list of values, or ``{"min", "max", "step"}`` for a numeric range of at most ``max_values``"""
+    if isinstance(spec, dict):
+        if field not in NUMERIC_DIMENSIONS:
+            raise ValueError(f'{field} does not accept a range')
+        try:
+            start, stop, step = float(spec['min']), float(spec['max']), float(spec['step'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'{field} range needs numeric min, max and step')
+        if not all(math.isfinite(bound) for bound in (start, stop, step)) or step <= 0 or stop < start:
+            raise ValueError(f'{field} range needs min <= max and a positive step')
+        # Checked before arange so an oversized range is never materialised
+        span = (stop - start) / step
+        if not span < max_values:
+            raise ValueError(f'{field} range has more than {max_values} values')
+        values = np.arange(start, stop + step / 2, step).round(6).tolist()
+    elif isinstance(spec, list) and spec:
+        if len(spec) > max_values:
+            raise ValueError(f'{field} has more than {max_values} values')
+        values = spec
+    else:
+        raise ValueError(f'{field} needs a non-empty list of values or a range')
+
+    if field in NUMERIC_DIMENSIONS:
+        try:
+            values = [float(value) for value in values]
+        except (TypeError, ValueError):
+            raise ValueError(f'{field} values must be numeric')
+        return [int(value) if value.is_integer() else value for value in values]
+    return values
+
+
+def _patches(field, values, columns):
+    """For each swept value, the encoded columns it sets"""
+    if field in NUMERIC_DIMENSIONS:
+        return [{NUMERIC_DIMENSIONS[field]: value} for value in values]
+    if field in FLAG_DIMENSIONS:
+        return [{FLAG_DIMENSIONS[field]: 1 if value == 'Ha' else 0} for value in values]
+
+    prefix = CATEGORICAL_DIMENSIONS[field]
+    mapping = inference.APARTMENT_VALUE_MAPPINGS[field]
+    one_hot = [col for col in columns if col.startswith(prefix)]
+    patches = []
+    for value in values:
+        column = f'{prefix}{mapping.get(value, value)}'
+        if column not in one_hot:
+            raise ValueError(f'Unknown {field} value: {value}')
+        patches.append({col: int(col == column) for col in one_hot})
+    return patches
+
+
+def apartment_sensitivity(base, sweep, max_variants=1000):
+    """Price ``base`` and every combination of the ``sweep`` values
+
+    ``sweep`` maps a payload field (see ``SWEEPABLE``) to the values to try.
+    Location is not sweepable: it decides which model scores the payload.
+    Returns the base price and one row per variant with the swept values, the
+    price and its change against the base.
+    """
+    if not isinstance(sweep, dict) or not sweep:
+        raise ValueError(f'sweep must map at least one of {", ".join(SWEEPABLE)} to values')
+    unknown = [field for field in sweep if field not in SWEEPABLE]
+    if unknown:
+        raise ValueError(f'Cannot sweep {", ".join(unknown)}; sweepable fields are {", ".join(SWEEPABLE)}')
+
+    dimensions = list(sweep)
+    values = [_sweep_values(field, sweep[field], max_variants) for field in dimensions]
+    # math.prod is exact; np.prod wraps around in int64 and could slip under the limit
+    n_variants = math.prod(len(field_values) for field_values in values)
+    if n_variants > max_variants:
+        raise ValueError(f'{n_variants} variants requested; the limit is {max_variants}')
+
+    resources = inference.load_apartment_resources()
+    model_key, row = inference.apartment_feature_row(base, resources)
+    patches = [_patches(field, field_values, row) for field, field_values in zip(dimensions, values)]
+
+    # Row 0 is the base, rows 1.. the variants in product order (last dimension fastest)
+    frame = pd.DataFrame([row] * (n_variants + 1))
+    choice = np.indices([len(field_values) for field_values in values]).reshape(len(dimensions), -1)
+    for dimension_patches, picks in zip(patches, choice):
+        for column in dimension_patches[0]:
+            column_values = np.array([patch[column] for patch in dimension_patches])
+            frame[column] = np.r_[row[column], column_values[picks]]
+
+    prices = inference.predict(model_key, inference.apartment_frame(model_key, frame, resources))
+    base_price, variant_prices = float(prices[0]), prices[1:]
+    deltas = variant_prices - base_price
+
+    return {
+        'model': model_key,
+        'base_price': round(base_price),
+        'columns': [*dimensions, 'price', 'delta', 'delta_pct'],
+        'rows': [
+            [*combination, round(float(price)), round(float(delta)),
+             round(float(delta / base_price * 100), 2) if base_price else None]
+            for combination, price, delta in zip(product(*values), variant_prices, deltas)
+        ],
+    }
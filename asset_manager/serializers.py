@@ -29,18 +29,39 @@ class AssetValueHistorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 class AssetSerializer(serializers.ModelSerializer):
+    """Asset with its portfolio name and value history
+
+    ``fields`` limits the output to those fields. ``history_source`` reads
+    ``value_history`` from another attribute (e.g. a bounded prefetch), and
+    ``include_history=False`` drops it. The asset list uses these to keep
+    payloads small.
+    """
     value_history = AssetValueHistorySerializer(many=True, read_only=True)
     portfolio_name = serializers.CharField(source='portfolio.name', read_only=True)
 
+    def __init__(self, *args, fields=None, include_history=True, history_source=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not include_history:
+            self.fields.pop('value_history')
+        elif history_source:
+            self.fields['value_history'] = AssetValueHistorySerializer(many=True, read_only=True, source=history_source)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Asset
         fields = [
             'id', 'portfolio', 'portfolio_name', 'asset_type', 'name', 'address', 
             'current_value', 'purchase_price', 'purchase_date', 'image_url',
             'area', 'rooms', 'floor', 'total_floors', 'year', 'mileage', 
-            'brand', 'model', 'description', 'value_history', 'created_at', 'updated_at'
+            'brand', 'model', 'description', 'value_history', 'created_at', 'updated_at',
+            'change_7d', 'change_30d', 'change_90d', 'change_365d', 'changes_as_of'
+        ]
+        read_only_fields = [
+            'id', 'created_at', 'updated_at',
+            'change_7d', 'change_30d', 'change_90d', 'change_365d', 'changes_as_of'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
 
 class AssetCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -61,4 +82,11 @@ class AssetCreateSerializer(serializers.ModelSerializer):
             date=asset.created_at.date()
         )
         
-        return asset 
\ No newline at end of file
+        return asset 
+
+class AssetImportSerializer(AssetCreateSerializer):
+    """One row of a bulk import; the portfolio comes from the URL and current_value may be estimated"""
+    current_value = serializers.DecimalField(max_digits=15, decimal_places=2, required=False)
+
+    class Meta(AssetCreateSerializer.Meta):
+        fields = [field for field in AssetCreateSerializer.Meta.fields if field != 'portfolio']
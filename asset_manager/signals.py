@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import comparables, facets, search
+from .authentication import invalidate_token, invalidate_user_tokens
+from .models import Asset, MarketplaceListing, User
+
+# Asset fields that feed the marketplace search document
+SEARCH_FIELDS = {'name', 'brand', 'model', 'description', 'address'}
+
+
+@receiver(post_delete, sender=Token)
+def drop_deleted_token(sender, instance, **kwargs):
+    """Logout and token revocation delete the Token row"""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def drop_tokens_of_saved_user(sender, instance, **kwargs):
+    """Password changes and deactivation must not be served from a stale cached user"""
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def drop_tokens_of_deleted_user(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(user_logged_out)
+def drop_tokens_on_logout(sender, user, **kwargs):
+    if user is not None:
+        invalidate_user_tokens(user.pk)
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS (WAL, mmap, busy timeout, ...) to every new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name}={value}')
+
+
+@receiver(post_save, sender=MarketplaceListing)
+def index_saved_listing(sender, instance, **kwargs):
+    search.index_listing(instance)
+    comparables.listing_changed(instance)
+
+
+@receiver(post_delete, sender=MarketplaceListing)
+def unindex_deleted_listing(sender, instance, **kwargs):
+    search.remove_listing(instance.id)
+    comparables.listing_changed(instance, deleted=True)
+
+
+@receiver(post_save, sender=Asset)
+def reindex_listing_of_saved_asset(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the search document of a listed asset current when its text changes"""
+    if created or (update_fields is not None and not SEARCH_FIELDS & set(update_fields)):
+        return
+    listing = MarketplaceListing.objects.filter(asset=instance).only('id', 'description').first()
+    if listing is not None:
+        listing.asset = instance
+        search.index_listing(listing)
+
+
+@receiver(post_save, sender=Asset)
+def reencode_listing_of_saved_asset(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the comparables vector of a listed asset current when its features change"""
+    if not created:
+        comparables.asset_changed(instance, update_fields)
+
+
+@receiver(pre_save, sender=MarketplaceListing)
+def remember_listing_facets(sender, instance, **kwargs):
+    instance._stored_facets = facets.stored_values(pk=instance.pk) if instance.pk else []
+
+
+@receiver(post_save, sender=MarketplaceListing)
+def count_saved_listing(sender, instance, **kwargs):
+    facets.apply_change(getattr(instance, '_stored_facets', []), facets.listing_values(instance))
+
+
+@receiver(pre_delete, sender=MarketplaceListing)
+def uncount_deleted_listing(sender, instance, **kwargs):
+    facets.apply_change(facets.stored_values(pk=instance.pk), [])
+
+
+@receiver(pre_save, sender=Asset)
+def remember_asset_facets(sender, instance, update_fields=None, **kwargs):
+    """Facet values of the asset's listing before a write that can change them"""
+    instance._stored_facets = None
+    if instance.pk and (update_fields is None or facets.ASSET_FIELDS & set(update_fields)):
+        instance._stored_facets = facets.stored_values(asset_id=instance.pk)
+
+
+@receiver(post_save, sender=Asset)
+def recount_listing_of_saved_asset(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stored_facets', None)
+    if created or old is None:
+        return
+    listing = MarketplaceListing.objects.filter(asset=instance).only('id', 'is_active', 'listing_price').first()
+    if listing is not None:
+        listing.asset = instance
+        facets.apply_change(old, facets.listing_values(listing))
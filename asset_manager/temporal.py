@@ -0,0 +1,100 @@
+"""Temporal price model: multipliers applied to a model's base price per month
+
+Everything here is a pure function of an asset fingerprint and (year, month)
+arrays. The per-asset jitter is derived from the fingerprint digest rather
+than from a seeded global ``random``, so the same asset gets the same history
+in every process and on every node, and results can be cached by fingerprint.
+"""
+import hashlib
+from datetime import date
+
+import numpy as np
+
+APARTMENT_ANNUAL_APPRECIATION = 0.06
+APARTMENT_VARIATION = 0.03
+# Real estate is more active in spring/summer; indexed by month - 1
+APARTMENT_SEASONALITY = np.array([0.96, 0.96, 1.05, 1.05, 1.05, 1.08, 1.08, 1.08, 1.02, 1.02, 0.96, 0.96])
+
+CAR_ANNUAL_DEPRECIATION = 0.18
+# Future months only follow inflation
+CAR_ANNUAL_INFLATION = 0.05
+CAR_VARIATION = 0.05
+CAR_SEASONALITY = np.array([0.95, 0.95, 1.08, 1.08, 1.08, 1.08, 1.05, 1.05, 1.0, 1.0, 0.95, 0.95])
+
+
+def fingerprint(*parts):
+    """Stable digest of the fields that identify an asset for the temporal model"""
+    key = '_'.join(str(part) for part in parts)
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def apartment_fingerprint(asset_data):
+    return fingerprint(asset_data.get('area', 0), asset_data.get('rooms', 0), asset_data.get('floor', 0),
+                       asset_data.get('district', ''), asset_data.get('mahalla', ''))
+
+
+def car_fingerprint(asset_data):
+    return fingerprint(asset_data.get('year', 2020), asset_data.get('mileage', 0),
+                       asset_data.get('brand', ''), asset_data.get('model', ''))
+
+
+def _jitter(asset_fingerprint, amplitude):
+    """``1 + u`` with ``u`` uniform in [-amplitude, amplitude) drawn from the fingerprint
+
+    A sequence of fingerprints gives a column vector, so the result broadcasts
+    against a row of months into an (assets x months) matrix.
+    """
+    if isinstance(asset_fingerprint, str):
+        return 1 + amplitude * (2 * int(asset_fingerprint[:16], 16) / 2 ** 64 - 1)
+    units = np.array([int(fp[:16], 16) for fp in asset_fingerprint], dtype=np.float64) / 2 ** 64
+    return (1 + amplitude * (2 * units - 1))[:, None]
+
+
+def _months_before(years, months, reference):
+    """Months from each (year, month) to the reference month; negative in the future"""
+    if reference is None:
+        today = date.today()
+        reference = (today.year, today.month)
+    ref_year, ref_month = reference
+    return (ref_year - np.asarray(years)) * 12 + (ref_month - np.asarray(months))
+
+
+def apartment_multipliers(asset_fingerprint, years, months, reference=None):
+    """Multipliers on the base apartment price for each (year, month)
+
+    Apartments appreciate 6% a year, so past months are discounted and future
+    months compound forward. ``reference`` is the (year, month) the base price
+    applies to and defaults to the current month. Given a sequence of
+    fingerprints the result is an (assets x months) matrix.
+    """
+    years, months = np.asarray(years), np.asarray(months)
+    months_diff = _months_before(years, months, reference)
+
+    monthly = APARTMENT_ANNUAL_APPRECIATION / 12
+    trend = np.where(months_diff > 0,
+                     (1 - monthly) ** np.maximum(months_diff, 0),
+                     (1 + monthly) ** np.maximum(-months_diff, 0))
+    # Economic cycles affecting real estate
+    cycle = 1 + np.cos((years - 2020) * 0.3 + months * 0.05) * 0.08
+
+    return trend * APARTMENT_SEASONALITY[months - 1] * cycle * _jitter(asset_fingerprint, APARTMENT_VARIATION)
+
+
+def car_multipliers(asset_fingerprint, years, months, reference=None):
+    """Multipliers on the base car price for each (year, month)
+
+    Cars depreciate 18% a year going back and follow 5% inflation going forward.
+    ``reference`` is the (year, month) the base price applies to and defaults to
+    the current month. Given a sequence of fingerprints the result is an
+    (assets x months) matrix.
+    """
+    years, months = np.asarray(years), np.asarray(months)
+    months_diff = _months_before(years, months, reference)
+
+    trend = np.where(months_diff > 0,
+                     (1 - CAR_ANNUAL_DEPRECIATION / 12) ** np.maximum(months_diff, 0),
+                     (1 + CAR_ANNUAL_INFLATION / 12) ** np.maximum(-months_diff, 0))
+    # Market cycles
+    cycle = 1 + np.sin((years - 2020) * 0.5 + months * 0.1) * 0.1
+
+    return trend * CAR_SEASONALITY[months - 1] * cycle * _jitter(asset_fingerprint, CAR_VARIATION)
@@ -1,16 +1,21 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     # Authentication
     path('auth/register/', views.register_user, name='register'),
     path('auth/login/', views.login_user, name='login'),
+    path('auth/logout/', views.logout_user, name='logout'),
     path('auth/profile/', views.get_user_profile, name='profile'),
     path('auth/debug/', views.debug_auth, name='debug_auth'),
     
     # Portfolios
     path('portfolios/', views.PortfolioListCreateView.as_view(), name='portfolio-list-create'),
     path('portfolios/<int:pk>/', views.PortfolioDetailView.as_view(), name='portfolio-detail'),
+    path('portfolios/<int:portfolio_id>/analytics/', views.get_portfolio_analytics, name='portfolio-analytics'),
+    path('portfolios/<int:portfolio_id>/projection/', views.get_portfolio_projection, name='portfolio-projection'),
+    path('portfolios/<int:portfolio_id>/import/', views.import_portfolio_assets, name='portfolio-import'),
+    path('portfolios/<int:portfolio_id>/export/', views.PortfolioExportView.as_view(), name='portfolio-export'),
     
     # Assets
     path('assets/', views.AssetListCreateView.as_view(), name='asset-list-create'),
@@ -20,26 +25,44 @@ urlpatterns = [
     
     # Evaluation
     path('evaluate/apartment/', views.evaluate_apartment, name='evaluate-apartment'),
+    path('evaluate/apartment/sensitivity/', views.evaluate_apartment_sensitivity, name='evaluate-apartment-sensitivity'),
+    path('evaluate/apartment/explain/', views.explain_apartment, name='explain-apartment'),
+    path('evaluate/apartment/comparables/', views.apartment_comparables, name='apartment-comparables'),
+    path('models/<str:model_key>/importance/', views.get_model_importance, name='model-importance'),
     
     # Dashboard
     path('dashboard/', views.get_dashboard_data, name='dashboard'),
     
     # Apartment evaluation
     path('districts-mahallas/', views.get_districts_mahallas, name='districts_mahallas'),
+    path('price-index/', views.get_price_index, name='price_index'),
     
     # Car evaluation  
     path('car-brands/', views.get_car_brands, name='get_car_brands'),
     path('car-models/', views.get_car_models, name='get_car_models'),
     path('car-specs/', views.get_car_specs, name='get_car_specs'),
     path('evaluate-car/', views.evaluate_car, name='evaluate_car'),
+    path('evaluate-car/explain/', views.explain_car, name='explain_car'),
+    path('evaluate-car/comparables/', views.car_comparables, name='car_comparables'),
     
     # PDF Downloads
     path('download-apartment-report/', views.download_apartment_report, name='download_apartment_report'),
     path('download-car-report/', views.download_car_report, name='download_car_report'),
+
+    # Async (ASGI) evaluation and PDF downloads
+    path('evaluate/apartment/async/', async_views.evaluate_apartment, name='evaluate-apartment-async'),
+    path('evaluate-car/async/', async_views.evaluate_car, name='evaluate_car_async'),
+    path('download-apartment-report/async/', async_views.download_apartment_report, name='download_apartment_report_async'),
+    path('download-car-report/async/', async_views.download_car_report, name='download_car_report_async'),
     
     # Marketplace
     path('marketplace/listings/', views.get_marketplace_listings, name='marketplace-listings'),
+    path('marketplace/facets/', views.get_marketplace_facets, name='marketplace-facets'),
     path('marketplace/create/', views.create_marketplace_listing, name='create-marketplace-listing'),
     path('marketplace/listings/<int:listing_id>/', views.remove_marketplace_listing, name='remove-marketplace-listing'),
     path('marketplace/my-listings/', views.get_user_marketplace_listings, name='user-marketplace-listings'),
+
+    # Metrics
+    path('metrics/inference/', views.get_inference_metrics, name='inference-metrics'),
+    path('metrics/drift/', views.get_drift_metrics, name='drift-metrics'),
 ] 
\ No newline at end of file
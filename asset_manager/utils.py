@@ -1,11 +1,46 @@
+import numpy as np
 import pandas as pd
 import joblib
 import os
 import json
 from datetime import datetime, timedelta
+from functools import lru_cache
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from .models import Asset, AssetValueHistory
+from . import temporal
+from .folding import fold_or_keep
+from .history import value_on_or_before
+from .returns import CHANGE_WINDOWS, change_field, recompute_changes, refresh_changes
+from .inference import CAR_DROPPED_COLUMNS
+
+@lru_cache(maxsize=None)
+def _load_estimator_resources(data_path):
+    """Load models and supporting data once per process; every PriceEstimator shares them read-only"""
+    # Car model with its scaler folded in when possible
+    car_model, car_scaler = fold_or_keep(
+        joblib.load(os.path.join(data_path, 'CHEVROLET_DAEWOO_RAVON_LGBM_41.pkl')),
+        joblib.load(os.path.join(data_path, 'scaler_CHEVROLET-DAEWOO-RAVON.pkl')),
+    )
+    return {
+        # Apartment models
+        'apartment_model1': joblib.load(os.path.join(data_path, 'GBM_MADEL_WITHOUT_DISTANCE.pkl')),
+        'apartment_model2': joblib.load(os.path.join(data_path, 'model2.pkl')),
+        
+        # Car model
+        'car_model': car_model,
+        'car_scaler': car_scaler,
+        
+        # Supporting data
+        'x_columns': pd.read_csv(os.path.join(data_path, 'xcolumns.csv')),
+        'uybor_cols': pd.read_csv(os.path.join(data_path, 'uybor_columns.csv')),
+        'mahalla_tuman': pd.read_csv(os.path.join(data_path, 'mahalla_tuman_codes.csv')),
+        'unique_mahalla_olx': pd.read_csv(os.path.join(data_path, 'unique_mahalla_olx.csv')),
+        
+        # Car-specific data
+        'brand_car_column': pd.read_csv(os.path.join(data_path, 'Brand_and_car_column.csv')),
+        'chevrolet_columns': pd.read_csv(os.path.join(data_path, 'Chevrolet_DAEWOO_RAVON_columns.csv')),
+    }
 
 class PriceEstimator:
     """Utility class for estimating asset prices using ML models"""
@@ -18,22 +53,16 @@ class PriceEstimator:
     def _load_models(self):
         """Load ML models and supporting data"""
         try:
-            # Load apartment model
-            self.apartment_model1 = joblib.load(os.path.join(self.data_path, 'GBM_MADEL_WITHOUT_DISTANCE.pkl'))
-            self.apartment_model2 = joblib.load(os.path.join(self.data_path, 'model2.pkl'))
-            
-            # Load car model
-            self.car_model = joblib.load(os.path.join(self.data_path, 'CHEVROLET_DAEWOO_RAVON_LGBM_41.pkl'))
+            for name, value in _load_estimator_resources(self.data_path).items():
+                setattr(self, name, value)
             
-            # Load supporting data
-            self.x_columns = pd.read_csv(os.path.join(self.data_path, 'xcolumns.csv'))
-            self.uybor_cols = pd.read_csv(os.path.join(self.data_path, 'uybor_columns.csv'))
-            self.mahalla_tuman = pd.read_csv(os.path.join(self.data_path, 'mahalla_tuman_codes.csv'))
-            self.unique_mahalla_olx = pd.read_csv(os.path.join(self.data_path, 'unique_mahalla_olx.csv'))
-            
-            # Car-specific data
-            self.brand_car_column = pd.read_csv(os.path.join(self.data_path, 'Brand_and_car_column.csv'))
-            self.chevrolet_columns = pd.read_csv(os.path.join(self.data_path, 'Chevrolet_DAEWOO_RAVON_columns.csv'))
+            # Model inputs (skip index columns)
+            self.apartment_feature_columns = [col for col in self.x_columns.columns if not col.startswith('Unnamed') and col != '']
+            # The car model was trained without the columns the evaluate endpoint drops
+            self.car_feature_columns = [
+                col for col in self.chevrolet_columns.columns
+                if not col.startswith('Unnamed') and col != '' and col not in CAR_DROPPED_COLUMNS['model3']
+            ]
             
         except Exception as e:
             print(f"Error loading models: {e}")
@@ -66,10 +95,13 @@ class PriceEstimator:
     
     def _get_base_apartment_price(self, asset_data):
         """Get base apartment price using ML model"""
+        prediction = self.get_base_prices('apartment', [asset_data])[0]
+        return None if np.isnan(prediction) else prediction
+    
+    def _apartment_features(self, asset_data):
+        """Model1 feature row for an apartment"""
         try:
-            # Get feature columns (skip index column)
-            feature_columns = [col for col in self.x_columns.columns if not col.startswith('Unnamed') and col != '']
-            feature_dict = {col: 0 for col in feature_columns}
+            feature_dict = {col: 0 for col in self.apartment_feature_columns}
             
             # Fill basic features
             feature_dict["totalArea"] = asset_data.get("area", 0)
@@ -136,13 +168,7 @@ class PriceEstimator:
                 feature_dict[f"district_{district}"] = 1
                 feature_dict[f"mahalla_{mahalla}"] = 1
             
-            # Create DataFrame and predict
-            feature_df = pd.DataFrame([feature_dict])
-            feature_df = feature_df.reindex(columns=feature_columns, fill_value=0)
-            
-            # Use model1 for prediction
-            prediction = self.apartment_model1.predict(feature_df)[0]
-            return prediction
+            return feature_dict
             
         except Exception as e:
             print(f"Error getting base apartment price: {e}")
@@ -150,59 +176,10 @@ class PriceEstimator:
     
     def _apply_apartment_temporal_adjustments(self, base_price, asset_data, target_month, target_year):
         """Apply realistic temporal price adjustments for apartments"""
-        import random
-        import math
-        
-        # Set seed based on asset data for consistent results
-        area = asset_data.get("area", 0)
-        rooms = asset_data.get("rooms", 0)
-        floor = asset_data.get("floor", 0)
-        seed = hash(f"{area}_{rooms}_{floor}_{asset_data.get('district', '')}_{asset_data.get('mahalla', '')}")
-        random.seed(seed)
-        
-        current_date = datetime.now()
-        target_date = datetime(target_year, target_month, 1)
-        
-        # Calculate months difference from current date
-        months_diff = (current_date.year - target_year) * 12 + (current_date.month - target_month)
-        
-        # Real estate appreciation/depreciation (apartments generally appreciate)
-        # Typical real estate appreciation: 3-8% per year
-        annual_appreciation = 0.06  # 6% per year
-        monthly_appreciation = annual_appreciation / 12
-        
-        # Apply appreciation for past months (prices were lower in the past)
-        if months_diff > 0:
-            appreciation_factor = (1 - monthly_appreciation) ** months_diff
-            adjusted_price = base_price * appreciation_factor
-        else:
-            # For future months, continue appreciation
-            appreciation_factor = (1 + monthly_appreciation) ** abs(months_diff)
-            adjusted_price = base_price * appreciation_factor
-        
-        # Add seasonal variation (real estate is more active in spring/summer)
-        seasonal_multiplier = 1.0
-        if target_month in [3, 4, 5]:  # Spring
-            seasonal_multiplier = 1.05
-        elif target_month in [6, 7, 8]:  # Summer
-            seasonal_multiplier = 1.08
-        elif target_month in [9, 10]:  # Fall
-            seasonal_multiplier = 1.02
-        elif target_month in [11, 12, 1, 2]:  # Winter
-            seasonal_multiplier = 0.96
-        
-        adjusted_price *= seasonal_multiplier
-        
-        # Add small random variation (±3%) for realism
-        variation = random.uniform(-0.03, 0.03)
-        adjusted_price *= (1 + variation)
-        
-        # Add market trend simulation
-        # Simulate economic cycles affecting real estate
-        cycle_factor = math.cos((target_year - 2020) * 0.3 + target_month * 0.05) * 0.08
-        adjusted_price *= (1 + cycle_factor)
-        
-        return adjusted_price
+        multipliers = temporal.apartment_multipliers(
+            temporal.apartment_fingerprint(asset_data), [target_year], [target_month]
+        )
+        return base_price * float(multipliers[0])
     
     def estimate_car_price(self, asset_data, target_month=None, target_year=None):
         """Estimate car price for a specific month/year with realistic temporal variations"""
@@ -231,10 +208,13 @@ class PriceEstimator:
     
     def _get_base_car_price(self, asset_data):
         """Get base car price using ML model"""
+        prediction = self.get_base_prices('car', [asset_data])[0]
+        return None if np.isnan(prediction) else prediction
+    
+    def _car_features(self, asset_data):
+        """Car model feature row"""
         try:
-            # Get feature columns for car model
-            feature_columns = [col for col in self.chevrolet_columns.columns if not col.startswith('Unnamed') and col != '']
-            feature_dict = {col: 0 for col in feature_columns}
+            feature_dict = {col: 0 for col in self.car_feature_columns}
             
             # Fill basic features
             feature_dict["release_year"] = asset_data.get("year", 2020)
@@ -293,75 +273,68 @@ class PriceEstimator:
             elif owners == "4":
                 feature_dict["owners_count_4"] = 1
             
-            # Create DataFrame and predict
-            feature_df = pd.DataFrame([feature_dict])
-            feature_df = feature_df.reindex(columns=feature_columns, fill_value=0)
-            
-            # Use car model for prediction
-            prediction = self.car_model.predict(feature_df)[0]
-            return prediction
+            return feature_dict
             
         except Exception as e:
             print(f"Error getting base car price: {e}")
             return None
     
-    def _apply_temporal_adjustments(self, base_price, asset_data, target_month, target_year):
-        """Apply realistic temporal price adjustments"""
-        import random
-        import math
-        
-        # Set seed based on asset data for consistent results
-        car_year = asset_data.get("year", 2020)
-        mileage = asset_data.get("mileage", 0)
-        seed = hash(f"{car_year}_{mileage}_{asset_data.get('brand', '')}_{asset_data.get('model', '')}")
-        random.seed(seed)
-        
-        current_date = datetime.now()
-        target_date = datetime(target_year, target_month, 1)
-        
-        # Calculate months difference from current date
-        months_diff = (current_date.year - target_year) * 12 + (current_date.month - target_month)
-        
-        # Depreciation factor: cars lose value over time
-        # Typical car depreciation: 15-20% per year
-        annual_depreciation = 0.18  # 18% per year
-        monthly_depreciation = annual_depreciation / 12
-        
-        # Apply depreciation for past months
-        if months_diff > 0:
-            depreciation_factor = (1 - monthly_depreciation) ** months_diff
-            adjusted_price = base_price * depreciation_factor
+    def get_base_prices(self, asset_type, asset_data_list):
+        """Base model prices for many assets with one predict call; NaN where an asset cannot be priced"""
+        if asset_type == 'apartment':
+            rows = [self._apartment_features(asset_data) for asset_data in asset_data_list]
+            model, feature_columns = self.apartment_model1, self.apartment_feature_columns
         else:
-            # For future months, slight appreciation due to inflation
-            appreciation_factor = (1 + 0.05/12) ** abs(months_diff)  # 5% annual inflation
-            adjusted_price = base_price * appreciation_factor
+            rows = [self._car_features(asset_data) for asset_data in asset_data_list]
+            model, feature_columns = self.car_model, self.car_feature_columns
         
-        # Add seasonal variation (cars are more expensive in spring/summer)
-        seasonal_multiplier = 1.0
-        if target_month in [3, 4, 5, 6]:  # Spring/early summer
-            seasonal_multiplier = 1.08
-        elif target_month in [7, 8]:  # Summer
-            seasonal_multiplier = 1.05
-        elif target_month in [11, 12, 1, 2]:  # Winter
-            seasonal_multiplier = 0.95
+        prices = np.full(len(rows), np.nan)
+        encoded = [i for i, row in enumerate(rows) if row is not None]
+        if not encoded:
+            return prices
         
-        adjusted_price *= seasonal_multiplier
-        
-        # Add small random variation (±5%) for realism
-        variation = random.uniform(-0.05, 0.05)
-        adjusted_price *= (1 + variation)
-        
-        # Add market trend simulation
-        # Simulate market cycles: prices fluctuate over time
-        cycle_factor = math.sin((target_year - 2020) * 0.5 + target_month * 0.1) * 0.1
-        adjusted_price *= (1 + cycle_factor)
+        try:
+            feature_df = pd.DataFrame([rows[i] for i in encoded])
+            feature_df = feature_df.reindex(columns=feature_columns, fill_value=0)
+            if asset_type != 'apartment' and self.car_scaler is not None:
+                feature_df = self.car_scaler.transform(feature_df)
+            prices[encoded] = model.predict(feature_df)
+        except Exception as e:
+            print(f"Error getting base {asset_type} prices: {e}")
+        return prices
+    
+    def _apply_temporal_adjustments(self, base_price, asset_data, target_month, target_year):
+        """Apply realistic temporal price adjustments"""
+        multipliers = temporal.car_multipliers(
+            temporal.car_fingerprint(asset_data), [target_year], [target_month]
+        )
+        return base_price * float(multipliers[0])
+    
+    def estimate_price_series(self, asset_type, asset_data, years, months):
+        """Estimate prices for many (year, month) pairs from a single model prediction"""
+        if asset_type == 'apartment':
+            base_price = self._get_base_apartment_price(asset_data)
+            multipliers = temporal.apartment_multipliers(temporal.apartment_fingerprint(asset_data), years, months)
+        else:
+            base_price = self._get_base_car_price(asset_data)
+            multipliers = temporal.car_multipliers(temporal.car_fingerprint(asset_data), years, months)
         
-        return adjusted_price
+        if base_price is None:
+            return None
+        return np.maximum(0, base_price * multipliers)
 
-def generate_historical_prices(asset):
-    """Generate historical prices for the last 12 months"""
-    estimator = PriceEstimator()
-    
+    def estimate_prices(self, asset_type, asset_data_list, target_month=None, target_year=None):
+        """Estimate many assets of one type for a month with one model prediction; None where unpriced"""
+        target_month = target_month or datetime.now().month
+        target_year = target_year or datetime.now().year
+        adjust = (self._apply_apartment_temporal_adjustments if asset_type == 'apartment'
+                  else self._apply_temporal_adjustments)
+        base_prices = self.get_base_prices(asset_type, asset_data_list)
+        return [None if np.isnan(base_price) else max(0, adjust(base_price, asset_data, target_month, target_year))
+                for base_price, asset_data in zip(base_prices, asset_data_list)]
+
+def get_asset_data(asset):
+    """Estimator input for an asset: its model fields plus the details stored in description"""
     # Parse asset details
     try:
         asset_details = json.loads(asset.description) if asset.description else {}
@@ -370,7 +343,7 @@ def generate_historical_prices(asset):
     
     # Prepare asset data based on type
     if asset.asset_type == 'apartment':
-        asset_data = {
+        return {
             "area": float(asset.area) if asset.area else 0,
             "rooms": asset.rooms or 0,
             "floor": asset.floor or 0,
@@ -378,39 +351,43 @@ def generate_historical_prices(asset):
             **asset_details
         }
     else:  # car
-        asset_data = {
+        return {
             "year": asset.year or datetime.now().year,
             "mileage": asset.mileage or 0,
             "brand": asset.brand or "",
             "model": asset.model or "",
             **asset_details
         }
+
+def generate_historical_prices(asset):
+    """Generate historical prices for the last 12 months"""
+    estimator = PriceEstimator()
+    
+    asset_data = get_asset_data(asset)
     
-    # Generate prices for last 12 months
+    # Generate prices for last 12 months from one base prediction
     current_date = datetime.now().date()
-    historical_entries = []
+    target_dates = [current_date - relativedelta(months=i) for i in range(12, 0, -1)]  # 12 months ago to 1 month ago
+    estimated_prices = estimator.estimate_price_series(
+        asset.asset_type,
+        asset_data,
+        [target_date.year for target_date in target_dates],
+        [target_date.month for target_date in target_dates],
+    )
     
-    for i in range(12, 0, -1):  # 12 months ago to 1 month ago
-        target_date = current_date - relativedelta(months=i)
-        target_month = target_date.month
-        target_year = target_date.year
-        
-        if asset.asset_type == 'apartment':
-            estimated_price = estimator.estimate_apartment_price(asset_data, target_month, target_year)
-        else:
-            estimated_price = estimator.estimate_car_price(asset_data, target_month, target_year)
+    historical_entries = []
+    if estimated_prices is not None:
+        # Skip months that already have an entry
+        existing_dates = set(AssetValueHistory.objects.filter(
+            asset=asset,
+            date__in=target_dates
+        ).values_list('date', flat=True))
         
-        if estimated_price:
-            # Check if entry already exists
-            existing_entry = AssetValueHistory.objects.filter(
-                asset=asset, 
-                date=target_date
-            ).first()
-            
-            if not existing_entry:
+        for target_date, estimated_price in zip(target_dates, estimated_prices):
+            if estimated_price and target_date not in existing_dates:
                 historical_entries.append(AssetValueHistory(
                     asset=asset,
-                    value=estimated_price,
+                    value=round(float(estimated_price), 2),
                     date=target_date
                 ))
     
@@ -491,24 +468,34 @@ def update_monthly_prices():
         
         except Exception as e:
             print(f"Error updating price for {asset.name}: {e}")
+    
+    # Refresh the stored rolling changes of every asset in bulk
+    updated = recompute_changes()
+    print(f"Recomputed rolling changes for {updated} assets")
+
+    # Re-estimate listed assets so the marketplace deal ranking follows the new prices
+    # (deals builds on this module, hence the local import)
+    from .deals import rescore_listings
+    scored = rescore_listings()
+    print(f"Rescored {scored} marketplace listings")
 
 def get_price_change_percentage(asset, days=30):
     """Calculate price change percentage over specified days"""
     try:
+        # Stored by asset_manager.returns for the standard windows
+        if days in CHANGE_WINDOWS and asset.changes_as_of is not None:
+            return getattr(asset, change_field(days))
+
         current_date = datetime.now().date()
         past_date = current_date - timedelta(days=days)
         
         # Get current price
         current_price = float(asset.current_value)
         
-        # Get price from specified days ago
-        past_entry = AssetValueHistory.objects.filter(
-            asset=asset,
-            date__lte=past_date
-        ).order_by('-date').first()
+        # Get price from specified days ago (rows or archived months)
+        past_price = value_on_or_before(asset, past_date)
         
-        if past_entry:
-            past_price = float(past_entry.value)
+        if past_price is not None:
             if past_price > 0:
                 change_percentage = ((current_price - past_price) / past_price) * 100
                 return round(change_percentage, 2)
@@ -569,6 +556,8 @@ def update_single_asset_price(asset):
                     date=current_month_start
                 )
             
+            refresh_changes(asset, changed_on=current_month_start)
+            
             print(f"Updated price for {asset.name}: ${new_price}")
             return new_price
     
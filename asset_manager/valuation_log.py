@@ -0,0 +1,241 @@
+"""Write-behind log of every apartment and car valuation
+
+The evaluate endpoints append each valuation (model, price, latency and the
+payload) to an in-memory buffer; a daemon thread writes the buffer in batches
+to one SQLite file per UTC day under ``VALUATION_LOG_DIR``. Requests never
+wait on disk and analysts query the day files instead of the transactional
+database. Key payload fields get their own typed columns next to the full
+payload as JSON:
+
+    >>> from asset_manager.valuation_log import read_valuations
+    >>> read_valuations('apartment', '2026-10-01', '2026-10-19').groupby('district').predicted_price.median()
+
+The buffer is bounded; when the writer falls behind, new records are dropped
+and counted rather than slowing requests down.
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+from django.conf import settings
+
+# Typed columns per asset type: (column, payload field, SQLite type)
+COLUMNS = {
+    'apartment': [
+        ('district', 'district', 'TEXT'),
+        ('mahalla', 'mahalla', 'TEXT'),
+        ('area', 'area', 'REAL'),
+        ('rooms', 'rooms', 'INTEGER'),
+        ('floor', 'floor', 'INTEGER'),
+        ('total_floors', 'total_floors', 'INTEGER'),
+        ('renovation', 'renovation', 'TEXT'),
+        ('build_type', 'qurilish_turi', 'TEXT'),
+    ],
+    'car': [
+        ('brand', 'brand', 'TEXT'),
+        ('car_model', 'model', 'TEXT'),
+        ('release_year', 'year', 'INTEGER'),
+        ('mileage', 'mileage', 'REAL'),
+        ('engine_volume', 'engine_volume', 'REAL'),
+        ('fuel', 'fuel', 'TEXT'),
+        ('state', 'state', 'TEXT'),
+    ],
+}
+
+
+def _table(asset_type):
+    return f'{asset_type}_valuations'
+
+
+def _create_sql(asset_type):
+    typed = ''.join(f', {column} {sql_type}' for column, _, sql_type in COLUMNS[asset_type])
+    return (
+        f'CREATE TABLE IF NOT EXISTS {_table(asset_type)} ('
+        'logged_at TEXT NOT NULL, model TEXT, predicted_price INTEGER, latency_ms REAL'
+        f'{typed}, payload TEXT)'
+    )
+
+
+def _insert_sql(asset_type):
+    columns = ['logged_at', 'model', 'predicted_price', 'latency_ms',
+               *(column for column, _, _ in COLUMNS[asset_type]), 'payload']
+    return (f"INSERT INTO {_table(asset_type)} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})")
+
+
+def _typed(value, sql_type):
+    if value is None or value == '':
+        return None
+    if sql_type == 'TEXT':
+        return str(value)
+    try:
+        return int(float(value)) if sql_type == 'INTEGER' else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _row(asset_type, record):
+    logged_at, model_key, predicted_price, latency_ms, payload = record
+    return (
+        datetime.fromtimestamp(logged_at, timezone.utc).isoformat(timespec='milliseconds'),
+        model_key,
+        predicted_price,
+        round(latency_ms, 3),
+        *(_typed(payload.get(field), sql_type) for _, field, sql_type in COLUMNS[asset_type]),
+        json.dumps(payload, ensure_ascii=False, default=str),
+    )
+
+
+class ValuationLog:
+    """Buffer valuations in memory and write them per day from a background thread"""
+
+    def __init__(self, directory, batch_size=500, flush_interval=5, max_pending=50000):
+        self.directory = str(directory)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._connection = None
+        self._connection_day = None
+        self.written = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name='valuation-log', daemon=True)
+        self._thread.start()
+
+    def record(self, asset_type, input_data, model_key, predicted_price, latency_ms):
+        """Queue one valuation; returns False when the buffer is full and it was dropped"""
+        payload = input_data.dict() if hasattr(input_data, 'dict') else dict(input_data)
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending.append((asset_type, (time.time(), model_key, predicted_price, latency_ms, payload)))
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing valuation log: {e}")
+
+    def flush(self):
+        """Write everything buffered so far"""
+        with self._write_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+
+            by_day = {}
+            for asset_type, record in batch:
+                day = datetime.fromtimestamp(record[0], timezone.utc).date()
+                by_day.setdefault(day, {}).setdefault(asset_type, []).append(_row(asset_type, record))
+
+            for day, tables in sorted(by_day.items()):
+                connection = self._connect(day)
+                with connection:
+                    for asset_type, rows in tables.items():
+                        connection.executemany(_insert_sql(asset_type), rows)
+                self.written += sum(len(rows) for rows in tables.values())
+
+    def _connect(self, day):
+        # Keep the current day's file open; a new day closes the previous one
+        if self._connection_day != day:
+            if self._connection is not None:
+                self._connection.close()
+            os.makedirs(self.directory, exist_ok=True)
+            connection = sqlite3.connect(day_path(self.directory, day), check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for asset_type in COLUMNS:
+                connection.execute(_create_sql(asset_type))
+            self._connection, self._connection_day = connection, day
+        return self._connection
+
+
+def day_path(directory, day):
+    return os.path.join(str(directory), f'valuations-{day.isoformat()}.sqlite3')
+
+
+_log = None
+_log_pid = None
+_log_lock = threading.Lock()
+
+
+def get_log():
+    """The process-wide valuation log, or None when it is disabled in settings"""
+    global _log, _log_pid
+    if not getattr(settings, 'VALUATION_LOG_ENABLED', True):
+        return None
+    # Threads do not survive a fork, so each worker process starts its own writer
+    if _log_pid != os.getpid():
+        with _log_lock:
+            if _log_pid != os.getpid():
+                _log = ValuationLog(
+                    getattr(settings, 'VALUATION_LOG_DIR', os.path.join(settings.BASE_DIR, 'data', 'valuations')),
+                    batch_size=getattr(settings, 'VALUATION_LOG_BATCH_SIZE', 500),
+                    flush_interval=getattr(settings, 'VALUATION_LOG_FLUSH_INTERVAL', 5),
+                    max_pending=getattr(settings, 'VALUATION_LOG_MAX_PENDING', 50000),
+                )
+                atexit.register(_log.flush)
+                _log_pid = os.getpid()
+    return _log
+
+
+def record(asset_type, input_data, model_key, predicted_price, started):
+    """Log a valuation whose scoring began at ``time.perf_counter()`` value ``started``
+
+    Never lets logging break a request.
+    """
+    latency_ms = (time.perf_counter() - started) * 1000
+    try:
+        log = get_log()
+        if log is not None:
+            log.record(asset_type, input_data, model_key, predicted_price, latency_ms)
+    except Exception as e:
+        print(f"Error recording valuation: {e}")
+
+
+def read_valuations(asset_type, start, end=None, directory=None):
+    """Valuations of ``asset_type`` logged between two days (inclusive) as a DataFrame
+
+    ``start``/``end`` are dates or ISO strings; ``end`` defaults to ``start``.
+    """
+    directory = directory or getattr(settings, 'VALUATION_LOG_DIR',
+                                     os.path.join(settings.BASE_DIR, 'data', 'valuations'))
+    start = date.fromisoformat(start) if isinstance(start, str) else start
+    end = start if end is None else (date.fromisoformat(end) if isinstance(end, str) else end)
+
+    frames = []
+    day = start
+    while day <= end:
+        path = day_path(directory, day)
+        if os.path.exists(path):
+            # Read-only, so analysts never block the writer
+            connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+            try:
+                frames.append(pd.read_sql_query(f'SELECT * FROM {_table(asset_type)}', connection))
+            finally:
+                connection.close()
+        day += timedelta(days=1)
+
+    if not frames:
+        columns = ['logged_at', 'model', 'predicted_price', 'latency_ms',
+                   *(column for column, _, _ in COLUMNS[asset_type]), 'payload']
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
@@ -2,8 +2,13 @@ from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.views import APIView
 from django.contrib.auth import authenticate
+from django.db.models import F, Prefetch
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
 from django.utils import timezone
 from .models import User, Portfolio, Asset, AssetValueHistory, MarketplaceListing
 from .serializers import (
@@ -11,9 +16,16 @@ from .serializers import (
     AssetCreateSerializer, AssetValueHistorySerializer
 )
 from .utils import generate_historical_prices, get_price_change_percentage
+from . import comparables, deals, drift, explanations, facets, exporter, importer, inference, price_index, reference_data, reports, search, sensitivity
+from .reference_data import cached_json_response
+from .write_queue import run_write
+from .history import asset_value_history
+from .returns import refresh_changes
+from .analytics import MAX_PROJECTION_MONTHS, portfolio_analytics, portfolio_projection
 import requests
 import json
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 import os
 import sys
 
@@ -53,6 +65,13 @@ def login_user(request):
     else:
         return Response({'error': 'Email and password required'}, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def logout_user(request):
+    """Logout user by deleting their token"""
+    Token.objects.filter(user=request.user).delete()
+    return Response({'message': 'Logged out'}, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_user_profile(request):
@@ -90,26 +109,85 @@ class PortfolioDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return Portfolio.objects.filter(user=self.request.user)
 
+class AssetListPagination(PageNumberPagination):
+    page_size = getattr(settings, 'ASSET_LIST_PAGE_SIZE', 100)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'ASSET_LIST_MAX_PAGE_SIZE', 500)
+
+
 class AssetListCreateView(generics.ListCreateAPIView):
-    """List and create assets"""
+    """List and create assets
+
+    The list is paginated (``?page=``, ``?page_size=``) and leaves out value
+    history unless ``?include=history`` asks for the latest
+    ``ASSET_LIST_HISTORY_DEFAULT`` entries, or ``?include=history:N`` for the
+    latest N (at most ``ASSET_LIST_HISTORY_MAX``). ``?fields=id,name,...``
+    returns only those fields.
+    """
     serializer_class = AssetSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AssetListPagination
 
     def get_queryset(self):
+        queryset = Asset.objects.filter(portfolio__user=self.request.user)
         portfolio_id = self.request.query_params.get('portfolio')
         if portfolio_id:
-            return Asset.objects.filter(portfolio__user=self.request.user, portfolio_id=portfolio_id)
-        return Asset.objects.filter(portfolio__user=self.request.user)
+            queryset = queryset.filter(portfolio_id=portfolio_id)
+        if self.request.method != 'GET':
+            return queryset
+
+        queryset = queryset.select_related('portfolio').order_by('id')
+        history_limit = self._history_limit()
+        if history_limit:
+            # Sliced prefetch: one query for the latest N rows of every asset on the page
+            queryset = queryset.prefetch_related(Prefetch(
+                'value_history', queryset=AssetValueHistory.objects.order_by('-date', '-id')[:history_limit],
+                to_attr='recent_value_history',
+            ))
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return AssetCreateSerializer
         return AssetSerializer
 
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method == 'GET':
+            kwargs['fields'] = self._fields()
+            kwargs['include_history'] = bool(self._history_limit())
+            kwargs['history_source'] = 'recent_value_history'
+        return super().get_serializer(*args, **kwargs)
+
+    def _fields(self):
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        fields = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = set(fields) - set(AssetSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+        return fields
+
+    def _history_limit(self):
+        includes = [item.strip() for item in self.request.query_params.get('include', '').split(',') if item.strip()]
+        limit = 0
+        for item in includes:
+            name, _, count = item.partition(':')
+            if name != 'history':
+                raise ValidationError({'include': f'Unknown include: {name}'})
+            try:
+                limit = int(count) if count else getattr(settings, 'ASSET_LIST_HISTORY_DEFAULT', 12)
+            except ValueError:
+                raise ValidationError({'include': f'History length must be a number, got {count}'})
+            maximum = getattr(settings, 'ASSET_LIST_HISTORY_MAX', 120)
+            if not 1 <= limit <= maximum:
+                raise ValidationError({'include': f'History length must be between 1 and {maximum}'})
+        return limit
+
     def perform_create(self, serializer):
         # Ensure the portfolio belongs to the user
         portfolio = get_object_or_404(Portfolio, id=serializer.validated_data['portfolio'].id, user=self.request.user)
-        asset = serializer.save(portfolio=portfolio)
+        asset = run_write(serializer.save, portfolio=portfolio)
         
         # Generate historical prices for the new asset
         try:
@@ -117,6 +195,8 @@ class AssetListCreateView(generics.ListCreateAPIView):
         except Exception as e:
             print(f"Error generating historical prices for {asset.name}: {e}")
 
+        run_write(refresh_changes, asset)
+
 class AssetDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete an asset"""
     serializer_class = AssetSerializer
@@ -125,138 +205,19 @@ class AssetDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return Asset.objects.filter(portfolio__user=self.request.user)
 
+    def perform_update(self, serializer):
+        asset = serializer.save()
+        # current_value may have changed; the stored references still hold
+        run_write(refresh_changes, asset)
+
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])  # Allow unauthenticated access for apartment evaluation
 def evaluate_apartment(request):
     """Evaluate apartment using the ML model"""
     try:
-        # Import the prediction logic directly
-        import pandas as pd
-        import joblib
-        import os
-        
-        # Get the project root directory (where manage.py is located)
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        data_path = os.path.join(BASE_DIR, 'data')
-        
-        # Load models and data
-        model1 = joblib.load(os.path.join(data_path, 'GBM_MADEL_WITHOUT_DISTANCE.pkl'))
-        model2 = joblib.load(os.path.join(data_path, 'model2.pkl'))
-        x_columns = pd.read_csv(os.path.join(data_path, 'xcolumns.csv'))
-        uybor_cols = pd.read_csv(os.path.join(data_path, 'uybor_columns.csv'))
-        mahalla_and_tuman = pd.read_csv(os.path.join(data_path, 'mahalla_tuman_codes.csv'))
-        unique_mahalla_olx = pd.read_csv(os.path.join(data_path, 'unique_mahalla_olx.csv'))
-
-        input_data = request.data
-        
-        # Skip the first column (index column) when creating the dictionary
-        feature_columns = [col for col in x_columns.columns if not col.startswith('Unnamed') and col != '']
-        my_dict = {col: 0 for col in feature_columns}
-
-        my_dict["totalArea"] = input_data.get("area")
-        my_dict["numberOfRooms"] = input_data.get("rooms")
-        my_dict["floor"] = input_data.get("floor")
-        my_dict["floorOfHouse"] = input_data.get("total_floors")
-        my_dict["furnished"] = 1 if input_data.get("mebel") == 'Ha' else 0
-        my_dict["handle"] = 1 if input_data.get("kelishsa") == 'Ha' else 0
-        my_dict["pricingMonth"] = input_data.get("month")
-        my_dict["pricingYear"] = input_data.get("year")
-
-        for k, v in {
-            "Maktab": "shkola", "Supermarket": "supermarket", "Do'kon": "magazini", "Park": "park"
-        }.items():
-            my_dict[v] = 1 if k in input_data.get("atrofda", []) else 0
-
-        for k, v in {
-            "Televizor": "tv_wm_ac_fridge", "Internet": "telefon_internet"
-        }.items():
-            my_dict[v] = 1 if k in input_data.get("uyda", []) else 0
-
-        # Map UI values to model expected values
-        value_mappings = {
-            "owner": {
-                "Mulkdor": "Mulkdor",
-                "Tashkilot": "Tashkilot", 
-                "Boshqa": "Boshqa"
-            },
-            "planirovka": {
-                "Oddiy": "Oddiy",
-                "Hosila": "Hosila", 
-                "Mustahkam": "Mustahkam"
-            },
-            "renovation": {
-                "Yaxshi": "Yaxshi",
-                "O'rtacha": "O'rtacha",
-                "Yomon": "Yomon"
-            },
-            "sanuzel": {
-                "Birgalikda": "Birgalikda",
-                "Alohida": "Alohida"
-            },
-            "bino_turi": {
-                "Ikkinchi bozor": "Ikkinchi bozor",
-                "Birlamchi bozor": "Birlamchi bozor"
-            },
-            "qurilish_turi": {
-                "Panel": "Panel",
-                "G'isht": "G'isht",
-                "Monolit": "Monolit"
-            }
-        }
-
-        for prefix, field in [
-            ("ownerType_", "owner"),
-            ("planType_", "planirovka"),
-            ("repairType_", "renovation"),
-            ("bathroomType_", "sanuzel"),
-            ("marketType_", "bino_turi"),
-            ("buildType_", "qurilish_turi"),
-        ]:
-            val = input_data.get(field)
-            if val and field in value_mappings:
-                mapped_val = value_mappings[field].get(val, val)
-                my_dict[f"{prefix}{mapped_val}"] = 1
-            elif val:
-                my_dict[f"{prefix}{val}"] = 1
-
-        if input_data.get("district"):
-            d = mahalla_and_tuman[mahalla_and_tuman['district_str'] == input_data['district']]['district_code'].values
-            my_dict["district_code"] = d[0] if len(d) > 0 else 0
-            
-        # Handle mahalla name mapping (UI now sends Latin names directly)
-        if input_data.get("mahalla"):
-            # The UI now sends Latin names directly, so look them up by neighborhood_latin
-            n = mahalla_and_tuman[mahalla_and_tuman['neighborhood_latin'] == input_data['mahalla']]['neighborhood_code'].values
-            my_dict["neighborhood_code"] = n[0] if len(n) > 0 else 0
-
-        model = model1 if my_dict.get("neighborhood_code", 0) in set(unique_mahalla_olx['neighborhood_code']) else model2
-        
-        df = pd.DataFrame([my_dict])
-        df['numberOfRooms'] = df['numberOfRooms'].astype(int)
-        df['floor'] = df['floor'].astype(int)
-        df['floorOfHouse'] = df['floorOfHouse'].astype(int)
-        df['totalArea'] = df['totalArea'].astype(float)
-        if 'district_code' in df.columns:
-            df['district_code'] = df['district_code'].astype(int)
-        if 'neighborhood_code' in df.columns:
-            df['neighborhood_code'] = df['neighborhood_code'].astype(int)
-
-        if model == model2:
-            # Get the first column from uybor_cols (which contains the feature names)
-            first_col = uybor_cols.columns[0]
-            selected_features = uybor_cols[first_col].tolist()
-            # Filter to only include features that exist in our dataframe
-            available_features = [col for col in selected_features if col in df.columns]
-            df = df[available_features]
-
-        prediction = model.predict(df)[0]
-        margin = round(prediction * 0.0361)
-
-        return Response({
-            'predicted_price': round(prediction),
-            'price_range': [round(prediction - margin), round(prediction + margin)],
-            'input_data': input_data
-        })
+        result = inference.evaluate_apartment(request.data)
+        drift.observe('apartment', request.data, result['predicted_price'])
+        return Response(result)
 
     except Exception as e:
         import traceback
@@ -266,6 +227,82 @@ def evaluate_apartment(request):
             'input_data': request.data
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+def evaluate_apartment_sensitivity(request):
+    """Price an apartment under every combination of the swept inputs"""
+    try:
+        return Response(sensitivity.apartment_sensitivity(
+            request.data.get('base') or {},
+            request.data.get('sweep'),
+            max_variants=getattr(settings, 'SENSITIVITY_MAX_VARIANTS', 1000),
+        ))
+
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        print(f"Error evaluating apartment sensitivity: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _explain_top(request):
+    top = int(request.query_params.get('top', explanations.DEFAULT_TOP_FEATURES))
+    if top < 1:
+        raise ValueError('top must be a positive integer')
+    return top
+
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+def explain_apartment(request):
+    """Evaluate an apartment and return the feature contributions behind the price"""
+    try:
+        top = _explain_top(request)
+    except ValueError:
+        return Response({'error': 'top must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return Response(explanations.explain_apartment(request.data, top=top))
+
+    except Exception as e:
+        print(f"Error explaining apartment evaluation: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _comparables_k(request):
+    k = int(request.query_params.get('k', getattr(settings, 'COMPARABLES_DEFAULT_K', 10)))
+    if not 1 <= k <= getattr(settings, 'COMPARABLES_MAX_K', 50):
+        raise ValueError('k out of range')
+    return k
+
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+def apartment_comparables(request):
+    """Active marketplace listings most similar to an apartment payload"""
+    try:
+        k = _comparables_k(request)
+    except ValueError:
+        return Response({'error': f"k must be an integer between 1 and {getattr(settings, 'COMPARABLES_MAX_K', 50)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return Response(comparables.find_comparables('apartment', request.data, k=k))
+
+    except Exception as e:
+        print(f"Error finding apartment comparables: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def get_model_importance(request, model_key):
+    """Get the global feature importance of one of the pricing models"""
+    if model_key not in inference.MODEL_FILES:
+        return Response({'error': f'Unknown model: {model_key}'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        return Response(explanations.global_importances(model_key))
+
+    except Exception as e:
+        print(f"Error getting model importance: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_dashboard_data(request):
@@ -280,9 +317,13 @@ def get_dashboard_data(request):
     total_previous_value = 0
     
     for asset in user_assets:
-        change_percentage = get_price_change_percentage(asset, days=30)
         current_value = float(asset.current_value)
-        previous_value = current_value / (1 + change_percentage / 100) if change_percentage != 0 else current_value
+        if asset.changes_as_of is not None:
+            # Stored 30-day reference value; no reference means no change
+            previous_value = float(asset.value_30d_ago) if asset.value_30d_ago else current_value
+        else:
+            change_percentage = get_price_change_percentage(asset, days=30)
+            previous_value = current_value / (1 + change_percentage / 100) if change_percentage != 0 else current_value
         
         total_change_amount += (current_value - previous_value)
         total_previous_value += previous_value
@@ -321,16 +362,21 @@ def update_asset_value(request, asset_id):
         new_value = request.data.get('new_value')
         
         if new_value:
-            asset.current_value = new_value
-            asset.save()
-            
-            # Add to value history
-            AssetValueHistory.objects.create(
-                asset=asset,
-                value=new_value,
-                date=request.data.get('date', timezone.now().date())
-            )
-            
+            def write():
+                asset.current_value = new_value
+                asset.save()
+
+                # Add to value history
+                entry = AssetValueHistory.objects.create(
+                    asset=asset,
+                    value=new_value,
+                    date=request.data.get('date', timezone.now().date())
+                )
+
+                # Keep the stored rolling changes in step with the new value
+                refresh_changes(asset, changed_on=entry._meta.get_field('date').to_python(entry.date))
+
+            run_write(write)
             return Response(AssetSerializer(asset).data)
         else:
             return Response({'error': 'New value is required'}, status=status.HTTP_400_BAD_REQUEST)
@@ -345,18 +391,16 @@ def get_asset_price_history(request, asset_id):
     try:
         asset = get_object_or_404(Asset, id=asset_id, portfolio__user=request.user)
         
-        # Get last 12 months of price history
-        price_history = AssetValueHistory.objects.filter(
-            asset=asset
-        ).order_by('date')[:12]
+        # Get last 12 months of price history (archived months included)
+        price_history = asset_value_history(asset, limit=12)
         
         # Format data for chart
         chart_data = []
-        for entry in price_history:
+        for day, value in price_history:
             chart_data.append({
-                'date': entry.date.strftime('%Y-%m-%d'),
-                'month': entry.date.strftime('%b %Y'),
-                'value': float(entry.value)
+                'date': day.strftime('%Y-%m-%d'),
+                'month': day.strftime('%b %Y'),
+                'value': value
             })
         
         return Response({
@@ -369,24 +413,131 @@ def get_asset_price_history(request, asset_id):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_portfolio_analytics(request, portfolio_id):
+    """Get aggregate value series, returns, volatility, drawdown and allocation for a portfolio"""
+    portfolio = get_object_or_404(Portfolio, id=portfolio_id, user=request.user)
+    try:
+        months = request.query_params.get('months')
+        months = int(months) if months else None
+    except ValueError:
+        return Response({'error': 'months must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return Response(portfolio_analytics(portfolio, months=months))
+
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_portfolio_projection(request, portfolio_id):
+    """Get per-asset and total value projections for the next ?months=N months"""
+    portfolio = get_object_or_404(Portfolio, id=portfolio_id, user=request.user)
+    try:
+        months = int(request.query_params.get('months', 12))
+    except ValueError:
+        return Response({'error': 'months must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= months <= MAX_PROJECTION_MONTHS:
+        return Response({'error': f'months must be between 1 and {MAX_PROJECTION_MONTHS}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return Response(portfolio_projection(portfolio, months=months))
+
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def import_portfolio_assets(request, portfolio_id):
+    """Bulk-import assets from a CSV or NDJSON body into a portfolio
+
+    The body is read as it arrives and imported in chunks of
+    ``ASSET_IMPORT_CHUNK_SIZE``. The response is NDJSON: one progress line
+    per chunk (running counts plus that chunk's row errors), then a final
+    line with ``done: true`` or an ``error``.
+    """
+    portfolio = get_object_or_404(Portfolio, id=portfolio_id, user=request.user)
+    fmt = importer.FORMATS.get(request.content_type.split(';')[0].strip().lower())
+    if fmt is None:
+        return Response({'error': f"Content-Type must be one of: {', '.join(importer.FORMATS)}"},
+                        status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    # Iterating the underlying HttpRequest yields body lines without reading it all into memory
+    records = importer.read_records(request._request, fmt)
+    progress = importer.import_assets(
+        portfolio, records,
+        chunk_size=getattr(settings, 'ASSET_IMPORT_CHUNK_SIZE', 1000),
+        max_rows=getattr(settings, 'ASSET_IMPORT_MAX_ROWS', 100000),
+    )
+
+    def stream():
+        totals = {}
+        try:
+            for totals in progress:
+                yield json.dumps(totals, ensure_ascii=False) + '\n'
+            yield json.dumps({**totals, 'errors': [], 'done': True}) + '\n'
+        except Exception as e:
+            print(f"Error importing assets into portfolio {portfolio.id}: {str(e)}")
+            yield json.dumps({**totals, 'errors': [], 'done': False, 'error': str(e)}, ensure_ascii=False) + '\n'
+
+    return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+class PortfolioExportView(APIView):
+    """Export a portfolio's assets with their full value history as ``?format=csv`` or ``ndjson``
+
+    The body is streamed from server-side iterators and gzipped on the fly
+    when the client accepts it.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= selects the export format here, not a DRF renderer
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, portfolio_id):
+        portfolio = get_object_or_404(Portfolio, id=portfolio_id, user=request.user)
+        fmt = request.query_params.get('format', 'csv')
+        if fmt not in exporter.FORMATS:
+            return Response({'error': f"format must be one of: {', '.join(exporter.FORMATS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        use_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        lines = exporter.export_lines(portfolio, fmt, chunk_size=getattr(settings, 'PORTFOLIO_EXPORT_CHUNK_SIZE', 2000))
+        response = StreamingHttpResponse(exporter.stream_export(lines, use_gzip=use_gzip),
+                                         content_type=exporter.FORMATS[fmt])
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        response['Content-Disposition'] = f'attachment; filename="portfolio-{portfolio.id}.{fmt}"'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def get_price_index(request):
+    """Get the precomputed mahalla price index, optionally for one ?mahalla="""
+    try:
+        mahalla = request.GET.get('mahalla')
+        cached = price_index.get_price_index(mahalla)
+        if cached is None:
+            error = f'Unknown mahalla: {mahalla}' if mahalla else 'Price index has not been built yet'
+            return Response({'error': error}, status=status.HTTP_404_NOT_FOUND)
+
+        return cached_json_response(request, cached, max_age=getattr(settings, 'PRICE_INDEX_MAX_AGE', 3600))
+
+    except Exception as e:
+        print(f"Error getting price index: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def get_car_brands(request):
     """Get available car brands"""
     try:
-        import pandas as pd
-        import os
-        
-        # Get the project root directory (where manage.py is located)
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        data_path = os.path.join(BASE_DIR, 'data')
-        
-        # Load brand and car data
-        brand_car_names = pd.read_csv(os.path.join(data_path, 'Brand_and_car_column.csv'))
-        brands = brand_car_names['brand'].unique().tolist()
-        
-        return Response({'brands': brands}, status=status.HTTP_200_OK)
-        
+        return cached_json_response(request, reference_data.car_brands.get(None))
+
     except Exception as e:
         print(f"Error getting car brands: {str(e)}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -396,23 +547,13 @@ def get_car_brands(request):
 def get_car_models(request):
     """Get available car models for a brand"""
     try:
-        import pandas as pd
-        import os
-        
         brand = request.GET.get('brand')
         if not brand:
             return Response({'error': 'Brand parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Get the project root directory (where manage.py is located)
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        data_path = os.path.join(BASE_DIR, 'data')
-        
-        # Load brand and car data
-        brand_car_names = pd.read_csv(os.path.join(data_path, 'Brand_and_car_column.csv'))
-        models = brand_car_names[brand_car_names['brand'] == brand]['car_name'].unique().tolist()
-        
-        return Response({'models': models}, status=status.HTTP_200_OK)
-        
+
+        cached = reference_data.car_models.get(brand) or reference_data.EMPTY_CAR_MODELS
+        return cached_json_response(request, cached)
+
     except Exception as e:
         print(f"Error getting car models: {str(e)}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -422,29 +563,13 @@ def get_car_models(request):
 def get_car_specs(request):
     """Get body type and engine volume for a car model"""
     try:
-        import pandas as pd
-        import os
-        
         model = request.GET.get('model')
         if not model:
             return Response({'error': 'Model parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Get the project root directory (where manage.py is located)
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        data_path = os.path.join(BASE_DIR, 'data')
-        
-        # Load car body and engine volume data
-        car_body_enginevol = pd.read_csv(os.path.join(data_path, 'data_to_find_enginevol_body.csv'))
-        filtered_df = car_body_enginevol[car_body_enginevol['car_name'] == model]
-        
-        if filtered_df.empty:
-            return Response({'body_type': '', 'engine_volume': None}, status=status.HTTP_200_OK)
-        
-        car_body = filtered_df.iloc[0]['body_type']
-        engine_vol = filtered_df.iloc[0]['engine_volume'] if not pd.isnull(filtered_df.iloc[0]['engine_volume']) else None
-        
-        return Response({'body_type': car_body, 'engine_volume': engine_vol}, status=status.HTTP_200_OK)
-        
+
+        cached = reference_data.car_specs.get(model) or reference_data.EMPTY_CAR_SPECS
+        return cached_json_response(request, cached)
+
     except Exception as e:
         print(f"Error getting car specs: {str(e)}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -454,208 +579,9 @@ def get_car_specs(request):
 def evaluate_car(request):
     """Evaluate car using the ML model"""
     try:
-        import pandas as pd
-        import joblib
-        import os
-        from datetime import datetime
-        
-        # Get the project root directory (where manage.py is located)
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        data_path = os.path.join(BASE_DIR, 'data')
-        
-        # Load models and data
-        model3 = joblib.load(os.path.join(data_path, 'CHEVROLET_DAEWOO_RAVON_LGBM_41.pkl'))
-        model4 = joblib.load(os.path.join(data_path, 'CLEANDED_DATA_FOREIGN_LGBM.pkl'))
-        scaler1 = joblib.load(os.path.join(data_path, 'scaler_CHEVROLET-DAEWOO-RAVON.pkl'))
-        scaler2 = joblib.load(os.path.join(data_path, 'scaler_foreign_cleaned_Data_lgbm.pkl'))
-        
-        X1 = pd.read_csv(os.path.join(data_path, 'Chevrolet_DAEWOO_RAVON_columns.csv'))
-        X2 = pd.read_csv(os.path.join(data_path, 'FOREIGN_columns_cleaned_Data_lgbm.csv'))
-
-        input_data = request.data
-        
-        # Determine which model to use based on brand
-        brand = input_data.get("brand")
-        if brand in ['Chevrolet', 'Ravon', 'Daewoo']:
-            # Use model for Chevrolet/Daewoo/Ravon
-            feature_columns = [col for col in X1.columns if not col.startswith('Unnamed') and col != '']
-            updated_auto_dict = {col: 0 for col in feature_columns}
-            model = model3
-            scaler = scaler1
-            check = 'model_3'
-        else:
-            # Use model for foreign cars
-            feature_columns = [col for col in X2.columns if not col.startswith('Unnamed') and col != '']
-            updated_auto_dict = {col: 0 for col in feature_columns}
-            model = model4
-            scaler = scaler2
-            check = 'model_4'
-
-        # Basic car information
-        updated_auto_dict["release_year"] = input_data.get("year")
-        updated_auto_dict["engine_volume"] = input_data.get("engine_volume")
-        updated_auto_dict["mileage"] = input_data.get("mileage")
-        updated_auto_dict["month"] = input_data.get("month", datetime.now().month)
-        updated_auto_dict["year"] = datetime.now().year
-
-        # Brand type (1 for Chevrolet, 0 for others in the Chevrolet model)
-        if check == 'model_3':
-            updated_auto_dict['brand_type'] = 1 if brand == 'Chevrolet' else 0
-        else:
-            updated_auto_dict['brand_type'] = 0  # Always 0 for foreign model
-
-        # Car name
-        car_name = input_data.get("model")
-        if car_name and f'car_name_{car_name}' in updated_auto_dict:
-            updated_auto_dict[f'car_name_{car_name}'] = 1
-
-        # Ownership type
-        ownership = input_data.get("ownership", "Xususiy")
-        if ownership == 'Biznes':
-            updated_auto_dict['item_type_Business'] = 1
-            updated_auto_dict['item_type_Private'] = 0
-        else:
-            updated_auto_dict['item_type_Business'] = 0
-            updated_auto_dict['item_type_Private'] = 1
-
-        # Owners count
-        owners_count = input_data.get("owners_count", 1)
-        if f'owners_count_{owners_count}' in updated_auto_dict:
-            updated_auto_dict[f'owners_count_{owners_count}'] = 1
-
-        # Car condition
-        condition = input_data.get("condition")
-        car_condition_mapping = {
-            "A'lo": "Excellent",
-            "O'rtacha": "Average", 
-            "Remont talab": "Needs_Repair",
-            "Yaxshi": "Good"
-        }
-        if condition and condition in car_condition_mapping:
-            condition_key = car_condition_mapping[condition]
-            if f'car_condition_{condition_key}' in updated_auto_dict:
-                updated_auto_dict[f'car_condition_{condition_key}'] = 1
-
-        # Fuel type
-        fuel = input_data.get("fuel")
-        fuel_mapping = {
-            "Benzin": "Gasoline",
-            "Gaz/Benzin": "Gasoline/Petrol",
-            "Gibrid": "Hybrid",
-            "Dizel": "Diesel", 
-            "Boshqa": "Other",
-            "Elektro": "Electric"
-        }
-        if fuel and fuel in fuel_mapping:
-            fuel_key = fuel_mapping[fuel]
-            if f'fuel_type_{fuel_key}' in updated_auto_dict:
-                updated_auto_dict[f'fuel_type_{fuel_key}'] = 1
-
-        # Car color
-        color = input_data.get("color")
-        color_mapping = {
-            "Asfalt": "Asphalt",
-            "Bejeviy": "Beige",
-            "Qora": "Black",
-            "Ko'k": "Blue",
-            "Jigarrang": "Brown",
-            "Kulrang": "Gray",
-            "Boshqa": "Other",
-            "Kumush": "Silver",
-            "Oq": "White"
-        }
-        if color and color in color_mapping:
-            color_key = color_mapping[color]
-            if f'color_{color_key}' in updated_auto_dict:
-                updated_auto_dict[f'color_{color_key}'] = 1
-
-        # Body type  
-        body_type = input_data.get("body_type")
-        body_mapping = {
-            "Yo'ltanlamas": "SUV",
-            "Boshqa": "Other",
-            "Kabriolet": "Convertible",
-            "Kupe": "Coupe",
-            "Miniven": "Minivan", 
-            "Pikap": "Pickup",
-            "Sedan": "Sedan",
-            "Universal": "Wagon",
-            "Xetchbek": "Hatchback"
-        }
-        if body_type and body_type in body_mapping:
-            body_key = body_mapping[body_type]
-            if f'body_{body_key}' in updated_auto_dict:
-                updated_auto_dict[f'body_{body_key}'] = 1
-
-        # State/Region
-        state = input_data.get("state")
-        state_mapping = {
-            "Toshkent shahri": "Tashkent",
-            "Qoraqalpogʻiston Respublikasi": "Karakalpakstan",
-            "Navoiy Viloyati": "Navoiy",
-            "Toshkent Viloyati": "Tashkent2",
-            "Samarqand Viloyati": "Samarkand",
-            "Qashqadaryo Viloyati": "Kashkadarya",
-            "Farg'ona Viloyati": "Ferghana",
-            "Buxoro Viloyati": "Bukhara",
-            "Xorazm Viloyati": "Khorezm",
-            "Sirdaryo Viloyati": "Sirdaryo",
-            "Surxondaryo Viloyati": "Surkhondaryo",
-            "Namangan Viloyati": "Namangan",
-            "Andijon Viloyati": "Andijon",
-            "Jizzax Viloyati": "Jizzakh"
-        }
-        if state and state in state_mapping:
-            state_key = state_mapping[state]
-            if f'state_{state_key}' in updated_auto_dict:
-                updated_auto_dict[f'state_{state_key}'] = 1
-
-        # Transmission (1 for manual, 0 for automatic)
-        transmission = input_data.get("transmission", "Mexanik")
-        updated_auto_dict['transmission'] = 1 if transmission == 'Mexanik' else 0
-
-        # Features
-        features = input_data.get("features", [])
-        feature_mapping = {
-            "Konditsioner": "Air_Conditioner",
-            "Xavfsizlik tizimi": "Security_System",
-            "Parctronik": "Parking_Sensors",
-            "Rastamojka qilingan": "Customs_Cleared",
-            "Elektron oynalar": "Power_Windows",
-            "Elektron ko'zgular": "Power_Mirrors"
-        }
-        for feature_uz, feature_en in feature_mapping.items():
-            if feature_en in updated_auto_dict:
-                updated_auto_dict[feature_en] = 1 if feature_uz in features else 0
-
-        # Create DataFrame and predict
-        df_auto = pd.DataFrame([updated_auto_dict])
-        
-        # Remove specific columns based on model type
-        if check == "model_4":
-            df_auto = df_auto.drop(columns=["body_Convertible", "color_Beige"], errors="ignore")
-        elif check == "model_3":
-            df_auto = df_auto.drop(columns=["color_Beige"], errors="ignore")
-
-        # Scale and predict
-        df_auto_scaled = scaler.transform(df_auto)
-        prediction = model.predict(df_auto_scaled)
-        predicted_price = round(prediction[0])
-        
-        # Calculate price range (±3.61% margin)
-        margin = round(predicted_price * 0.0361)
-        lower_bound = predicted_price - margin
-        upper_bound = predicted_price + margin
-
-        return Response({
-            'predicted_price': predicted_price,
-            'price_range': {
-                'lower': lower_bound,
-                'upper': upper_bound
-            },
-            'formatted_price': f"${predicted_price:,}",
-            'formatted_range': f"${lower_bound:,} - ${upper_bound:,}"
-        }, status=status.HTTP_200_OK)
+        result = inference.evaluate_car(request.data)
+        drift.observe('car', request.data, result['predicted_price'])
+        return Response(result, status=status.HTTP_200_OK)
 
     except Exception as e:
         print(f"Error evaluating car: {str(e)}")
@@ -663,35 +589,46 @@ def evaluate_car(request):
         traceback.print_exc()
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+def explain_car(request):
+    """Evaluate a car and return the feature contributions behind the price"""
+    try:
+        top = _explain_top(request)
+    except ValueError:
+        return Response({'error': 'top must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return Response(explanations.explain_car(request.data, top=top))
+
+    except Exception as e:
+        print(f"Error explaining car evaluation: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+def car_comparables(request):
+    """Active marketplace listings most similar to a car payload"""
+    try:
+        k = _comparables_k(request)
+    except ValueError:
+        return Response({'error': f"k must be an integer between 1 and {getattr(settings, 'COMPARABLES_MAX_K', 50)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return Response(comparables.find_comparables('car', request.data, k=k))
+
+    except Exception as e:
+        print(f"Error finding car comparables: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def get_districts_mahallas(request):
     """Get districts and mahallas for apartment forms"""
     try:
-        import pandas as pd
-        import os
-        
-        # Get the project root directory (where manage.py is located)
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        data_path = os.path.join(BASE_DIR, 'data')
-        
-        # Load the neighborhoods CSV file
-        df = pd.read_csv(os.path.join(data_path, 'neighborhoods.csv'))
-        
-        # Group mahallas by district
-        districts_mahallas = {}
-        for _, row in df.iterrows():
-            district = row['district_name_latin']
-            mahalla = row['mahalla_name_latin']
-            
-            if district not in districts_mahallas:
-                districts_mahallas[district] = []
-            
-            if mahalla not in districts_mahallas[district]:
-                districts_mahallas[district].append(mahalla)
-        
-        return Response(districts_mahallas, status=status.HTTP_200_OK)
-        
+        return cached_json_response(request, reference_data.districts_mahallas.get(None))
+
     except Exception as e:
         print(f"Error getting districts and mahallas: {str(e)}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -701,52 +638,22 @@ def get_districts_mahallas(request):
 def download_apartment_report(request):
     """Generate and download PDF report for apartment evaluation"""
     try:
-        from django.http import HttpResponse
-        import sys
-        
-        # Get the project root directory
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        
-        # Add the project root to Python path so we can import the PDF generators
-        if BASE_DIR not in sys.path:
-            sys.path.append(BASE_DIR)
-        
-        from pdf_generator import create_report
-        
         # Extract data from request
         evaluation_data = request.data
-        
-        # Create property details dictionary for PDF
-        property_details = {
-            'Hudud': f"{evaluation_data.get('district', '')}, {evaluation_data.get('mahalla', '')}",
-            'Maydoni': f"{evaluation_data.get('area', '')}m²" if evaluation_data.get('area') else '',
-            'Xonalar soni': str(evaluation_data.get('rooms', '')),
-            'Qavat': str(evaluation_data.get('floor', '')),
-            'Binoning qavatlar soni': str(evaluation_data.get('total_floors', '')),
-            'Jihozlangan': evaluation_data.get('mebel', ''),
-            'Atrofda': ', '.join(evaluation_data.get('atrofda', [])) if evaluation_data.get('atrofda') else '',
-            'Uyda mavjud': ', '.join(evaluation_data.get('uyda', [])) if evaluation_data.get('uyda') else '',
-            'Mulk turi': evaluation_data.get('owner', ''),
-            'Planirovka': evaluation_data.get('planirovka', ''),
-            "Ta'mir turi": evaluation_data.get('renovation', ''),
-            'Sanuzel': evaluation_data.get('sanuzel', ''),
-            'Bozor turi': evaluation_data.get('bino_turi', ''),
-            'Qurilish turi': evaluation_data.get('qurilish_turi', ''),
-            "Kelishish mumkinmi": evaluation_data.get('kelishsa', ''),
-            'Baholash vaqti': f"{evaluation_data.get('month', '')}-{evaluation_data.get('year', '')}"
-        }
-        
-        predicted_price = evaluation_data.get('predicted_price', '')
-        price_range = evaluation_data.get('price_range', '')
-        
+        property_details = reports.apartment_report_details(evaluation_data)
+
         # Generate PDF
-        pdf_bytes = create_report(property_details, str(predicted_price), price_range)
-        
+        pdf_bytes = reports.render_apartment_report(
+            property_details,
+            evaluation_data.get('predicted_price', ''),
+            evaluation_data.get('price_range', '')
+        )
+
         # Return PDF as response
         response = HttpResponse(pdf_bytes, content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="apartment_evaluation_report.pdf"'
         return response
-        
+
     except Exception as e:
         print(f"Error generating apartment PDF: {str(e)}")
         import traceback
@@ -758,51 +665,22 @@ def download_apartment_report(request):
 def download_car_report(request):
     """Generate and download PDF report for car evaluation"""
     try:
-        from django.http import HttpResponse
-        import sys
-        
-        # Get the project root directory
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        
-        # Add the project root to Python path so we can import the PDF generators
-        if BASE_DIR not in sys.path:
-            sys.path.append(BASE_DIR)
-        
-        from pdf_generator_auto import create_report_auto
-        
         # Extract data from request
         evaluation_data = request.data
-        
-        # Create property details dictionary for PDF
-        property_details = {
-            'Hudud': evaluation_data.get('state', ''),
-            'Brend': evaluation_data.get('brand', ''),
-            'Nomi': evaluation_data.get('model', ''),
-            'Ishlab chiqarilgan yili': str(evaluation_data.get('year', '')),
-            'Mator hajmi': str(evaluation_data.get('engine_volume', '')),
-            "Yoqilg'gi turi": evaluation_data.get('fuel', ''),
-            'Egalik turi': evaluation_data.get('ownership', ''),
-            'Kuzov turi': evaluation_data.get('body_type', ''),
-            'Rangi': evaluation_data.get('color', ''),
-            'Holati': evaluation_data.get('condition', ''),
-            "Qo'shimcha narsalari": ', '.join(evaluation_data.get('features', [])) if evaluation_data.get('features') else '',
-            'Oldingi egalari soni': str(evaluation_data.get('owners_count', '')),
-            'Yurgan masofasi': str(evaluation_data.get('mileage', '')),
-            'Kuchlanishi': evaluation_data.get('transmission', ''),
-            'Baholash vaqti': f"{evaluation_data.get('month', '')}-{evaluation_data.get('eval_year', '')}"
-        }
-        
-        predicted_price = evaluation_data.get('predicted_price', '')
-        price_range = evaluation_data.get('price_range', '')
-        
+        property_details = reports.car_report_details(evaluation_data)
+
         # Generate PDF
-        pdf_bytes = create_report_auto(property_details, str(predicted_price), price_range)
-        
+        pdf_bytes = reports.render_car_report(
+            property_details,
+            evaluation_data.get('predicted_price', ''),
+            evaluation_data.get('price_range', '')
+        )
+
         # Return PDF as response
         response = HttpResponse(pdf_bytes, content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="car_evaluation_report.pdf"'
         return response
-        
+
     except Exception as e:
         print(f"Error generating car PDF: {str(e)}")
         import traceback
@@ -856,18 +734,29 @@ def create_marketplace_listing(request):
         
         print(f"Creating listing with data: {listing_data}")
         
-        if hasattr(asset, 'marketplace_listing'):
-            # Update existing listing
-            listing = asset.marketplace_listing
-            for key, value in listing_data.items():
-                if key not in ['asset', 'seller']:  # Don't update these fields
-                    setattr(listing, key, value)
-            listing.save()
-            print("Updated existing listing")
-        else:
-            # Create new listing
-            listing = MarketplaceListing.objects.create(**listing_data)
-            print(f"Created new listing with ID: {listing.id}")
+        # Model estimate for the deal ranking, computed outside the write queue
+        estimate = deals.estimate_assets([asset])[0]
+        print(f"Estimated listed asset at: {estimate}")
+        
+        def write():
+            if hasattr(asset, 'marketplace_listing'):
+                # Update existing listing
+                listing = asset.marketplace_listing
+                for key, value in listing_data.items():
+                    if key not in ['asset', 'seller']:  # Don't update these fields
+                        setattr(listing, key, value)
+                deals.score_listing(listing, estimate)
+                listing.save()
+                print("Updated existing listing")
+            else:
+                # Create new listing
+                listing = MarketplaceListing(**listing_data)
+                deals.score_listing(listing, estimate)
+                listing.save()
+                print(f"Created new listing with ID: {listing.id}")
+            return listing
+
+        listing = run_write(write)
         
         return Response({
             'message': 'Актив успешно выставлен на продажу',
@@ -883,10 +772,22 @@ def create_marketplace_listing(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def get_marketplace_facets(request):
+    """Active listing counts by asset type, district, rooms, brand and price bucket"""
+    try:
+        return Response(facets.facet_counts())
+
+    except Exception as e:
+        print(f"Error getting marketplace facets: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def get_marketplace_listings(request):
-    """Get all active marketplace listings with filtering"""
+    """Get all active marketplace listings with filtering and optional ?q= full-text search"""
     try:
         print("get_marketplace_listings called")
         print(f"User authenticated: {request.user.is_authenticated}")
@@ -925,6 +826,24 @@ def get_marketplace_listings(request):
                 print(f"Invalid max_price: {max_price}")
                 pass
         
+        # sort=deal: lowest listing price / estimate first, unscored listings last
+        sort = request.query_params.get('sort')
+        if sort == 'deal':
+            listings = listings.order_by(F('deal_ratio').asc(nulls_last=True), '-listed_at')
+        elif sort:
+            print(f"Invalid sort: {sort}")
+        
+        # Full-text search: best matches first (or in deal order), at most MARKETPLACE_SEARCH_LIMIT
+        query = request.query_params.get('q', '').strip()
+        if query:
+            ids = search.search_listing_ids(query, listings, limit=getattr(settings, 'MARKETPLACE_SEARCH_LIMIT', 200))
+            if sort == 'deal':
+                listings = listings.filter(id__in=ids)
+            else:
+                positions = {listing_id: position for position, listing_id in enumerate(ids)}
+                listings = sorted(listings.filter(id__in=ids), key=lambda listing: positions[listing.id])
+            print(f"After search for {query!r}: {len(listings)}")
+        
         # Serialize the listings
         print("Serializing listings...")
         listings_data = []
@@ -959,6 +878,8 @@ def get_marketplace_listings(request):
                 },
                 'listing_price': float(listing.listing_price),
                 'formatted_price': f"${float(listing.listing_price):,.0f}",
+                'estimated_price': float(listing.estimated_price) if listing.estimated_price is not None else None,
+                'deal_ratio': listing.deal_ratio,
                 'description': listing.description,
                 'listed_at': listing.listed_at.isoformat(),
                 'is_own_listing': request.user.is_authenticated and listing.seller == request.user
@@ -993,7 +914,7 @@ def remove_marketplace_listing(request, listing_id):
         )
         
         listing.is_active = False
-        listing.save()
+        run_write(listing.save)
         
         return Response({
             'message': 'Объявление успешно снято с продажи'
@@ -1029,6 +950,8 @@ def get_user_marketplace_listings(request):
                 },
                 'listing_price': float(listing.listing_price),
                 'formatted_price': f"${float(listing.listing_price):,.0f}",
+                'estimated_price': float(listing.estimated_price) if listing.estimated_price is not None else None,
+                'deal_ratio': listing.deal_ratio,
                 'is_active': listing.is_active,
                 'listed_at': listing.listed_at.isoformat()
             }
@@ -1039,4 +962,25 @@ def get_user_marketplace_listings(request):
     except Exception as e:
         return Response({
             'error': f'Ошибка при получении ваших объявлений: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR) 
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def get_inference_metrics(request):
+    """Micro-batcher metrics: batch size distribution and queue wait"""
+    batcher = inference.get_batcher()
+    if batcher is None:
+        return Response({'enabled': False}, status=status.HTTP_200_OK)
+    return Response({'enabled': True, **batcher.get_metrics()}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def get_drift_metrics(request):
+    """Input distributions and unknown categories seen by the evaluate endpoints, across workers"""
+    try:
+        return Response(drift.merged_snapshot(), status=status.HTTP_200_OK)
+    except Exception as e:
+        print(f"Error reading drift metrics: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,133 @@
+"""Optional in-process serializer for small database writes
+
+SQLite allows one writer at a time. When many request threads each open their
+own short write transaction they queue on the database lock, and under load
+some give up with "database is locked". With ``SQLITE_WRITE_SERIALIZER``
+enabled, ``run_write`` hands the write to a single writer thread instead. That
+thread groups whatever arrived within ``SQLITE_WRITE_MAX_WAIT_MS`` (up to
+``SQLITE_WRITE_BATCH_SIZE`` writes) into one transaction, with a savepoint per
+write so one failure does not undo the others. Callers block until their
+batch has committed, so they see the same result and durability as a direct
+write.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connections, transaction
+
+
+class _Write:
+    __slots__ = ('fn', 'args', 'kwargs', 'future')
+
+    def __init__(self, fn, args, kwargs, future):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+
+
+class WriteSerializer:
+    """Run write callables on one thread, ``max_batch_size`` per transaction"""
+
+    def __init__(self, using='default', max_batch_size=64, max_wait_ms=2):
+        self.using = using
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.writes = 0
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='write-serializer', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` and return a Future resolved after its batch commits"""
+        future = Future()
+        with self._cond:
+            self._pending.append(_Write(fn, args, kwargs, future))
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+                self._cond.notify()
+        return future
+
+    def on_writer_thread(self):
+        return threading.current_thread() is self._thread
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.perf_counter() + self.max_wait
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+            self._flush(batch)
+
+    def _flush(self, batch):
+        live = [write for write in batch if write.future.set_running_or_notify_cancel()]
+        outcomes = []
+        try:
+            with transaction.atomic(using=self.using):
+                for write in live:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            outcomes.append((True, write.fn(*write.args, **write.kwargs)))
+                    except Exception as e:
+                        outcomes.append((False, e))
+        except Exception as e:
+            # The commit itself failed, so none of the batch was written
+            for write in live:
+                write.future.set_exception(e)
+            connections[self.using].close()
+            return
+
+        self.batches += 1
+        self.writes += len(live)
+        for write, (ok, value) in zip(live, outcomes):
+            if ok:
+                write.future.set_result(value)
+            else:
+                write.future.set_exception(value)
+
+
+_serializer = None
+_serializer_pid = None
+_serializer_lock = threading.Lock()
+
+
+def get_serializer():
+    """The process-wide write serializer, or None when it is disabled in settings"""
+    global _serializer, _serializer_pid
+    if not getattr(settings, 'SQLITE_WRITE_SERIALIZER', False):
+        return None
+    # Threads do not survive a fork, so each worker process starts its own writer
+    if _serializer_pid != os.getpid():
+        with _serializer_lock:
+            if _serializer_pid != os.getpid():
+                _serializer = WriteSerializer(
+                    max_batch_size=getattr(settings, 'SQLITE_WRITE_BATCH_SIZE', 64),
+                    max_wait_ms=getattr(settings, 'SQLITE_WRITE_MAX_WAIT_MS', 2),
+                )
+                _serializer_pid = os.getpid()
+    return _serializer
+
+
+def run_write(fn, *args, **kwargs):
+    """Run a small write, through the serializer when it is enabled, and return its result
+
+    Writes inside an open transaction run directly: the caller's transaction
+    has to see them and holds the database lock anyway.
+    """
+    serializer = get_serializer()
+    if (serializer is None or serializer.on_writer_thread()
+            or connections[serializer.using].in_atomic_block):
+        return fn(*args, **kwargs)
+    return serializer.submit(fn, *args, **kwargs).result()
@@ -27,6 +27,15 @@ function debugAuth() {
 }
 
 function logout() {
+  // Revoke the token server-side; don't wait for it before leaving the page
+  const token = getAuthToken();
+  if (token) {
+    fetch(`${API_BASE_URL}/auth/logout/`, {
+      method: 'POST',
+      headers: { 'Authorization': `Token ${token}` },
+      keepalive: true
+    }).catch(() => {});
+  }
   localStorage.removeItem('auth_token');
   localStorage.removeItem('user_data');
   window.location.href = './login.html';
@@ -105,11 +114,19 @@ async function loadDashboardData() {
 
 async function loadUserAssets() {
   try {
-    const response = await apiCall('/assets/');
-    if (response && response.ok) {
-      return await response.json();
+    // The asset list is paginated; collect every page into one array
+    let loadedAssets = [];
+    let page = 1;
+    while (page) {
+      const response = await apiCall(`/assets/?page=${page}&page_size=500`);
+      if (!response || !response.ok) {
+        break;
+      }
+      const data = await response.json();
+      loadedAssets = loadedAssets.concat(data.results);
+      page = data.next ? page + 1 : null;
     }
-    return [];
+    return loadedAssets;
   } catch (error) {
     console.error('Error loading assets:', error);
     return [];
@@ -3889,6 +3906,7 @@ async function loadMarketplaceListings(filters = {}) {
     if (filters.asset_type) queryParams.append('asset_type', filters.asset_type);
     if (filters.min_price) queryParams.append('min_price', filters.min_price);
     if (filters.max_price) queryParams.append('max_price', filters.max_price);
+    if (filters.sort) queryParams.append('sort', filters.sort);
     
     const url = `/marketplace/listings/${queryParams.toString() ? '?' + queryParams.toString() : ''}`;
     console.log('Making request to:', url);
@@ -3965,6 +3983,7 @@ function renderMarketplaceListings(listings) {
             </div>
             <div class="text-right">
               <div class="text-2xl font-bold text-green-600">${listing.formatted_price}</div>
+              ${listing.deal_ratio && listing.deal_ratio < 1 ? `<div class="text-xs text-green-700 dark:text-green-400">На ${Math.round((1 - listing.deal_ratio) * 100)}% ниже оценки</div>` : ''}
             </div>
           </div>
           
@@ -4059,6 +4078,7 @@ async function removeMarketplaceListing(listingId) {
       // Reload listings
       const currentFilters = getCurrentMarketplaceFilters();
       await loadMarketplaceListings(currentFilters);
+      loadMarketplaceFacets();
     } else {
       const error = await response.json();
       alert(error.error || 'Ошибка при снятии объявления');
@@ -4074,14 +4094,40 @@ function getCurrentMarketplaceFilters() {
   const typeFilter = document.getElementById('announcement-filter-type');
   const minPriceFilter = document.getElementById('announcement-filter-price-min');
   const maxPriceFilter = document.getElementById('announcement-filter-price-max');
+  const sortFilter = document.getElementById('announcement-sort');
   
   return {
     asset_type: typeFilter ? typeFilter.value : '',
     min_price: minPriceFilter ? minPriceFilter.value : '',
-    max_price: maxPriceFilter ? maxPriceFilter.value : ''
+    max_price: maxPriceFilter ? maxPriceFilter.value : '',
+    sort: sortFilter ? sortFilter.value : ''
   };
 }
 
+// Show listing counts next to the marketplace filter options
+async function loadMarketplaceFacets() {
+  try {
+    const response = await apiCall('/marketplace/facets/');
+    if (!response.ok) return null;
+    const facets = await response.json();
+
+    const typeFilter = document.getElementById('announcement-filter-type');
+    if (typeFilter) {
+      const counts = Object.fromEntries((facets.asset_type || []).map(item => [item.value, item.count]));
+      const total = Object.values(counts).reduce((sum, count) => sum + count, 0);
+      Array.from(typeFilter.options).forEach(option => {
+        if (!option.dataset.label) option.dataset.label = option.textContent;
+        const count = option.value ? (counts[option.value] || 0) : total;
+        option.textContent = `${option.dataset.label} (${count})`;
+      });
+    }
+    return facets;
+  } catch (error) {
+    console.error('Error loading marketplace facets:', error);
+    return null;
+  }
+}
+
 // Initialize marketplace functionality
 function initializeMarketplace() {
   console.log('Initializing marketplace...');
@@ -4097,6 +4143,7 @@ function initializeMarketplace() {
   
   // Load initial listings
   loadMarketplaceListings();
+  loadMarketplaceFacets();
   
   // Set up filter handlers
   const applyFiltersBtn = document.getElementById('apply-announcement-filters');
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -55,13 +56,86 @@ CORS_ALLOW_HEADERS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'asset_manager.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
 
+# Token -> user cache used by CachedTokenAuthentication
+TOKEN_CACHE_TTL = 300  # seconds
+TOKEN_CACHE_MAX_SIZE = 10000
+
+# Async evaluation endpoints: worker pools and how many extra requests may queue
+# before clients get 429 Too Many Requests
+INFERENCE_MAX_WORKERS = 4
+INFERENCE_MAX_PENDING = 32
+REPORT_MAX_WORKERS = 2
+REPORT_MAX_PENDING = 8
+
+# Micro-batching of single-row predictions: flush after this many rows or once the
+# oldest row has waited this long, whichever comes first
+INFERENCE_BATCH_ENABLED = True
+INFERENCE_BATCH_MAX_SIZE = 64
+INFERENCE_BATCH_MAX_WAIT_MS = 5
+INFERENCE_BATCH_MAX_PENDING = 1024
+
+# Largest variant grid /api/evaluate/apartment/sensitivity/ scores in one request
+SENSITIVITY_MAX_VARIANTS = 1000
+
+# Cache lifetime (seconds) for the CSV-backed reference endpoints; clients revalidate
+# with If-None-Match afterwards
+REFERENCE_DATA_MAX_AGE = 86400
+
+# The price index is rebuilt by a batch job, so it is revalidated sooner
+PRICE_INDEX_MAX_AGE = 3600
+
+# Optional shared inference server (manage.py run_inference_server). When set, the
+# evaluate endpoints send encoded rows over this Unix socket instead of loading the
+# models in every worker
+INFERENCE_SOCKET_PATH = os.environ.get('INFERENCE_SOCKET', '')
+INFERENCE_SOCKET_TIMEOUT = 5  # seconds
+
+# Drift monitor for evaluation payloads: each worker writes its histograms and
+# sketches under DRIFT_DIR this often; /api/metrics/drift/ adds them up.
+# Snapshots not rewritten for DRIFT_SNAPSHOT_MAX_AGE (stopped workers) are deleted
+DRIFT_MONITOR_ENABLED = True
+DRIFT_DIR = BASE_DIR / 'data' / 'drift'
+DRIFT_FLUSH_INTERVAL = 60  # seconds
+DRIFT_SNAPSHOT_MAX_AGE = 7 * 24 * 3600  # seconds
+DRIFT_SKETCH_SIZE = 50  # most frequent values kept per categorical field
+
+# Write-behind log of every valuation, one SQLite file per UTC day for analytics.
+# Batches are written every VALUATION_LOG_FLUSH_INTERVAL seconds or once
+# VALUATION_LOG_BATCH_SIZE records wait; beyond MAX_PENDING records are dropped
+VALUATION_LOG_ENABLED = True
+VALUATION_LOG_DIR = BASE_DIR / 'data' / 'valuations'
+VALUATION_LOG_BATCH_SIZE = 500
+VALUATION_LOG_FLUSH_INTERVAL = 5  # seconds
+VALUATION_LOG_MAX_PENDING = 50000
+
+# /api/assets/ list: page size, and how many history rows ?include=history embeds
+ASSET_LIST_PAGE_SIZE = 100
+ASSET_LIST_MAX_PAGE_SIZE = 500
+ASSET_LIST_HISTORY_DEFAULT = 12
+ASSET_LIST_HISTORY_MAX = 120
+
+# Bulk asset import (/api/portfolios/<id>/import/): rows validated, priced and written per transaction
+ASSET_IMPORT_CHUNK_SIZE = 1000
+ASSET_IMPORT_MAX_ROWS = 100000
+
+# Rows fetched per server-side cursor round trip by /api/portfolios/<id>/export/
+PORTFOLIO_EXPORT_CHUNK_SIZE = 2000
+
+# Most listings returned by a ?q= marketplace search, best matches first
+MARKETPLACE_SEARCH_LIMIT = 200
+
+# Comparable listings: default and largest ?k=, and seconds between checks for listings changed elsewhere
+COMPARABLES_DEFAULT_K = 10
+COMPARABLES_MAX_K = 50
+COMPARABLES_SYNC_INTERVAL = 30
+
 # Custom user model
 AUTH_USER_MODEL = 'asset_manager.User'
 
@@ -89,9 +163,33 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts (Django 5.1+). A deferred
+            # transaction that reads first and then writes fails immediately with
+            # "database is locked" when another writer got in between, busy_timeout or not
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Pragmas applied to every new SQLite connection (asset_manager.signals). WAL lets
+# readers run while a write commits; busy_timeout makes writers wait for the lock
+# instead of failing
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative means KiB, so 64 MiB
+    'busy_timeout': 5000,  # ms
+    'temp_store': 'MEMORY',
+}
+
+# Optional single writer thread grouping small request writes into batched
+# transactions (asset_manager.write_queue)
+SQLITE_WRITE_SERIALIZER = False
+SQLITE_WRITE_BATCH_SIZE = 64
+SQLITE_WRITE_MAX_WAIT_MS = 2
+
 AUTH_PASSWORD_VALIDATORS = []
 
 LANGUAGE_CODE = 'en-us'
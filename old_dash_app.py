@@ -11,13 +11,14 @@ import plotly.graph_objects as go
 import dash_leaflet as dl
 import dash_leaflet.express as dlx
 from dash_extensions.javascript import arrow_function, assign, Namespace
-import joblib
 import time
 from pdf_generator import create_report
 from pdf_generator_auto import create_report_auto
 from dash.exceptions import PreventUpdate
 import os
 from datetime import datetime
+from asset_manager.explanations import global_importances
+from asset_manager.inference import ModelHandle
 
 def load_prediction_counts():
     try:
@@ -71,12 +72,14 @@ uybor_cols=pd.read_csv('data/uybor_columns.csv')
 mahalla_and_tuman=pd.read_csv('data/mahalla_tuman_codes.csv')
 # df = pd.read_csv(r'data\olx_data.csv')
 
-model1 = joblib.load('data/GBM_MADEL_WITHOUT_DISTANCE.pkl')
-model2 = joblib.load('data/model2.pkl')
+# Models are scored through asset_manager.inference: in this process, or by the shared
+# inference server when INFERENCE_SOCKET is set. Car scaling happens there too.
+model1 = ModelHandle('model1')
+model2 = ModelHandle('model2')
 
-model3 = joblib.load('data/CHEVROLET_DAEWOO_RAVON_LGBM_41.pkl')
+model3 = ModelHandle('model3')
 
-model4 = joblib.load('data/CLEANDED_DATA_FOREIGN_LGBM.pkl')
+model4 = ModelHandle('model4')
 X = pd.read_csv(r'data/xcolumns.csv')
 model = model1
 
@@ -85,10 +88,6 @@ X1 = pd.read_csv(r'data/Chevrolet_DAEWOO_RAVON_columns.csv')
 
 X2 = pd.read_csv(r'data/FOREIGN_columns_cleaned_Data_lgbm.csv')
 
-scaler1 = joblib.load('data/scaler_CHEVROLET-DAEWOO-RAVON.pkl')
-
-scaler2 = joblib.load('data/scaler_foreign_cleaned_Data_lgbm.pkl')
-
 my_dict1 = {} # so columns and zerod values are saved here 
 for key in X1.columns:
     my_dict1[key]=0
@@ -124,21 +123,30 @@ for key in X.columns:
 # my_dict_xls = pd.DataFrame().from_dict(my_dict)
 # my_dict_xls.to_excel('my_dict_xls.xlsx')
 
-importances = model1.feature_importance()
-# print(len(importances))
-feature_importances = pd.DataFrame({'Feature': my_dict3.keys(), 'Importance': importances})
-top_20_features = feature_importances.sort_values(by='Importance', ascending=False).head(50)
-
-barh = px.bar(top_20_features, x='Importance', y = 'Feature', orientation='h')
-barh.update_layout(
-        xaxis_title="Muhimlik darajasi",
-        xaxis_gridcolor='lightblue',
-        yaxis_gridcolor='lightblue',
-        paper_bgcolor='white',
-        plot_bgcolor='white'
-    )
-barh.update_xaxes(showgrid=True, gridcolor='lightblue', gridwidth=1, griddash='dash')
-barh.update_yaxes(showgrid=True, gridcolor='lightblue', gridwidth=1, griddash='dash')
+def feature_importance_chart(top=50):
+    """Bar chart of model1's most important features
+
+    Importances are computed once per model version and persisted by the
+    explanation service, so nothing is recomputed at import or on restart.
+    """
+    features = global_importances('model1')['features']
+    importances = sorted(features, key=lambda feature: feature['split'], reverse=True)[:top]
+    top_features = pd.DataFrame({
+        'Feature': [feature['feature'] for feature in importances],
+        'Importance': [feature['split'] for feature in importances],
+    })
+
+    barh = px.bar(top_features, x='Importance', y = 'Feature', orientation='h')
+    barh.update_layout(
+            xaxis_title="Muhimlik darajasi",
+            xaxis_gridcolor='lightblue',
+            yaxis_gridcolor='lightblue',
+            paper_bgcolor='white',
+            plot_bgcolor='white'
+        )
+    barh.update_xaxes(showgrid=True, gridcolor='lightblue', gridwidth=1, griddash='dash')
+    barh.update_yaxes(showgrid=True, gridcolor='lightblue', gridwidth=1, griddash='dash')
+    return barh
 
 #########################
 
@@ -2947,12 +2955,10 @@ def predict_auto_price(n_clicks, viloyat, brend, name, birth, motor, fuel, egali
             for key in updated_auto_dict.keys():
                 updated_auto_dict[key] = 0
             model = model3
-            scaler = scaler1
             check = 'model_3'
         else:
             updated_auto_dict = my_dict2.copy()
             model = model4
-            scaler = scaler2
             check = 'model_4'
 
 
@@ -3116,7 +3122,6 @@ def predict_auto_price(n_clicks, viloyat, brend, name, birth, motor, fuel, egali
             
 
         #df_auto.to_csv('dfgathrd_link_auto.csv')  # Show the first few rows
-        df_auto = scaler.transform(df_auto)
         prediction = model.predict(df_auto)
         predicted_price = round(prediction[0])
         margin = round(prediction[0] * 0.0361)